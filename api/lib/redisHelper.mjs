@@ -110,15 +110,32 @@ export async function getStudentScores(email) {
  * @returns {number} the total amount of points the user has accumulated.
  */
 export async function getStudentTotalScore(email) {
-    const studentScores = await getStudentScores(email);
+    const studentInfo = await getStudent(email);
+    // Precomputed, unrounded, by the sync job (dbcron/student_totals.py) when available.
+    if (studentInfo['Summary']) {
+        return studentInfo['Summary']['Total'];
+    }
+    const studentScores = studentInfo['Assignments'];
     return Object.values(studentScores).reduce((assignmentTotal, assignment) => {
         Object.values(assignment).forEach((points) => {
-            assignmentTotal += +(points ?? 0);
+            // Blank and non-numeric cells count as 0, as in student_totals.py.
+            assignmentTotal += parseScore(points) ?? 0;
         });
         return assignmentTotal;
     }, 0);
 }
 
+/**
+ * Gets the course totals the sync job computed for a student.
+ * @param {string} email the email of the student whose information to get.
+ * @returns {object|null} { "Category Totals", Total, "Max Points So Far", Percentage,
+ * "Letter Grade" }, or null if the record predates the summaries.
+ */
+export async function getStudentSummary(email) {
+    const studentInfo = await getStudent(email);
+    return studentInfo['Summary'] ?? null;
+}
+
 /**
  * Gets the total amount of points in the class so far.
  * @returns {number} the total amount of points possible for the class.
@@ -158,6 +175,54 @@ export async function getStudents() {
 }
 
 
+/**
+ * Builds the field dbcron's score_columns.py uses in an assignment's columnar
+ * score keys: the JSON array [section, assignmentName] with "@" escaped, so the
+ * keys never look like student emails.
+ * @param {string} section - The category of the assignment.
+ * @param {string} assignmentName - The name of the assignment.
+ * @returns {string} the key field.
+ */
+export function scoreColumnField(section, assignmentName) {
+    return JSON.stringify([section, assignmentName]).replaceAll('@', '\\u0040');
+}
+
+/**
+ * Parses a score cell the way dbcron's score_columns.parse_score does.
+ * @param {*} score - The cell value from a student record.
+ * @returns {number|null} the score, or null if the cell is missing, blank,
+ * whitespace only or not a number.
+ */
+export function parseScore(score) {
+    let value = null;
+    if (typeof score === 'number') {
+        value = score;
+    } else if (typeof score === 'string' && score.trim() !== '') {
+        value = Number(score);
+    }
+    return value === null || isNaN(value) ? null : value;
+}
+
+/**
+ * Gets the statistics the sync job precomputed for an assignment with a single GET.
+ * @param {string} section - The category of the assignment.
+ * @param {string} assignmentName - The name of the assignment.
+ * @returns {Promise<object|null>} { average, max, min, median, count, freq, minScore, maxScore },
+ * with the exact (unrounded) average and median, or null if the sync job has not written stats
+ * for the assignment.
+ */
+export async function getAssignmentStats(section, assignmentName) {
+    const client = getClient();
+    await client.connect();
+
+    try {
+        const res = await client.get(`scores:stats:${scoreColumnField(section, assignmentName)}`);
+        return res === null ? null : JSON.parse(res);
+    } finally {
+        await client.quit();
+    }
+}
+
 /**
  * Gets the average score for a specific assignment across all students.
  * @param {string} section - The category of the assignment (e.g., "Projects", "Labs").
@@ -165,14 +230,17 @@ export async function getStudents() {
  * @returns {number|null} The average score, or null if no valid scores are found.
  */
 export async function getAverageAssignmentScore(section, assignmentName) {
+    const stats = await getAssignmentStats(section, assignmentName);
+    if (stats) {
+        return stats.count > 0 ? stats.average : null;
+    }
     const students = await getStudents();
     let totalScore = 0;
     let count = 0;
 
     const scores = await Promise.all(students.map(async ([, email]) => {
         const student = await getStudentScores(email);
-        const score = student?.[section]?.[assignmentName];
-        return (score != null && score !== "" && !isNaN(score)) ? +score : null;
+        return parseScore(student?.[section]?.[assignmentName]);
     }));
 
     for (const score of scores) {
@@ -192,12 +260,15 @@ export async function getAverageAssignmentScore(section, assignmentName) {
  * @returns {number|null} The highest score found, or null if no scores are found.
  */
 export async function getMaxAssignmentScore(section, assignmentName) {
+    const stats = await getAssignmentStats(section, assignmentName);
+    if (stats) {
+        return stats.count > 0 ? stats.max : null;
+    }
     const students = await getStudents();
 
     const scores = await Promise.all(students.map(async ([, email]) => {
         const student = await getStudentScores(email);
-        const score = student?.[section]?.[assignmentName];
-        return (score != null && score !== "" && !isNaN(score)) ? +score : null;
+        return parseScore(student?.[section]?.[assignmentName]);
     }));
 
     const valid = scores.filter(score => score !== null);
@@ -211,12 +282,15 @@ export async function getMaxAssignmentScore(section, assignmentName) {
  * @returns {number|null} The lowest valid score, or null if no valid scores found.
  */
 export async function getMinAssignmentScore(section, assignmentName) {
+    const stats = await getAssignmentStats(section, assignmentName);
+    if (stats) {
+        return stats.count > 0 ? stats.min : null;
+    }
     const students = await getStudents();
 
     const scores = await Promise.all(students.map(async ([, email]) => {
         const student = await getStudentScores(email);
-        const score = student?.[section]?.[assignmentName];
-        return (score != null && score !== "" && !isNaN(score)) ? +score : null;
+        return parseScore(student?.[section]?.[assignmentName]);
     }));
 
     const validScores = scores.filter(score => score !== null);
@@ -235,9 +309,8 @@ export async function getTopKAssignmentScores(section, assignmentName, k) {
 
     const scored = await Promise.all(students.map(async ([name, email]) => {
         const student = await getStudentScores(email);
-        const score = student?.[section]?.[assignmentName];
-        return (score != null && score !== "" && !isNaN(score)) ?
-            { name, email, score: +score } : null;
+        const score = parseScore(student?.[section]?.[assignmentName]);
+        return score !== null ? { name, email, score } : null;
     }));
 
     return scored
@@ -260,9 +333,7 @@ export async function getTopKTotalScores(k) {
 
         for (const category of Object.values(scores)) {
             for (const score of Object.values(category)) {
-                if (score != null && score !== "" && !isNaN(score)) {
-                    total += +score;
-                }
+                total += parseScore(score) ?? 0;
             }
         }
 
@@ -292,8 +363,8 @@ export async function getStudentsByAssignmentScore(section, assignmentName, targ
         // Safely access the score
         const rawScore = studentScores?.[section]?.[assignmentName];
         console.log(`Score for ${section} - ${assignmentName}:`, rawScore);
-        // Convert to number for comparison, handle null/empty strings gracefully
-        const score = (rawScore != null && rawScore !== "" && !isNaN(rawScore)) ? +rawScore : null;
+        // Convert to number for comparison, handle null/blank strings gracefully
+        const score = parseScore(rawScore);
 
         // Check if the score matches the target score
         if (score !== null && score === numericTargetScore) {
@@ -0,0 +1,103 @@
+const {
+    getAverageAssignmentScore,
+    getStudentTotalScore,
+    parseScore,
+    scoreColumnField,
+} = require('./redisHelper.mjs');
+
+// An in-memory stand-in for the Redis databases, keyed by database index.
+const mockDatabases = {};
+
+jest.mock('redis', () => ({
+    createClient: jest.fn(({ url }) => {
+        const entries = mockDatabases[url.split('/').at(-1)] ?? {};
+        return {
+            on: jest.fn(),
+            connect: jest.fn(async () => {}),
+            quit: jest.fn(async () => {}),
+            get: jest.fn(async (key) => entries[key] ?? null),
+            keys: jest.fn(async (pattern) => (pattern === '*@*' ?
+                Object.keys(entries).filter((key) => key.includes('@')) : [])),
+        };
+    }),
+}));
+
+function setStudents(scores) {
+    const entries = {};
+    scores.forEach((score, index) => {
+        entries[`student${index}@berkeley.edu`] = JSON.stringify({
+            'Legal Name': `Student ${index}`,
+            Assignments: { Quest: { 'Quest 1': score } },
+        });
+    });
+    mockDatabases['0'] = entries;
+}
+
+function setStats(stats) {
+    mockDatabases['0'][`scores:stats:${scoreColumnField('Quest', 'Quest 1')}`] = JSON.stringify(stats);
+}
+
+describe('api/lib/redisHelper.mjs', () => {
+    afterEach(() => {
+        Object.keys(mockDatabases).forEach((index) => delete mockDatabases[index]);
+        jest.clearAllMocks();
+    });
+
+    test('parseScore skips missing, blank, whitespace-only and non-numeric cells', () => {
+        expect(parseScore(4)).toBe(4);
+        expect(parseScore('2.5')).toBe(2.5);
+        expect(parseScore(' 3 ')).toBe(3);
+        expect(parseScore(null)).toBeNull();
+        expect(parseScore(undefined)).toBeNull();
+        expect(parseScore('')).toBeNull();
+        expect(parseScore('   ')).toBeNull();
+        expect(parseScore('N/A')).toBeNull();
+        expect(parseScore(NaN)).toBeNull();
+    });
+
+    test('getAverageAssignmentScore returns the unrounded precomputed average', async () => {
+        setStudents([1, 1, 0]);
+        setStats({ average: 2 / 3, max: 1, min: 0, median: 1, count: 3, freq: [1, 2], minScore: 0, maxScore: 1 });
+
+        expect(await getAverageAssignmentScore('Quest', 'Quest 1')).toBe(2 / 3);
+    });
+
+    test('getAverageAssignmentScore returns null when the stats count no scores', async () => {
+        setStudents(['']);
+        setStats({ average: 0, max: 0, min: 0, median: 0, count: 0, freq: [], minScore: 0, maxScore: 0 });
+
+        expect(await getAverageAssignmentScore('Quest', 'Quest 1')).toBeNull();
+    });
+
+    test('getAverageAssignmentScore falls back to the students, skipping whitespace-only cells', async () => {
+        setStudents(['3', '  ', '', 'N/A', 4, '1']);
+
+        expect(await getAverageAssignmentScore('Quest', 'Quest 1')).toBe(8 / 3);
+    });
+
+    test('getStudentTotalScore returns the precomputed Summary total', async () => {
+        mockDatabases['0'] = {
+            'oski@berkeley.edu': JSON.stringify({
+                'Legal Name': 'Bear, Oski',
+                Assignments: { Quest: { 'Quest 1': 10.125, 'Quest 2': 0.25 } },
+                Summary: { Total: 10.375 },
+            }),
+        };
+
+        expect(await getStudentTotalScore('oski@berkeley.edu')).toBe(10.375);
+    });
+
+    test('getStudentTotalScore sums the scores without a Summary, counting blank cells as 0', async () => {
+        mockDatabases['0'] = {
+            'oski@berkeley.edu': JSON.stringify({
+                'Legal Name': 'Bear, Oski',
+                Assignments: {
+                    Quest: { 'Quest 1': 10.125, 'Quest 2': '0.25', 'Quest 3': '  ' },
+                    Labs: { 'Lab 1': '', 'Lab 2': 'N/A', 'Lab 3': 2 },
+                },
+            }),
+        };
+
+        expect(await getStudentTotalScore('oski@berkeley.edu')).toBe(12.375);
+    });
+});
@@ -1,5 +1,5 @@
 import { Router } from 'express';
-import { getStudents, getStudentScores } from '../../../../lib/redisHelper.mjs'; 
+import { getAssignmentStats, getStudents, getStudentScores, parseScore } from '../../../../lib/redisHelper.mjs'; 
 const router = Router({ mergeParams: true });
 
 /**
@@ -10,6 +10,14 @@ const router = Router({ mergeParams: true });
 router.get('/:section/:name', async (req, res) => {
     try {
         const { section, name } = req.params;
+
+        // Precomputed by the sync job; fall back to scanning every student.
+        const stats = await getAssignmentStats(section, name);
+        if (stats) {
+            const { freq, minScore, maxScore } = stats;
+            return res.json({ freq, minScore, maxScore });
+        }
+
         const students = await getStudents(); 
 
         const scorePromises = students.map(async student => {
@@ -20,13 +28,8 @@ router.get('/:section/:name', async (req, res) => {
             // Assuming scores are under section/name and are numbers
             const score = studentScores[section] ? studentScores[section][name] : null;
             
-            if (score != null && score !== '' && !isNaN(score)) {
-                // Ensure we are working with integers for binning, 
-                // but keep original value for max/min if needed.
-                // Since scores are typically integers, we convert to Number.
-                return Number(score); 
-            }
-            return null;
+            // Scores are typically integers; blank and non-numeric cells are skipped.
+            return parseScore(score);
         });
 
         const rawScores = await Promise.all(scorePromises);
@@ -1,5 +1,5 @@
 import { Router } from 'express';
-import { getStudentScores, getStudents } from '../../../../lib/redisHelper.mjs';
+import { getAssignmentStats, getStudentScores, getStudents, parseScore } from '../../../../lib/redisHelper.mjs';
 const router = Router({ mergeParams: true });
 
 /**
@@ -10,18 +10,26 @@ const router = Router({ mergeParams: true });
 router.get('/:section/:name', async (req, res) => {
     try {
         const { section, name } = req.params;
+
+        // Precomputed by the sync job; fall back to scanning every student.
+        const stats = await getAssignmentStats(section, name);
+        if (stats) {
+            const { average, max, min, median, count } = stats;
+            return res.json({
+                average: parseFloat(average.toFixed(2)),
+                max,
+                min,
+                median: parseFloat(median.toFixed(2)),
+                count
+            });
+        }
+
         const students = await getStudents();
         
         const scorePromises = students.map(async student => {
             const studentId = student[1];
             const studentScores = await getStudentScores(studentId);
-            const score = studentScores[section] ? studentScores[section][name] : null;
-        
-
-            if (score != null && score !== '') {
-                return Number(score);
-            }
-            return null; 
+            return parseScore(studentScores[section] ? studentScores[section][name] : null);
         });
 
         const rawScores = await Promise.all(scorePromises);
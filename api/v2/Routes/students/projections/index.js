@@ -4,6 +4,7 @@ import {
     getMaxScores,
     getStudentTotalScore,
     getStudentScores,
+    getStudentSummary,
 } from '../../../../lib/redisHelper.mjs';
 import { getMaxPointsSoFar } from '../../../../lib/studentHelper.mjs';
 import { isAdmin } from '../../../../lib/userlib.mjs';
@@ -14,22 +15,32 @@ router.get('/', async (req, res) => {
     const { email } = req.params;
     try {
         let studentTotalScore;
-        let userGrades;
+        let maxPointsSoFar;
         let maxPoints = await getTotalPossibleScore();
-        let maxScores = await getMaxScores();
-        if (isAdmin(email)) {
-            userGrades = maxScores;
-            studentTotalScore = getMaxPointsSoFar(maxScores, maxScores);
+        // Totals and the current letter grade precomputed by the sync job, when available.
+        const summary = isAdmin(email) ? null : await getStudentSummary(email);
+        if (summary) {
+            studentTotalScore = summary['Total'];
+            maxPointsSoFar = summary['Max Points So Far'];
         } else {
+            let userGrades;
+            let maxScores = await getMaxScores();
+            if (isAdmin(email)) {
+                userGrades = maxScores;
+                studentTotalScore = getMaxPointsSoFar(maxScores, maxScores);
+            } else {
                 userGrades = await getStudentScores(email);
                 studentTotalScore = await getStudentTotalScore(email);
+            }
+            maxPointsSoFar = getMaxPointsSoFar(userGrades, maxScores);
         }
-        const maxPointsSoFar = getMaxPointsSoFar(userGrades, maxScores);
         return res.status(200).json({
             zeros: Math.round(studentTotalScore),
             pace: Math.round((studentTotalScore / maxPointsSoFar) * maxPoints),
-            perfect: Math.round(studentTotalScore + (maxPoints - maxPointsSoFar))
-        }); 
+            perfect: Math.round(studentTotalScore + (maxPoints - maxPointsSoFar)),
+            percentage: summary ? summary['Percentage'] : null,
+            grade: summary ? summary['Letter Grade'] : null,
+        });
     } catch (err) {
         switch (err.name) {
             case 'StudentNotEnrolledError':
@@ -0,0 +1,69 @@
+const request = require('supertest');
+const express = require('express');
+const router = require('./index.js').default;
+const redisHelper = require('../../../../lib/redisHelper.mjs');
+const { isAdmin } = require('../../../../lib/userlib.mjs');
+
+jest.mock('../../../../lib/redisHelper.mjs', () => ({
+    getTotalPossibleScore: jest.fn(),
+    getMaxScores: jest.fn(),
+    getStudentTotalScore: jest.fn(),
+    getStudentScores: jest.fn(),
+    getStudentSummary: jest.fn(),
+}));
+
+jest.mock('../../../../lib/userlib.mjs', () => ({
+    isAdmin: jest.fn(),
+}));
+
+
+describe('api/v2/students/projections/index.js', () => {
+    let app;
+
+    beforeEach(() => {
+        app = express();
+        app.use('/:email', router);
+        isAdmin.mockReturnValue(false);
+        redisHelper.getTotalPossibleScore.mockResolvedValue(400);
+        redisHelper.getMaxScores.mockResolvedValue({ Quest: { 'Quest 1': 100 }, Labs: { 'Lab 1': 100 } });
+    });
+
+    afterEach(() => {
+        jest.clearAllMocks();
+    });
+
+    test('uses the precomputed summary without recomputing totals', async () => {
+        redisHelper.getStudentSummary.mockResolvedValue({
+            'Category Totals': { Quest: 90.5, Labs: 60 },
+            Total: 150.5,
+            'Max Points So Far': 200,
+            Percentage: 75.25,
+            'Letter Grade': 'B',
+        });
+
+        const res = await request(app).get('/oski@berkeley.edu');
+        expect(res.statusCode).toBe(200);
+        expect(res.body).toEqual({ zeros: 151, pace: 301, perfect: 351, percentage: 75.25, grade: 'B' });
+        expect(redisHelper.getMaxScores).not.toHaveBeenCalled();
+        expect(redisHelper.getStudentTotalScore).not.toHaveBeenCalled();
+    });
+
+    test('falls back to summing the scores for records without a summary', async () => {
+        redisHelper.getStudentSummary.mockResolvedValue(null);
+        redisHelper.getStudentScores.mockResolvedValue({ Quest: { 'Quest 1': 90.5 }, Labs: { 'Lab 1': 60 } });
+        redisHelper.getStudentTotalScore.mockResolvedValue(150.5);
+
+        const res = await request(app).get('/oski@berkeley.edu');
+        expect(res.statusCode).toBe(200);
+        expect(res.body).toEqual({ zeros: 151, pace: 301, perfect: 351, percentage: null, grade: null });
+    });
+
+    test('projects admins from the max scores', async () => {
+        isAdmin.mockReturnValue(true);
+
+        const res = await request(app).get('/admin@berkeley.edu');
+        expect(res.statusCode).toBe(200);
+        expect(res.body).toEqual({ zeros: 200, pace: 400, perfect: 400, percentage: null, grade: null });
+        expect(redisHelper.getStudentSummary).not.toHaveBeenCalled();
+    });
+});
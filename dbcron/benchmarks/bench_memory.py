@@ -0,0 +1,116 @@
+"""
+Memory benchmark for update_db.update_redis on large rosters.
+
+Writes a synthetic grade sheet of each size as a CSV export, then runs the
+full sync against it under tracemalloc and reports the peak Python memory.
+Redis runs out of process (a fakeredis TCP server unless --redis-url is
+given), so stored data does not count. For reference it also reports the
+peak of just materializing the sheet with get_all_records(), as the sync
+did before it streamed.
+
+Peak memory must not grow with the roster: the run fails if the largest
+roster's peak exceeds the smallest's by more than --max-growth.
+
+Run from dbcron/:
+    python -m benchmarks.bench_memory --students 5000 50000 --assignments 100
+"""
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import redis
+
+from benchmarks.synthetic import iter_gradebook_rows
+from sources import CsvSheetSource
+
+SHEETNAME = "Grades"
+
+
+def _serve(port):
+    from fakeredis import TcpFakeServer
+
+    TcpFakeServer(("127.0.0.1", port)).serve_forever()
+
+
+def start_fake_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    process.start()
+    for _ in range(100):
+        try:
+            redis.Redis(port=port).ping()
+            return process, "redis://127.0.0.1:{}/0".format(port)
+        except redis.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("fakeredis server did not start")
+
+
+def traced_peak(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(student_counts, assignment_count, chunk_size, redis_url, max_growth):
+    os.environ["SPREADSHEET_SHEETNAME"] = SHEETNAME
+    from update_db import update_redis
+
+    server = None
+    if redis_url is None:
+        server, redis_url = start_fake_server()
+    target_client = redis.Redis.from_url(redis_url)
+    peaks = []
+    try:
+        for count in student_counts:
+            with tempfile.TemporaryDirectory() as directory:
+                with open(os.path.join(directory, SHEETNAME + ".csv"), "w", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerows(iter_gradebook_rows(count, assignment_count))
+                source = CsvSheetSource(directory)
+                target_client.flushdb()
+
+                def sync():
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        update_redis(chunk_size, target_client, incremental=False, source=source,
+                                     bins_client=target_client)
+
+                started = time.perf_counter()
+                peak = traced_peak(sync)
+                elapsed = time.perf_counter() - started
+                materialized = traced_peak(lambda: CsvSheetSource(directory).get_all_records(SHEETNAME))
+            peaks.append(peak)
+            print("{:>7} students: streaming sync peak {:7.1f} MiB in {:.1f}s; get_all_records alone {:7.1f} MiB"
+                  .format(count, peak / 2 ** 20, elapsed, materialized / 2 ** 20))
+    finally:
+        target_client.flushdb()
+        if server is not None:
+            server.terminate()
+
+    growth = peaks[-1] / peaks[0]
+    print("Peak growth from {} to {} students: {:.2f}x (limit {:.2f}x)".format(
+        student_counts[0], student_counts[-1], growth, max_growth))
+    return growth <= max_growth
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[5000, 50000])
+    arg_parser.add_argument("--assignments", type=int, default=100)
+    arg_parser.add_argument("--chunk-size", type=int, default=1000)
+    arg_parser.add_argument("--redis-url")
+    arg_parser.add_argument("--max-growth", type=float, default=1.5)
+    args = arg_parser.parse_args()
+    if not bench(sorted(args.students), args.assignments, args.chunk_size, args.redis_url, args.max_growth):
+        sys.exit(1)
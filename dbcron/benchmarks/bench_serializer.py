@@ -0,0 +1,78 @@
+"""
+Benchmarks JSON encoding and decoding in the sync: the standard library calls
+the sync used to make (json.dumps per student record, json.loads then
+["Assignments"] to diff changed records) against every serializer backend
+installed here, plus the typed student record decoder when msgspec is
+available. Also round-trips a studentScore.json-shaped document (generateData.py:
+one {"Assignment", "scores": [{"id", "score"}]} entry per lab) for the same
+roster. Every backend must decode to the same values.
+
+Run from dbcron/:
+    python -m benchmarks.bench_serializer --students 1000 10000
+"""
+import argparse
+import json
+import random
+
+import serializer
+from benchmarks.synthetic import generate_gradebook
+from score_columns import score_matrix
+from student_totals import compute_summaries
+from sync import StageTimer, transform_records
+
+
+def student_score_document(student_count, lab_count=9, seed=0):
+    rng = random.Random(seed)
+    student_ids = ["S{}".format(str(i).zfill(3)) for i in range(1, student_count + 1)]
+    return [{"Assignment": "Lab {}".format(lab),
+             "scores": [{"id": student_id, "score": rng.randint(0, 100) / 10} for student_id in student_ids]}
+            for lab in range(lab_count)]
+
+
+def installed_backends():
+    backends = []
+    for backend in serializer.BACKENDS:
+        try:
+            backends.append((backend, serializer._CODECS[serializer.select_backend(backend)](False)))
+        except ImportError:
+            continue
+    return backends
+
+
+def bench(student_counts):
+    backends = installed_backends()
+    for count in student_counts:
+        categories, concepts, _, records = generate_gradebook(count)
+        students = list(transform_records(records, categories, concepts))
+        scores = score_matrix(students, categories, concepts, students_only=False)
+        for email, summary in compute_summaries(students, categories, concepts, scores=scores).items():
+            dict(students)[email]["Summary"] = summary
+        document = student_score_document(count)
+
+        timer = StageTimer()
+        with timer.stage("stdlib encode"):
+            encoded = [json.dumps(entry) for _, entry in students]
+        with timer.stage("stdlib decode"):
+            expected = [json.loads(value)["Assignments"] for value in encoded]
+        with timer.stage("stdlib studentScore"):
+            assert json.loads(json.dumps(document, indent=4)) == document
+        for name, (dumpb, loads) in backends:
+            with timer.stage(name + " encode"):
+                encoded = [dumpb(entry) for _, entry in students]
+            with timer.stage(name + " decode"):
+                decoded = [loads(value)["Assignments"] for value in encoded]
+            assert decoded == expected, name
+            with timer.stage(name + " studentScore"):
+                assert loads(dumpb(document)) == document, name
+        if serializer.msgspec is not None:
+            with timer.stage("typed decode"):
+                decoded = [serializer.load_assignments(value) for value in encoded]
+            assert decoded == expected
+        print("{} students: {}".format(count, timer.report()))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[1000, 10000])
+    args = arg_parser.parse_args()
+    bench(args.students)
@@ -0,0 +1,80 @@
+"""
+Benchmarks reading a synthetic grade sheet through each local sheet source
+(CSV, XLSX, Arrow IPC, Parquet) with read_gradebook, and checks that every
+backend yields the same header rows and records. Backends whose library is not
+installed are skipped.
+
+Run from dbcron/:
+    python -m benchmarks.bench_sources --students 10000 100000
+"""
+import argparse
+import csv
+import importlib.util
+import os
+import tempfile
+
+from benchmarks.synthetic import constants_rows, generate_gradebook, gradebook_rows
+from sources import ArrowSheetSource, CsvSheetSource, XlsxSheetSource, export_columnar
+from sync import StageTimer, read_gradebook_header
+
+SHEETNAME = "Grades"
+
+
+def write_exports(directory, sheets):
+    """
+    Writes {worksheet: rows} in every local format, returning {kind: source}.
+    """
+    sources = {}
+    for name, rows in sheets.items():
+        with open(os.path.join(directory, name + ".csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+    sources["csv"] = CsvSheetSource(directory)
+    try:
+        import openpyxl
+    except ImportError:
+        print("openpyxl not installed, skipping xlsx")
+    else:
+        workbook = openpyxl.Workbook(write_only=True)
+        for name, rows in sheets.items():
+            worksheet = workbook.create_sheet(name)
+            for row in rows:
+                worksheet.append(row)
+        workbook.save(os.path.join(directory, "export.xlsx"))
+        sources["xlsx"] = XlsxSheetSource(os.path.join(directory, "export.xlsx"))
+    if importlib.util.find_spec("pyarrow") is None:
+        print("pyarrow not installed, skipping arrow and parquet")
+    else:
+        for file_format in ("arrow", "parquet"):
+            for name, rows in sheets.items():
+                export_columnar(rows, os.path.join(directory, "{}.{}".format(name, file_format)), file_format)
+            sources[file_format] = ArrowSheetSource(directory, file_format)
+    return sources
+
+
+def read_gradebook(source, worksheet, *header_layout):
+    # The header rows and every record at once.
+    return read_gradebook_header(source, worksheet, *header_layout) + (source.get_all_records(worksheet),)
+
+
+def bench(student_counts):
+    for count in student_counts:
+        categories, concepts, max_points, records = generate_gradebook(count)
+        sheets = {SHEETNAME: gradebook_rows(categories, concepts, max_points, records), "Constants": constants_rows()}
+        with tempfile.TemporaryDirectory() as directory:
+            sources = write_exports(directory, sheets)
+            timer = StageTimer()
+            results = {}
+            for kind, source in sources.items():
+                with timer.stage(kind):
+                    results[kind] = read_gradebook(source, SHEETNAME, 2, 2, 1, 2, 3, 2)
+            expected = results["csv"]
+            for kind, result in results.items():
+                assert result == expected, "{} read differs from csv".format(kind)
+            print("{} students: {}".format(count, timer.report()))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[10000, 100000])
+    args = arg_parser.parse_args()
+    bench(args.students)
@@ -0,0 +1,71 @@
+"""
+Benchmarks computing every student's course totals, percentage of max points
+so far and letter grade: a per-student loop doing what the API and website do
+on each page load (sum the scores, scan the bins in order) against
+student_totals.compute_summaries over the whole roster. Both must agree. The
+score matrix is timed on its own since update_db shares it with the score
+columns.
+
+Run from dbcron/:
+    python -m benchmarks.bench_student_totals --students 10000
+"""
+import argparse
+import copy
+
+from benchmarks.synthetic import generate_gradebook
+from score_columns import score_matrix
+from student_totals import MAX_POINTS_KEY, compute_summaries
+from sync import StageTimer, transform_records
+
+BINS = [{"letter": letter, "points": points} for letter, points in (
+    ("F", 199), ("D", 239), ("C-", 279), ("C", 299), ("C+", 319), ("B-", 339), ("B", 359), ("B+", 379),
+    ("A-", 399), ("A", 419), ("A+", 440))]
+
+
+def _points(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def per_student(students, bins):
+    max_scores = dict(students)[MAX_POINTS_KEY]["Assignments"]
+    max_points_so_far = sum(_points(points) for scores in max_scores.values() for points in scores.values())
+    results = {}
+    for email, entry in students:
+        category_totals = {category: sum(_points(points) for points in scores.values())
+                           for category, scores in entry["Assignments"].items()}
+        total = sum(category_totals.values())
+        letter = bins[-1]["letter"]
+        for grade_bin in bins:
+            if total <= grade_bin["points"]:
+                letter = grade_bin["letter"]
+                break
+        results[email] = (total, total / max_points_so_far * 100, letter)
+    return results
+
+
+def bench(student_counts):
+    for count in student_counts:
+        categories, concepts, _, records = generate_gradebook(count)
+        students = list(transform_records(copy.deepcopy(records), categories, concepts))
+        timer = StageTimer()
+        with timer.stage("per student"):
+            expected = per_student(students, BINS)
+        with timer.stage("score matrix"):
+            scores = score_matrix(students, categories, concepts, students_only=False)
+        with timer.stage("vectorized summaries"):
+            summaries = compute_summaries(students, categories, concepts, BINS, scores)
+        for email, (total, percentage, letter) in expected.items():
+            summary = summaries[email]
+            assert abs(summary["Total"] - total) < 1e-6 and summary["Letter Grade"] == letter, email
+            assert abs(summary["Percentage"] - percentage) < 0.01, email
+        print("{} students: {}".format(count, timer.report()))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[10000])
+    args = arg_parser.parse_args()
+    bench(args.students)
@@ -0,0 +1,138 @@
+"""
+Benchmarks sync_courses.sync_courses on several synthetic courses: one at a
+time (--workers 1, like the sequential containers it replaces) against all at
+once, sharing one token bucket. Each course reads CSV exports through a
+source that sleeps --latency-ms per Sheets request, and writes to its own
+databases of an in-process fakeredis server. Both runs must store the same
+data. A third run repeats the concurrent one against the sheets it already
+synced, which costs each course one revision request and writes nothing.
+
+Run from dbcron/:
+    python -m benchmarks.bench_sync_courses --courses 7 --students 2000
+    python -m benchmarks.bench_sync_courses --requests-per-minute 60
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+import fakeredis
+
+from benchmarks.bench_update_bins import SlowSource
+from benchmarks.synthetic import constants_rows, iter_gradebook_rows
+from courses import check_databases, course_from_env
+from rate_limit import TokenBucket
+from sources import CsvSheetSource
+from sync_courses import sync_courses
+
+SHEETNAME = "Grades"
+
+
+class PacedSource(SlowSource):
+    """
+    SlowSource that also takes a rate limiter token per request, and counts
+    one request per chunk of records the way GoogleSheetSource reads them.
+    """
+    def __init__(self, directory, latency, rate_limiter):
+        super().__init__(directory, latency)
+        self.rate_limiter = rate_limiter
+        self._revision = None
+
+    def _request(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def revision(self):
+        # GoogleSheetSource asks Drive once per source.
+        if self._revision is None:
+            self._request()
+            self._revision = super().revision()
+        return self._revision
+
+    def get_head(self, worksheet, count):
+        self._request()
+        return super().get_head(worksheet, count)
+
+    def batch_get(self, worksheet, ranges):
+        self._request()
+        return [CsvSheetSource.get_values(self, worksheet, cell_range) for cell_range in ranges]
+
+    def iter_records(self, worksheet, chunk_size):
+        for records in super().iter_records(worksheet, chunk_size):
+            self._request()
+            yield records
+
+
+def make_courses(directory, course_count, student_count):
+    courses = []
+    for index in range(course_count):
+        path = os.path.join(directory, "course{}".format(index))
+        os.makedirs(path)
+        with open(os.path.join(path, SHEETNAME + ".csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(iter_gradebook_rows(student_count, seed=index))
+        with open(os.path.join(path, "Constants.csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(constants_rows(seed=index))
+        courses.append(course_from_env(name="course{}".format(index), sheet=SHEETNAME, source="csv",
+                                       source_path=path, db=2 * index, bins_db=2 * index + 1))
+    check_databases(courses)  # seven courses at most: 14 and 15 are the staging databases
+    return courses
+
+
+def stored(server, courses):
+    """
+    Returns every string key of every course database, for comparing runs.
+    """
+    data = {}
+    for course in courses:
+        for db in (course.db, course.bins_db):
+            client = fakeredis.FakeRedis(server=server, db=db)
+            keys = sorted(key for key in client.scan_iter(count=1000) if client.type(key) == b"string")
+            data[db] = dict(zip(keys, client.mget(keys))) if keys else {}
+    return data
+
+
+def bench(course_count, student_count, workers, latency_ms, requests_per_minute, burst):
+    with tempfile.TemporaryDirectory() as directory:
+        courses = make_courses(directory, course_count, student_count)
+        results = {}
+        server = None
+        for label, pool_size in (("sequential", 1), ("concurrent", workers), ("unchanged", workers)):
+            if label != "unchanged":
+                server = fakeredis.FakeServer()
+            rate_limiter = TokenBucket.per_minute(requests_per_minute, burst)
+            sources = []
+
+            def open_source(course, limiter):
+                source = PacedSource(course.source_path, latency_ms / 1000, limiter)
+                sources.append(source)
+                return source
+
+            start = time.perf_counter()
+            timings = sync_courses(courses, pool_size, rate_limiter, incremental=False,
+                                   connect=lambda db: fakeredis.FakeRedis(server=server, db=db),
+                                   open_source=open_source)
+            wall = time.perf_counter() - start
+            errors = [error for _, error in timings.values() if error]
+            assert not errors, errors
+            results[label] = stored(server, courses)
+            print("{:<11} {:>3} workers: {:6.2f}s wall, slowest course {:5.2f}s, sum of courses {:6.2f}s, "
+                  "{} requests".format(label, pool_size, wall, max(seconds for seconds, _ in timings.values()),
+                                       sum(seconds for seconds, _ in timings.values()),
+                                       sum(source.calls for source in sources)))
+        assert results["sequential"] == results["concurrent"], "concurrent sync stored different data"
+        assert results["concurrent"] == results["unchanged"], "unchanged sheets were synced again"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--courses", type=int, default=7)
+    arg_parser.add_argument("--students", type=int, default=2000)
+    arg_parser.add_argument("--workers", type=int, default=8)
+    arg_parser.add_argument("--latency-ms", type=float, default=300, help="simulated Sheets round trip")
+    arg_parser.add_argument("--requests-per-minute", type=float, default=600)
+    arg_parser.add_argument("--burst", type=int, default=10)
+    args = arg_parser.parse_args()
+    bench(args.courses, args.students, args.workers, args.latency_ms, args.requests_per_minute, args.burst)
@@ -0,0 +1,71 @@
+"""
+Benchmarks the Constants sheet reads of update_bins: one get_values call per
+row (as the original row_values loop did) against a single batched read of
+A16:B61, on a CSV stand-in for the sheet with a simulated per-call API
+latency. Both must parse to the same bins and assignment points.
+
+Run from dbcron/:
+    python -m benchmarks.bench_update_bins --latency-ms 150
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import constants_rows
+from sources import CsvSheetSource
+from sync import StageTimer, parse_assignment_points, parse_grade_bins
+
+
+class SlowSource(CsvSheetSource):
+    """
+    CsvSheetSource that sleeps once per round trip and counts them.
+    """
+    def __init__(self, directory, latency):
+        super().__init__(directory)
+        self.latency = latency
+        self.calls = 0
+
+    def get_values(self, worksheet, cell_range):
+        self.calls += 1
+        time.sleep(self.latency)
+        return super().get_values(worksheet, cell_range)
+
+    def batch_get(self, worksheet, ranges):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [CsvSheetSource.get_values(self, worksheet, cell_range) for cell_range in ranges]
+
+
+def per_row(source):
+    rows = [source.get_values("Constants", "A{0}:B{0}".format(row)) for row in range(16, 62)]
+    rows = [row[0] if row else [] for row in rows]
+    return parse_grade_bins(rows, 16, 51, 61)[0], parse_assignment_points(rows, 16, 16, 49)
+
+
+def batched(source):
+    rows, = source.batch_get("Constants", ["A16:B61"])
+    return parse_grade_bins(rows, 16, 51, 61)[0], parse_assignment_points(rows, 16, 16, 49)
+
+
+def bench(latency_ms):
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "Constants.csv"), "w", newline="") as f:
+            csv.writer(f).writerows(constants_rows())
+        timer = StageTimer()
+        results = {}
+        for name, read in (("per row", per_row), ("batched", batched)):
+            source = SlowSource(directory, latency_ms / 1000)
+            with timer.stage(name):
+                results[name] = read(source)
+            print("{}: {} API calls".format(name, source.calls))
+        assert results["per row"] == results["batched"], "batched read parsed differently"
+        print("Timings: {}".format(timer.report()))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--latency-ms", type=float, default=150)
+    args = arg_parser.parse_args()
+    bench(args.latency_ms)
@@ -0,0 +1,88 @@
+"""
+Benchmarks the student write stage of update_db: one SET per student (the
+original loop) against chunked MSET via write_entries, and a full
+sync.sync_entries run against an incremental one after a small fraction of
+scores changed, on synthetic rosters.
+
+Uses an in-process fakeredis server unless --redis-url points at a real one
+(e.g. a local redis-server, where round trips dominate). Run from dbcron/:
+    python -m benchmarks.bench_update_db --students 10000 100000
+    python -m benchmarks.bench_update_db --redis-url redis://localhost:6379/15
+"""
+import argparse
+import copy
+import json
+
+from benchmarks.synthetic import generate_gradebook
+from sync import StageTimer, build_category_scores, sync_entries, transform_records
+
+
+def connect(redis_url):
+    if redis_url:
+        import redis
+        return redis.Redis.from_url(redis_url)
+    import fakeredis
+    return fakeredis.FakeRedis()
+
+
+def write_entries(redis_client, entries, chunk_size):
+    """
+    Writes (key, value) pairs with one MSET per chunk, the write stage before
+    sync.ChunkedSync compared content hashes.
+    """
+    chunk = {}
+    for key, value in entries:
+        chunk[key] = value
+        if len(chunk) >= chunk_size:
+            redis_client.mset(chunk)
+            chunk = {}
+    if chunk:
+        redis_client.mset(chunk)
+
+
+def with_changed_scores(records, concepts, fraction):
+    changed = copy.deepcopy(records)
+    step = max(1, int(1 / fraction)) if fraction else len(changed) + 1
+    for record in changed[2::step]:
+        record[concepts[0]] = -1
+    return changed
+
+
+def bench(student_counts, chunk_sizes, redis_url, changed_fraction):
+    redis_client = connect(redis_url)
+    for count in student_counts:
+        categories, concepts, max_points, records = generate_gradebook(count)
+
+        timer = StageTimer()
+        with timer.stage("transform"):
+            build_category_scores(categories, concepts, max_points)
+            entries = [(email, json.dumps(entry))
+                       for email, entry in transform_records(copy.deepcopy(records), categories, concepts)]
+        redis_client.flushdb()
+        with timer.stage("write (SET per key)"):
+            for email, value in entries:
+                redis_client.set(email, value)
+        for chunk_size in chunk_sizes:
+            redis_client.flushdb()
+            with timer.stage("write (MSET x{})".format(chunk_size)):
+                write_entries(redis_client, entries, chunk_size)
+
+        redis_client.flushdb()
+        with timer.stage("sync (full)"):
+            sync_entries(redis_client, entries, chunk_sizes[-1], incremental=False)
+        changed_entries = [(email, json.dumps(entry)) for email, entry in transform_records(
+            with_changed_scores(records, concepts, changed_fraction), categories, concepts)]
+        with timer.stage("sync (incremental, {:.1%} changed)".format(changed_fraction)):
+            changes = sync_entries(redis_client, changed_entries, chunk_sizes[-1])
+        print("{} students: {} [{} keys rewritten]".format(count, timer.report(), len(changes.changed)))
+    redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[10000, 100000])
+    arg_parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 1000])
+    arg_parser.add_argument("--redis-url")
+    arg_parser.add_argument("--changed-fraction", type=float, default=0.01)
+    args = arg_parser.parse_args()
+    bench(args.students, args.chunk_sizes, args.redis_url, args.changed_fraction)
@@ -0,0 +1,71 @@
+"""
+Synthetic grade sheets for the dbcron benchmarks, in the spirit of
+generateData.py: random scores for a configurable roster and assignment list.
+"""
+import random
+
+CATEGORIES = ("Quest", "Midterm", "Postterm", "Projects", "Labs")
+
+
+def generate_gradebook(student_count, assignment_count=40, seed=0):
+    """
+    Returns (categories, concepts, max_points, records) shaped like the grade
+    sheet's header rows and Worksheet.get_all_records() output.
+    """
+    rng = random.Random(seed)
+    categories = [CATEGORIES[i % len(CATEGORIES)] for i in range(assignment_count)]
+    concepts = ["Assignment {}".format(i) for i in range(assignment_count)]
+    max_points = [str(rng.choice((5, 10, 20, 25))) for _ in range(assignment_count)]
+
+    records = [dict({"Email": "CATEGORY", "Legal Name": ""}, **dict(zip(concepts, categories))),
+               dict({"Email": "MAX POINTS", "Legal Name": ""}, **{c: int(p) for c, p in zip(concepts, max_points)})]
+    for i in range(student_count):
+        record = {"Email": "student{}@berkeley.edu".format(i), "Legal Name": "Student {}".format(i)}
+        for concept, points in zip(concepts, max_points):
+            record[concept] = rng.randint(0, int(points)) if rng.random() > 0.05 else ""
+        records.append(record)
+    return categories, concepts, max_points, records
+
+
+def gradebook_rows(categories, concepts, max_points, records):
+    """
+    Returns the gradebook as a list of string rows, as a sheet export would
+    contain it: the concepts header, then the CATEGORY and MAX POINTS rows
+    and the students from records.
+    """
+    rows = [["Email", "Legal Name"] + list(concepts)]
+    for record in records:
+        rows.append([record["Email"], record["Legal Name"]] + [str(record[concept]) for concept in concepts])
+    return rows
+
+
+def iter_gradebook_rows(student_count, assignment_count=40, seed=0):
+    """
+    Yields the same kind of sheet rows as gradebook_rows one at a time,
+    without building the roster in memory.
+    """
+    rng = random.Random(seed)
+    categories = [CATEGORIES[i % len(CATEGORIES)] for i in range(assignment_count)]
+    concepts = ["Assignment {}".format(i) for i in range(assignment_count)]
+    max_points = [rng.choice((5, 10, 20, 25)) for _ in range(assignment_count)]
+    yield ["Email", "Legal Name"] + concepts
+    yield ["CATEGORY", ""] + categories
+    yield ["MAX POINTS", ""] + [str(points) for points in max_points]
+    for i in range(student_count):
+        yield (["student{}@berkeley.edu".format(i), "Student {}".format(i)] +
+               [str(rng.randint(0, points)) if rng.random() > 0.05 else "" for points in max_points])
+
+
+def constants_rows(assignment_count=30, seed=0):
+    """
+    Returns the Constants sheet as a list of rows: assignment name/points from
+    row 16 and letter grade bins (points, letter) in rows 51-61.
+    """
+    rng = random.Random(seed)
+    rows = [[] for _ in range(61)]
+    for i in range(min(assignment_count, 34)):
+        rows[15 + i] = ["Assignment {}".format(i), str(rng.choice((5, 10, 20, 25)))]
+    for i, (points, letter) in enumerate(((0, "F"), (60, "D"), (70, "C-"), (73, "C"), (77, "C+"), (80, "B-"),
+                                          (83, "B"), (87, "B+"), (90, "A-"), (93, "A"), (97, "A+"))):
+        rows[50 + i] = [str(points), letter]
+    return rows
@@ -0,0 +1,138 @@
+"""
+Course registry for syncing many grade sheets from one process.
+
+COURSE_REGISTRY names a JSON file listing the courses to sync:
+
+    [{"name": "cs10", "spreadsheet_id": "1AbC...", "sheet": "CS10 Grades", "db": 0, "bins_db": 1},
+     {"name": "cs61c", "spreadsheet_id": "1XyZ...", "sheet": "Gradebook", "db": 2, "bins_db": 3}]
+
+Each course owns a pair of Redis databases, its namespace: students and the
+Categories record go to db, the grade bins to bins_db. No two courses may
+share a database, since a sync deletes the keys it manages that its sheet no
+longer has, and none may use the staging pair (STAGING_DBINDEX and
+BINS_STAGING_DBINDEX, default 14 and 15) that the hourly reload of
+manual_update_flush.py flushes. Any other field of Course may be set per
+course; fields left out default to the environment variables the
+single-course jobs read.
+
+Without a registry, course_from_env() describes the one course configured
+through SPREADSHEET_ID, SPREADSHEET_SHEETNAME, SERVER_DBINDEX and
+BINS_DBINDEX.
+"""
+import json
+import os
+from collections import namedtuple
+
+from sources import open_source
+
+STAGING_DB = int(os.getenv("STAGING_DBINDEX", "14"))
+BINS_STAGING_DB = int(os.getenv("BINS_STAGING_DBINDEX", "15"))
+
+FIELDS = ("name", "spreadsheet_id", "sheet", "db", "bins_db", "source", "source_path",
+          "category_row", "category_col", "concepts_row", "concepts_col", "max_points_row", "max_points_col",
+          "bins_start_row", "bins_end_row", "bins_points_col", "bins_grades_col")
+
+# Environment variable and default of every field but name.
+_ENVIRONMENT = {
+    "spreadsheet_id": ("SPREADSHEET_ID", None),
+    "sheet": ("SPREADSHEET_SHEETNAME", None),
+    "db": ("SERVER_DBINDEX", "0"),
+    "bins_db": ("BINS_DBINDEX", "1"),
+    "source": ("SHEET_SOURCE", "google"),
+    "source_path": ("SHEET_SOURCE_PATH", None),
+    "category_row": ("ASSIGNMENT_CATEGORYROW", "2"),
+    "category_col": ("ASSIGNMENT_CATEGORYCOL", "2"),
+    "concepts_row": ("ASSIGNMENT_CONCEPTSROW", "1"),
+    "concepts_col": ("ASSIGNMENT_CONCEPTSCOL", "2"),
+    "max_points_row": ("ASSIGNMENT_MAXPOINTSROW", "3"),
+    "max_points_col": ("ASSIGNMENT_MAXPOINTSCOL", "2"),
+    "bins_start_row": ("BINS_START_ROW", "51"),
+    "bins_end_row": ("BINS_END_ROW", "61"),
+    "bins_points_col": ("BINS_POINTS_COL", "0"),
+    "bins_grades_col": ("BINS_GRADES_COL", "1"),
+}
+_TEXT_FIELDS = ("name", "spreadsheet_id", "sheet", "source", "source_path")
+
+
+class Course(namedtuple("Course", FIELDS)):
+    __slots__ = ()
+
+    @property
+    def header_layout(self):
+        """
+        The read_gradebook_header arguments after the worksheet name.
+        """
+        return (self.category_row, self.category_col, self.concepts_row, self.concepts_col,
+                self.max_points_row, self.max_points_col)
+
+    def open_source(self, rate_limiter=None):
+        return open_source(self.source, self.source_path, self.spreadsheet_id, rate_limiter)
+
+    def log(self, message):
+        # Courses synced concurrently interleave their output.
+        print("[{}] {}".format(self.name, message) if self.name else message)
+
+
+def course_from_env(**fields):
+    """
+    Returns a Course whose fields not given come from the environment.
+    """
+    values = {"name": fields.pop("name", "")}
+    for field, (variable, default) in _ENVIRONMENT.items():
+        value = fields.pop(field) if field in fields else os.getenv(variable, default)
+        if value is not None and field not in _TEXT_FIELDS:
+            value = int(value)
+        values[field] = value
+    if fields:
+        raise ValueError("Unknown course fields: {}".format(", ".join(sorted(fields))))
+    return Course(**values)
+
+
+def load_registry(path):
+    """
+    Returns the Courses listed in a registry file, checking that names are
+    unique and the databases pass check_databases.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    courses = []
+    for index, entry in enumerate(entries):
+        for field in ("name", "db", "bins_db"):
+            if field not in entry:
+                raise ValueError("Course {} in {} has no {!r}".format(index, path, field))
+        courses.append(course_from_env(**entry))
+
+    names = set()
+    for course in courses:
+        if course.name in names:
+            raise ValueError("Course {!r} is listed twice in {}".format(course.name, path))
+        names.add(course.name)
+    check_databases(courses)
+    return courses
+
+
+def check_databases(courses):
+    """
+    Raises ValueError when two databases of the courses, or of one course,
+    coincide, or one is a staging database.
+    """
+    databases = {STAGING_DB: "the staging databases", BINS_STAGING_DB: "the staging databases"}
+    for course in courses:
+        for db in (course.db, course.bins_db):
+            if db in databases:
+                raise ValueError("Course {!r} uses Redis database {}, as does {}".format(
+                    course.name, db, databases[db]))
+            databases[db] = "course {!r}".format(course.name)
+
+
+def registered_courses():
+    """
+    Returns the courses of COURSE_REGISTRY, or the environment's one course
+    when it is not set.
+    """
+    path = os.getenv("COURSE_REGISTRY")
+    if path:
+        return load_registry(path)
+    courses = [course_from_env()]
+    check_databases(courses)
+    return courses
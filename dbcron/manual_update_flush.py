@@ -1,11 +1,137 @@
-from update_db import update_redis
-from flush_db import flush_redis_db
-from update_bins import update_bins
-import redis
+import argparse
 import os
 from dotenv import load_dotenv
 load_dotenv()
+
+from courses import BINS_STAGING_DB, STAGING_DB, registered_courses
+from sync import LOCK_TTL, MIN_RATIO, SyncLock, connect_redis, count_students, swap_databases, validate_snapshot
+
+SWAP_MIN_RATIO = float(os.getenv("SWAP_MIN_RATIO", str(MIN_RATIO)))
+# How long a reload waits for a running sync of the same databases to finish.
+LOCK_WAIT = float(os.getenv("RELOAD_LOCK_WAIT", str(LOCK_TTL)))
+
+
+def lock_live_databases(*clients):
+    """
+    Takes the sync lock of each live database, waiting for running syncs.
+    Returns the locks, or None (holding nothing) if one stayed taken.
+    """
+    locks = []
+    for client in clients:
+        lock = SyncLock(client)
+        if not lock.acquire(wait=LOCK_WAIT):
+            for held in locks:
+                held.release()
+            return None
+        locks.append(lock)
+    return locks
+
+
+def flush_and_reload(course, connect=connect_redis):
+    """
+    Empties the course's live databases and rebuilds them in place. Readers see
+    an empty or partial dataset until the reload finishes.
+    """
+    from update_db import update_redis
+    from update_bins import update_bins
+
+    client = connect(course.db)
+    bins_client = connect(course.bins_db)
+    locks = lock_live_databases(client, bins_client)
+    if locks is None:
+        course.log("Another sync kept the databases locked, not reloading")
+        return False
+    students_lock, bins_lock = locks
+    try:
+        client.flushdb()
+        # FLUSHDB dropped the students lock with everything else.
+        if not students_lock.acquire(wait=LOCK_WAIT):
+            course.log("Another sync took the flushed database, not reloading")
+            return False
+        source = course.open_source()
+        # force: the bins database is not flushed and still records its last sync
+        # bins first, so the student summaries get letter grades
+        update_bins(target_client=bins_client, incremental=False, source=source, course=course, force=True,
+                    lock=bins_lock)
+        update_redis(target_client=client, incremental=False, source=source, bins_client=bins_client, course=course,
+                     force=True, lock=students_lock)
+    finally:
+        students_lock.release()
+        bins_lock.release()
+    return True
+
+
+def build_and_swap(course, connect=connect_redis):
+    """
+    Builds a complete snapshot of the course in the staging databases,
+    validates it, then swaps it with the live databases atomically. Readers
+    only ever see the old or the new snapshot. The live databases stay locked
+    from the build to the swap, so a sync cannot write data the swap then moves
+    to staging.
+    """
+    from update_db import update_redis
+    from update_bins import update_bins
+
+    live_client = connect(course.db)
+    staging_client = connect(STAGING_DB)
+    bins_staging_client = connect(BINS_STAGING_DB)
+
+    locks = lock_live_databases(live_client, connect(course.bins_db))
+    if locks is None:
+        course.log("Another sync kept the databases locked, not publishing a snapshot")
+        return False
+    students_lock, bins_lock = locks
+    try:
+        staging_client.flushdb()
+        bins_staging_client.flushdb()
+        # Full writes: the staging databases start empty, and each logs a "full"
+        # changelog entry that readers of the swapped-in stream invalidate on.
+        source = course.open_source()
+        update_bins(target_client=bins_staging_client, incremental=False, source=source, course=course, force=True,
+                    lock=bins_lock)
+        update_redis(target_client=staging_client, incremental=False, source=source, bins_client=bins_staging_client,
+                     course=course, force=True, lock=students_lock)
+
+        problems = validate_snapshot(staging_client, bins_staging_client, count_students(live_client), SWAP_MIN_RATIO)
+        if problems:
+            course.log("Not publishing snapshot: {}".format("; ".join(problems)))
+            return False
+
+        swap_databases(live_client, [(course.db, STAGING_DB), (course.bins_db, BINS_STAGING_DB)])
+        # The staging databases now hold the previous snapshot, and the locks.
+        staging_client.flushdb()
+        bins_staging_client.flushdb()
+    finally:
+        students_lock.release()
+        bins_lock.release()
+    course.log("Published new snapshot to databases {} and {}".format(course.db, course.bins_db))
+    return True
+
+
+def reload_courses(courses, mode="swap", connect=connect_redis):
+    """
+    Reloads each course in turn, since all of them share the staging
+    databases. Returns the names of the courses that were not reloaded; one
+    failing does not stop the others.
+    """
+    reload = flush_and_reload if mode == "flush" else build_and_swap
+    failed = []
+    for course in courses:
+        try:
+            reloaded = reload(course, connect)
+        except Exception as e:
+            course.log("Reload failed: {}: {}".format(type(e).__name__, e))
+            reloaded = False
+        if not reloaded:
+            failed.append(course.name)
+    return failed
+
+
 if __name__ == "__main__":
-    flush_redis_db()
-    update_redis()
-    update_bins()
+    arg_parser = argparse.ArgumentParser(description="Reload every registered course's grade data into Redis.")
+    arg_parser.add_argument("--mode", choices=("swap", "flush"), default="swap",
+                            help="swap: build in staging databases and SWAPDB (default); "
+                                 "flush: FLUSHDB the live database and reload in place")
+    args = arg_parser.parse_args()
+    if reload_courses(registered_courses(), args.mode):
+        raise SystemExit(1)
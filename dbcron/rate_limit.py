@@ -0,0 +1,93 @@
+"""
+Request pacing for the Google Sheets API.
+
+Sheets enforces per-minute read quotas per user and per project. Courses
+synced from one process share a TokenBucket, so together they stay under the
+quota however many run at once. Requests the API still rejects with 429, or
+that fail with a transient 5xx, are retried by with_backoff after a
+truncated exponential delay with jitter (honouring Retry-After when the
+response carries it), as the Sheets documentation recommends.
+"""
+import random
+import threading
+import time
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to capacity tokens, refilled at rate
+    tokens per second. acquire() blocks until a token is available.
+    """
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests, burst):
+        return cls(requests / 60.0, burst)
+
+    def acquire(self):
+        """
+        Takes one token, waiting for it if the bucket is empty. Returns the
+        seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            # Sleep outside the lock; another thread may take the token first,
+            # in which case this one goes around again.
+            self.sleep(wait)
+            waited += wait
+
+
+def response_status(error):
+    """
+    Returns the HTTP status of a failed API call, or None. Works with gspread's
+    APIError (and anything else carrying a requests response) without
+    importing gspread.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def with_backoff(call, attempts=5, base=1.0, cap=32.0, sleep=time.sleep, rng=random.random):
+    """
+    Returns call(), retrying up to attempts times in all when it fails with a
+    status in RETRY_STATUSES. The n-th retry waits a random time up to
+    min(cap, base * 2 ** n) seconds, or Retry-After when the response gives one.
+    """
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as error:
+            if response_status(error) not in RETRY_STATUSES or attempt == attempts - 1:
+                raise
+            delay = _retry_after(error)
+            if delay is None:
+                delay = rng() * min(cap, base * 2 ** attempt)
+            sleep(delay)
@@ -0,0 +1,172 @@
+"""
+Columnar per-assignment score store for the admin dashboards.
+
+Alongside the per-student records, the sync writes for every (category,
+concept):
+
+    scores:column:<field>   the students' scores as packed little-endian
+                            float64, NaN where a student has no score, in the
+                            order of scores:students
+    scores:stats:<field>    JSON with the figures the admin stats and
+                            distribution routes return: average, median, min,
+                            max, count, and 1-point frequency buckets
+                            (freq[i] counts scores in [minScore + i, minScore + i + 1));
+                            average and median are exact, and the stats route
+                            rounds them for display
+
+<field> is the JSON array [category, concept] with "@" escaped as \\u0040, so
+the key never matches the "*@*" pattern the API lists students with. The API
+builds the same field with JSON.stringify([section, name]).
+
+Sync runs stream the roster in chunks, so ScoreColumnsBuilder appends each
+chunk's scores to scratch keys in Redis and computes the statistics with NumPy
+one column at a time at the end; memory holds one chunk or one column, never
+the whole students x assignments matrix.
+"""
+import json
+
+import numpy
+
+import serializer
+
+STUDENTS_KEY = "scores:students"
+COLUMN_KEY = "scores:column:{}"
+STATS_KEY = "scores:stats:{}"
+BUILDING_KEY = "scores:building:{}"
+
+
+def field(category, concept):
+    return json.dumps([category, concept], ensure_ascii=False, separators=(",", ":")).replace("@", "\\u0040")
+
+
+def parse_score(value):
+    # Same filter as the API's parseScore: skip missing, blank and non-numeric scores.
+    if isinstance(value, bool) or value is None:
+        return numpy.nan
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        return numpy.nan
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _grouped(categories, concepts):
+    grouped = {}
+    for category, concept in zip(categories, concepts):
+        grouped.setdefault(category, {})[concept] = None
+    return grouped
+
+
+def assignment_pairs(categories, concepts):
+    """
+    Returns the distinct (category, concept) pairs grouped by category, the
+    column order of score_matrix.
+    """
+    return [(category, concept) for category, category_concepts in _grouped(categories, concepts).items()
+            for concept in category_concepts]
+
+
+def score_matrix(students, categories, concepts, students_only=True):
+    """
+    Returns (emails, pairs, matrix) for (email, student entry) pairs: the
+    students that are real accounts (their key contains "@"; every row when
+    students_only is false), the distinct (category, concept) pairs grouped by
+    category, and a float64 matrix with one row per student and one column per
+    pair.
+    """
+    grouped = _grouped(categories, concepts)
+    pairs = assignment_pairs(categories, concepts)
+    emails = []
+    rows = []
+    for email, entry in students:
+        if students_only and "@" not in email:
+            continue
+        emails.append(email)
+        assignments = entry["Assignments"]
+        # transform_records builds every entry in pairs order, so the scores
+        # can be read off in dict order; anything else is looked up.
+        row = [score for scores in assignments.values() for score in scores.values()]
+        if len(row) != len(pairs) or list(assignments) != list(grouped):
+            row = [assignments.get(category, {}).get(concept) for category, concept in pairs]
+        rows.append(row)
+    values = [score if score.__class__ is int else parse_score(score) for row in rows for score in row]
+    matrix = numpy.array(values, dtype=numpy.float64).reshape(len(emails), len(pairs))
+    return emails, pairs, matrix
+
+
+def column_stats(column):
+    """
+    Returns the stats/distribution figures for one column of scores.
+    """
+    scores = column[~numpy.isnan(column)]
+    if not scores.size:
+        return {"average": 0, "max": 0, "min": 0, "median": 0, "count": 0, "freq": [], "minScore": 0, "maxScore": 0}
+    min_score = scores.min()
+    max_score = scores.max()
+    freq = numpy.bincount(numpy.floor(scores - min_score).astype(numpy.int64))
+    return {
+        "average": _number(scores.mean()),
+        "max": _number(max_score),
+        "min": _number(min_score),
+        "median": _number(numpy.median(scores)),
+        "count": int(scores.size),
+        "freq": freq.tolist(),
+        "minScore": _number(min_score),
+        "maxScore": _number(max_score),
+    }
+
+
+class ScoreColumnsBuilder:
+    """
+    Collects score_matrix chunks in scratch keys and yields the columnar
+    store's (key, value) entries once every chunk is in.
+    """
+    def __init__(self, redis_client, categories, concepts):
+        self.redis_client = redis_client
+        self.pairs = assignment_pairs(categories, concepts)
+        self.student_count = 0
+        self._scratch_keys = [BUILDING_KEY.format("students")] + [
+            BUILDING_KEY.format(COLUMN_KEY.format(field(category, concept))) for category, concept in self.pairs]
+        redis_client.delete(*self._scratch_keys)
+
+    def add(self, scores):
+        """
+        Appends one chunk of score_matrix output; rows whose key is not an
+        email (e.g. MAX POINTS) are left out.
+        """
+        emails, pairs, matrix = scores
+        if pairs != self.pairs:
+            raise ValueError("score chunk columns do not match the sheet header")
+        accounts = [row for row, email in enumerate(emails) if "@" in email]
+        if not accounts:
+            return
+        matrix = matrix[accounts]
+        emails = serializer.dumpb([emails[row] for row in accounts])
+        pipeline = self.redis_client.pipeline(transaction=False)
+        # The students key holds a JSON list: "[a,b" then ",c,d" ... "]".
+        pipeline.append(self._scratch_keys[0], (emails[:-1] if not self.student_count else b"," + emails[1:-1]))
+        for index, scratch_key in enumerate(self._scratch_keys[1:]):
+            pipeline.append(scratch_key, numpy.ascontiguousarray(matrix[:, index]).astype("<f8").tobytes())
+        pipeline.execute()
+        self.student_count += len(accounts)
+
+    def entries(self):
+        """
+        Yields the (key, value) entries, reading one scratch column at a time,
+        and removes the scratch keys.
+        """
+        redis_client = self.redis_client
+        students = redis_client.get(self._scratch_keys[0]) if self.student_count else b"["
+        yield STUDENTS_KEY, students + b"]"
+        for (category, concept), scratch_key in zip(self.pairs, self._scratch_keys[1:]):
+            packed = redis_client.get(scratch_key) or b""
+            column = numpy.frombuffer(packed, dtype="<f8")
+            yield COLUMN_KEY.format(field(category, concept)), packed
+            yield STATS_KEY.format(field(category, concept)), serializer.dumpb(column_stats(column))
+        redis_client.delete(*self._scratch_keys)
@@ -0,0 +1,117 @@
+"""
+JSON encoding and decoding for the sync jobs.
+
+Student records, the Categories and bins records, score column stats and
+changelog entries are all encoded here. It uses orjson when installed, then
+msgspec, then the standard library; JSON_BACKEND=orjson|msgspec|json picks one
+explicitly. As in progressReport/serializer.py, dumpb returns compact UTF-8
+bytes, ready for Redis, and dumps the same as a string; both indent by 2
+spaces when JSON_DEBUG is set. Decoding errors are always raised as
+ValueError.
+
+Student records are decoded against a typed schema when msgspec is installed,
+so only the "Assignments" field is built and the rest of the record is skipped.
+"""
+import json
+import os
+from typing import Any, Dict
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ("orjson", "msgspec", "json")
+DEBUG = os.getenv("JSON_DEBUG", "").lower() in ("1", "true")
+
+
+def _orjson_codec(debug):
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if debug else 0)
+
+    def dumpb(obj):
+        return orjson.dumps(obj, option=option)
+
+    return dumpb, orjson.loads
+
+
+def _msgspec_codec(debug):
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumpb(obj):
+        data = encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if debug else data
+
+    def loads(data):
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as error:
+            raise ValueError(str(error)) from error
+
+    return dumpb, loads
+
+
+def _json_codec(debug):
+    indent, separators = (2, None) if debug else (None, (",", ":"))
+
+    def dumpb(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+
+    return dumpb, json.loads
+
+
+def select_backend(name="auto"):
+    """
+    Returns the backend name to use for name: "auto" picks the first of
+    BACKENDS that is installed.
+    """
+    if name == "auto":
+        for backend in BACKENDS[:-1]:
+            try:
+                __import__(backend)
+            except ImportError:
+                continue
+            return backend
+        return "json"
+    if name not in BACKENDS:
+        raise ValueError("JSON_BACKEND must be one of auto, {}".format(", ".join(BACKENDS)))
+    return name
+
+
+BACKEND = select_backend(os.getenv("JSON_BACKEND", "auto"))
+_CODECS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "json": _json_codec}
+# dumpb(obj) returns UTF-8 encoded JSON bytes; loads accepts bytes or str.
+dumpb, loads = _CODECS[BACKEND](DEBUG)
+
+
+def dumps(obj):
+    """
+    Returns obj as a JSON string.
+    """
+    return dumpb(obj).decode("utf-8")
+
+if msgspec is not None:
+    class StudentRecord(msgspec.Struct):
+        Assignments: Dict[str, Dict[str, Any]]
+
+    _student_record_decoder = msgspec.json.Decoder(StudentRecord)
+
+
+def load_assignments(data):
+    """
+    Returns the {category: {concept: score}} "Assignments" of a JSON student
+    record. Raises ValueError for documents that are not student records.
+    """
+    if msgspec is None:
+        record = loads(data)
+        if type(record) is not dict or type(record.get("Assignments")) is not dict:
+            raise ValueError("not a student record")
+        return record["Assignments"]
+    try:
+        return _student_record_decoder.decode(data).Assignments
+    except msgspec.DecodeError as error:
+        raise ValueError(str(error)) from error
@@ -0,0 +1,444 @@
+"""
+Where the sync jobs read spreadsheet cells from.
+
+A sheet source answers A1-range reads ("A16:B61") and whole-worksheet reads
+against a named worksheet and returns rows of cell strings, trailing empty
+cells trimmed, the way gspread's Worksheet.get_values does. get_all_records
+turns the first row into keys and numericises values like gspread.
+
+Backends, picked with SHEET_SOURCE (and SHEET_SOURCE_PATH for local files):
+
+    google   the spreadsheet SPREADSHEET_ID, authorized on first read
+    csv      <path>/<worksheet>.csv exports
+    xlsx     the <path> workbook (needs openpyxl)
+    arrow    <path>/<worksheet>.arrow Arrow IPC files, memory-mapped (needs pyarrow)
+    parquet  <path>/<worksheet>.parquet files (needs pyarrow)
+
+Nothing here authenticates or imports a backend library until it is used, so
+importing the sync jobs is cheap and works offline.
+"""
+import csv
+import json
+import os
+import re
+
+from rate_limit import with_backoff
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files/{}"
+_A1_RANGE = re.compile(r"^([A-Z]+)(\d+):([A-Z]+)(\d+)$")
+
+
+def column_letter(index):
+    """
+    Returns the A1 column letter(s) for a zero-based column index.
+    """
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def parse_a1_range(cell_range):
+    """
+    Returns zero-based (first_row, first_col, last_row, last_col), inclusive.
+    """
+    match = _A1_RANGE.match(cell_range.upper())
+    if match is None:
+        raise ValueError("Unsupported range {!r}, expected e.g. 'A16:B61'".format(cell_range))
+    first_col, first_row, last_col, last_row = match.groups()
+    return int(first_row) - 1, _column_index(first_col), int(last_row) - 1, _column_index(last_col)
+
+
+def _trim(row):
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def numericise(value):
+    """
+    Converts a cell string to int or float where it parses as one, as gspread's
+    get_all_records does. Other values, including "", are returned unchanged.
+    """
+    if not isinstance(value, str) or "_" in value:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def records_from_rows(rows):
+    """
+    Returns one {header: numericised value} dict per row after the first.
+    """
+    if not rows:
+        return []
+    header = rows[0]
+    width = len(header)
+    records = []
+    for row in rows[1:]:
+        values = list(row[:width]) + [""] * (width - len(row))
+        records.append(dict(zip(header, [numericise(value) for value in values])))
+    return records
+
+
+def _cell_string(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetSource:
+    """
+    Interface for spreadsheet reads. Subclasses implement get_values and
+    get_all_values; batch_get and get_all_records may be overridden with
+    something faster.
+    """
+    def get_values(self, worksheet, cell_range):
+        raise NotImplementedError
+
+    def get_all_values(self, worksheet):
+        raise NotImplementedError
+
+    def revision(self):
+        """
+        Returns a string that changes whenever the spreadsheet's content may
+        have, from metadata only, or None when the backend cannot tell.
+        """
+        return None
+
+    def batch_get(self, worksheet, ranges):
+        return [self.get_values(worksheet, cell_range) for cell_range in ranges]
+
+    def get_head(self, worksheet, count):
+        """
+        Returns the first count rows of a worksheet.
+        """
+        return self.get_all_values(worksheet)[:count]
+
+    def get_all_records(self, worksheet):
+        return records_from_rows(self.get_all_values(worksheet))
+
+    def iter_records(self, worksheet, chunk_size):
+        """
+        Yields get_all_records() in lists of up to chunk_size records.
+        Backends override this to avoid holding the whole sheet at once.
+        """
+        records = self.get_all_records(worksheet)
+        for start in range(0, len(records), chunk_size):
+            yield records[start:start + chunk_size]
+
+
+def _records_in_chunks(rows, chunk_size):
+    # rows yields the header row first.
+    header = next(rows, None)
+    if header is None:
+        return
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield records_from_rows([header] + chunk)
+            chunk = []
+    if chunk:
+        yield records_from_rows([header] + chunk)
+
+
+class GoogleSheetSource(SheetSource):
+    """
+    Reads from a Google spreadsheet through gspread. Without a client, one is
+    authorized from the service account credentials on the first read.
+
+    Every API request first takes a token from rate_limiter (a
+    rate_limit.TokenBucket, possibly shared with other sources) when one is
+    given, and is retried with exponential backoff on quota and server errors.
+    """
+    def __init__(self, client=None, spreadsheet_id=None, credentials_json=None, scopes=None, rate_limiter=None):
+        self._client = client
+        self.spreadsheet_id = spreadsheet_id or os.getenv("SPREADSHEET_ID")
+        self.credentials_json = credentials_json
+        self.scopes = scopes
+        self.rate_limiter = rate_limiter
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._revision = None
+
+    def _request(self, call, *args, **kwargs):
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            return call(*args, **kwargs)
+
+        return with_backoff(attempt)
+
+    @property
+    def client(self):
+        if self._client is None:
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            #needs both spreadsheet and drive access or else there is a permissions error, added as a viewer on the spreadsheet
+            credentials_dict = json.loads(self.credentials_json or os.getenv("SERVICE_ACCOUNT_CREDENTIALS"))
+            scopes = self.scopes or json.loads(os.getenv("SPREADSHEET_SCOPES"))
+            credentials = Credentials.from_service_account_info(credentials_dict, scopes=scopes)
+            self._client = gspread.authorize(credentials)
+        return self._client
+
+    def worksheet(self, name):
+        if name not in self._worksheets:
+            if self._spreadsheet is None:
+                self._spreadsheet = self._request(self.client.open_by_key, self.spreadsheet_id)
+            self._worksheets[name] = self._request(self._spreadsheet.worksheet, name)
+        return self._worksheets[name]
+
+    def revision(self):
+        # The Sheets API has no revision of its own; the Drive file's version
+        # goes up on every edit. One metadata request, no cell data, made once
+        # per source so the bins and students jobs of a run share it.
+        if self._revision is None:
+            session = getattr(self.client, "http_client", self.client).session
+            response = self._request(session.get, DRIVE_FILES_URL.format(self.spreadsheet_id),
+                                     params={"fields": "version,modifiedTime", "supportsAllDrives": "true"})
+            response.raise_for_status()
+            metadata = response.json()
+            self._revision = "{}@{}".format(metadata.get("version"), metadata.get("modifiedTime"))
+        return self._revision
+
+    def get_values(self, worksheet, cell_range):
+        return [_trim(row) for row in self._request(self.worksheet(worksheet).get_values, cell_range)]
+
+    def get_all_values(self, worksheet):
+        return [_trim(row) for row in self._request(self.worksheet(worksheet).get_all_values)]
+
+    def get_head(self, worksheet, count):
+        return self.get_values(worksheet, "1:{}".format(count))
+
+    def iter_records(self, worksheet, chunk_size):
+        # One values request per chunk of rows, bounded by the sheet's grid.
+        row_count = self.worksheet(worksheet).row_count
+
+        def rows():
+            yield from self.get_head(worksheet, 1)
+            for start in range(2, row_count + 1, chunk_size):
+                yield from self.get_values(worksheet, "{}:{}".format(start, min(start + chunk_size - 1, row_count)))
+
+        return _records_in_chunks(rows(), chunk_size)
+
+    def batch_get(self, worksheet, ranges):
+        return [[_trim(row) for row in value_range]
+                for value_range in self._request(self.worksheet(worksheet).batch_get, ranges)]
+
+
+class _LocalSheetSource(SheetSource):
+    """
+    Base for file backends: loads a worksheet's rows once and slices ranges
+    out of them. get_head and iter_records stream the file instead, so they
+    never hold more than the rows they return.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._rows = {}
+
+    def iter_rows(self, worksheet):
+        raise NotImplementedError
+
+    def revision(self):
+        # Name, size and modification time of the file or of every file in
+        # the directory; a re-export changes at least the time.
+        if os.path.isdir(self.path):
+            paths = sorted(os.path.join(self.path, name) for name in os.listdir(self.path))
+        else:
+            paths = [self.path]
+        stats = []
+        for path in paths:
+            stat = os.stat(path)
+            stats.append("{}:{}:{}".format(os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+        return "|".join(stats)
+
+    def load(self, worksheet):
+        return list(self.iter_rows(worksheet))
+
+    def get_head(self, worksheet, count):
+        if worksheet in self._rows:
+            return self._rows[worksheet][:count]
+        head = []
+        for row in self.iter_rows(worksheet):
+            if len(head) >= count:
+                break
+            head.append(_trim(row))
+        return head
+
+    def iter_records(self, worksheet, chunk_size):
+        return _records_in_chunks((_trim(row) for row in self.iter_rows(worksheet)), chunk_size)
+
+    def get_all_values(self, worksheet):
+        if worksheet not in self._rows:
+            self._rows[worksheet] = [_trim(row) for row in self.load(worksheet)]
+        return self._rows[worksheet]
+
+    def get_values(self, worksheet, cell_range):
+        first_row, first_col, last_row, last_col = parse_a1_range(cell_range)
+        return [_trim(row[first_col:last_col + 1])
+                for row in self.get_all_values(worksheet)[first_row:last_row + 1]]
+
+
+class CsvSheetSource(_LocalSheetSource):
+    """
+    Reads worksheet <name> from <directory>/<name>.csv, e.g. a "Download as
+    CSV" export of each tab.
+    """
+    def iter_rows(self, worksheet):
+        with open(os.path.join(self.path, worksheet + ".csv"), newline="", encoding="utf-8") as f:
+            yield from csv.reader(f)
+
+
+class XlsxSheetSource(_LocalSheetSource):
+    """
+    Reads worksheets from an .xlsx workbook, e.g. a "Download as Microsoft
+    Excel" export of the whole spreadsheet.
+    """
+    def iter_rows(self, worksheet):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            for row in workbook[worksheet].iter_rows(values_only=True):
+                yield [_cell_string(value) for value in row]
+        finally:
+            workbook.close()
+
+
+class ArrowSheetSource(_LocalSheetSource):
+    """
+    Reads worksheet <name> from <directory>/<name>.arrow (Arrow IPC file) or
+    <name>.parquet, as written by export_columnar: one string column per sheet
+    column, named after the first row. Arrow files are memory-mapped, so
+    loading one does not copy the column buffers.
+
+    get_all_records and iter_records read whole columns (of the table or of
+    each record batch) instead of going through row lists.
+    """
+    def __init__(self, path, file_format="arrow"):
+        super().__init__(path)
+        self.file_format = file_format
+
+    def table(self, worksheet):
+        import pyarrow
+
+        path = os.path.join(self.path, "{}.{}".format(worksheet, self.file_format))
+        if self.file_format == "parquet":
+            import pyarrow.parquet
+
+            return pyarrow.parquet.ParquetFile(path, memory_map=True).read()
+        import pyarrow.ipc
+
+        return pyarrow.ipc.open_file(pyarrow.memory_map(path, "r")).read_all()
+
+    def load(self, worksheet):
+        return self._rows_of(self.table(worksheet))
+
+    @staticmethod
+    def _rows_of(table):
+        columns = [[_cell_string(value) for value in column.to_pylist()] for column in table.columns]
+        return [list(table.column_names)] + [list(row) for row in zip(*columns)]
+
+    def get_head(self, worksheet, count):
+        if worksheet in self._rows:
+            return self._rows[worksheet][:count]
+        return [_trim(row) for row in self._rows_of(self.table(worksheet).slice(0, max(count - 1, 0)))][:count]
+
+    def get_all_records(self, worksheet):
+        return self._records_of(self.table(worksheet))
+
+    def iter_records(self, worksheet, chunk_size):
+        if self.file_format == "parquet":
+            import pyarrow.parquet
+
+            path = os.path.join(self.path, "{}.parquet".format(worksheet))
+            batches = pyarrow.parquet.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_size)
+        else:
+            # Slices of a memory-mapped table are views, not copies.
+            batches = self.table(worksheet).to_batches(max_chunksize=chunk_size)
+        for batch in batches:
+            yield self._records_of(batch)
+
+    def _records_of(self, table):
+        return [dict(zip(table.column_names, row)) for row in zip(*map(self._numericised, table.columns))]
+
+    @staticmethod
+    def _numericised(column):
+        import pyarrow
+        import pyarrow.compute
+
+        if not pyarrow.types.is_string(column.type):
+            return [_cell_string(value) for value in column.to_pylist()]
+        column = pyarrow.compute.fill_null(column, "")
+        # Integer cells (most scores) are parsed by Arrow in one pass; the
+        # rest go through numericise one by one.
+        is_int = pyarrow.compute.match_substring_regex(column, r"^[+-]?[0-9]{1,18}$")
+        values = pyarrow.compute.cast(pyarrow.compute.if_else(is_int, column, "0"), pyarrow.int64()).to_pylist()
+        others = pyarrow.compute.indices_nonzero(pyarrow.compute.invert(is_int))
+        for index, text in zip(others.to_pylist(), column.take(others).to_pylist()):
+            values[index] = numericise(text)
+        return values
+
+
+def export_columnar(rows, path, file_format="arrow"):
+    """
+    Writes sheet rows (header first) as a columnar file ArrowSheetSource
+    reads: one string column per sheet column, named by the first row.
+    """
+    import pyarrow
+
+    width = max(len(row) for row in rows)
+    rows = [list(row) + [""] * (width - len(row)) for row in rows]
+    names = [_cell_string(name) for name in rows[0]]
+    columns = [pyarrow.array([_cell_string(row[i]) for row in rows[1:]], type=pyarrow.string()) for i in range(width)]
+    # from_arrays, unlike a dict, keeps empty or repeated header cells.
+    table = pyarrow.Table.from_arrays(columns, names=names)
+    if file_format == "parquet":
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(table, path)
+    else:
+        import pyarrow.ipc
+
+        with pyarrow.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+
+
+def open_source(kind=None, path=None, spreadsheet_id=None, rate_limiter=None):
+    """
+    Returns the sheet source named by kind (default SHEET_SOURCE, "google"),
+    reading local files from path (default SHEET_SOURCE_PATH) or the Google
+    spreadsheet spreadsheet_id (default SPREADSHEET_ID) paced by rate_limiter.
+    """
+    kind = kind or os.getenv("SHEET_SOURCE", "google")
+    path = path or os.getenv("SHEET_SOURCE_PATH")
+    if kind == "google":
+        return GoogleSheetSource(spreadsheet_id=spreadsheet_id, rate_limiter=rate_limiter)
+    if path is None:
+        raise ValueError("SHEET_SOURCE={} needs SHEET_SOURCE_PATH".format(kind))
+    if kind == "csv":
+        return CsvSheetSource(path)
+    if kind == "xlsx":
+        return XlsxSheetSource(path)
+    if kind in ("arrow", "parquet"):
+        return ArrowSheetSource(path, kind)
+    raise ValueError("Unknown SHEET_SOURCE {!r}".format(kind))
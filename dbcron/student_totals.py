@@ -0,0 +1,96 @@
+"""
+Per-student course totals and letter grades, computed once per sync.
+
+Each student record gets a "Summary" next to its "Assignments":
+
+    {"Category Totals": {category: points}, "Total": points,
+     "Max Points So Far": points, "Percentage": percent, "Letter Grade": letter}
+
+The figures follow what the API and website compute per page load: blank or
+non-numeric scores count as 0 (getStudentTotalScore), the max points so far
+add up the MAX POINTS row for every category in the record
+(getMaxPointsSoFar), and a total gets the letter of the first bin, in
+ascending points order, whose points are at or above it
+(ProjectionTable.getLetterGrade), or the top bin's letter past the last one.
+The figures are stored unrounded, so getStudentTotalScore returns the same
+total whether it reads the Summary or sums the scores itself. The API's
+projections route serves them (getStudentSummary) instead of recomputing the
+totals, and the website shows the stored letter grade for the current total.
+
+Totals are summed for all students at once from a students x assignments
+matrix, and letters are looked up with a vectorized bisect (searchsorted) into
+the sorted bin points.
+"""
+import numpy
+
+from score_columns import parse_score, score_matrix
+
+MAX_POINTS_KEY = "MAX POINTS"
+
+
+def _numbers(values):
+    # Unrounded, whole numbers as ints, as nested lists; readers round for display.
+    values = numpy.asarray(values, dtype=numpy.float64)
+    whole = values.astype(numpy.int64)
+    numbers = values.astype(object)
+    is_whole = values == whole
+    numbers[is_whole] = whole[is_whole]
+    return numbers.tolist()
+
+
+def max_points_total(max_points):
+    """
+    Sum of the max points header row, blank or non-numeric cells counting as 0.
+    """
+    return float(numpy.nansum([parse_score(points) for points in max_points]))
+
+
+def compute_summaries(students, categories, concepts, bins=None, scores=None, max_points_so_far=None):
+    """
+    Returns {email: summary} for (email, student entry) pairs, including the
+    MAX POINTS row. bins is the "bins" list update_bins stores; without it
+    "Letter Grade" is None. scores may pass in score_matrix(...,
+    students_only=False) output computed for the same students.
+    max_points_so_far defaults to the total of the MAX POINTS row among
+    students; chunked runs pass max_points_total of the header row instead.
+    """
+    if scores is None:
+        scores = score_matrix(students, categories, concepts, students_only=False)
+    emails, pairs, matrix = scores
+    category_names = list(dict.fromkeys(category for category, _ in pairs))
+    # One-hot assignments x categories matrix: scores @ membership sums each
+    # student's scores per category.
+    membership = numpy.zeros((len(pairs), len(category_names)))
+    for index, (category, _) in enumerate(pairs):
+        membership[index, category_names.index(category)] = 1
+    category_totals = numpy.nan_to_num(matrix) @ membership
+    totals = category_totals.sum(axis=1)
+
+    if max_points_so_far is None:
+        max_points_so_far = 0
+        if MAX_POINTS_KEY in emails:
+            max_points_so_far = category_totals[emails.index(MAX_POINTS_KEY)].sum()
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        percentages = numpy.where(max_points_so_far > 0, totals / max_points_so_far * 100, 0.0)
+
+    letters = [None] * len(emails)
+    if bins:
+        bins = sorted(bins, key=lambda grade_bin: grade_bin["points"])
+        bin_letters = [grade_bin["letter"] for grade_bin in bins] + [bins[-1]["letter"]]
+        positions = numpy.searchsorted(numpy.array([grade_bin["points"] for grade_bin in bins], dtype=float), totals)
+        letters = [bin_letters[position] for position in positions.tolist()]
+
+    category_totals = _numbers(category_totals)
+    totals = _numbers(totals)
+    percentages = _numbers(percentages)
+    max_points_so_far, = _numbers([max_points_so_far])
+    summaries = {}
+    for row, email in enumerate(emails):
+        summaries[email] = {
+            "Category Totals": dict(zip(category_names, category_totals[row])),
+            "Total": totals[row],
+            "Max Points So Far": max_points_so_far,
+            "Percentage": percentages[row],
+            "Letter Grade": letters[row],
+        }
+    return summaries
@@ -0,0 +1,480 @@
+"""
+Shared building blocks for the dbcron sync jobs.
+
+These functions have no import-time side effects (no credentials, no Redis
+connection) so they can be reused by update_db.py/update_bins.py and driven
+directly by benchmarks against a local Redis stand-in.
+"""
+import hashlib
+import os
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+import serializer
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("SYNC_CHUNK_SIZE", "1000"))
+DEFAULT_INCREMENTAL = os.getenv("SYNC_MODE", "incremental") != "full"
+CHANGELOG_MAXLEN = int(os.getenv("SYNC_CHANGELOG_MAXLEN", "1000"))
+LOCK_TTL = int(os.getenv("SYNC_LOCK_TTL", "300"))
+# The smallest share of its managed keys an incremental run may keep; below it
+# the sheet read is taken to be truncated and nothing is deleted.
+MIN_RATIO = float(os.getenv("SYNC_MIN_RATIO", "0.5"))
+# A run's seen set outlives any run; it only matters if the run dies.
+SEEN_TTL = 24 * 60 * 60
+
+# None of these keys contain "@", so they never show up as students. Each
+# writer (students, bins) tracks its keys in its own hash; each run collects
+# the keys it wrote in its own seen set.
+HASHES_KEY = "sync:hashes:{}"
+SEEN_KEY = "sync:seen:{}:{}"
+CHANGELOG_KEY = "sync:changelog"
+REVISION_KEY = "sync:revision:{}"
+LOCK_KEY = "sync:lock"
+
+SyncChanges = namedtuple("SyncChanges", ["added", "changed", "removed", "unchanged", "assignments"])
+
+
+class StageTimer:
+    """
+    Accumulates wall time per named stage of a sync run.
+    """
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        return ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in self.timings.items())
+
+
+def build_category_scores(categories, concepts, max_points):
+    category_scores = {}
+    for category, concept, points in zip(categories, concepts, max_points):
+        if category not in category_scores:
+            category_scores[category] = {} #creates a hashmap entry for each category
+        category_scores[category][concept] = points #nested hashmap of     category:concept:points
+    return category_scores
+
+
+def read_gradebook_header(source, worksheet, category_row, category_col, concepts_row, concepts_col,
+                          max_points_row, max_points_col):
+    """
+    Returns (categories, concepts, max_points) from the grade sheet's three
+    header rows (1-based row numbers, 0-based start columns).
+    """
+    head = source.get_head(worksheet, max(category_row, concepts_row, max_points_row))
+
+    def header_row(row, col):
+        return list(head[row - 1][col:]) if row <= len(head) else []
+
+    return (header_row(category_row, category_col), header_row(concepts_row, concepts_col),
+            header_row(max_points_row, max_points_col))
+
+
+def transform_records(records, categories, concepts):
+    """
+    Yields (email, student entry) for every student row of the grade sheet.
+    """
+    for record in records:
+        email = record.pop('Email')
+        legal_name = record.pop('Legal Name')
+        if email == "CATEGORY":
+            continue
+        users_to_assignments = { #structure for db entries
+            "Legal Name": legal_name,
+            "Assignments": {}
+        }
+
+        for category, concept in zip(categories, concepts):
+            if category not in users_to_assignments["Assignments"]:
+                users_to_assignments["Assignments"][category] = {}
+            users_to_assignments["Assignments"][category][concept] = record[concept]
+
+        yield email, users_to_assignments
+
+
+def _sheet_rows(rows, first_row, start_row, end_row):
+    # rows[0] is sheet row first_row; reads drop trailing empty rows.
+    for row in range(start_row, end_row + 1):
+        offset = row - first_row
+        yield row, rows[offset] if 0 <= offset < len(rows) else []
+
+
+def parse_grade_bins(rows, first_row, start_row, end_row, points_col=0, grades_col=1):
+    """
+    Returns ({"letter", "points"} bins sorted by points, skipped row numbers)
+    from the rows start_row..end_row of a range read that begins at first_row.
+    """
+    grade_bins = []
+    skipped = []
+    for row, row_values in _sheet_rows(rows, first_row, start_row, end_row):
+        # Skip empty rows
+        if len(row_values) <= max(points_col, grades_col) or not row_values[points_col] or not row_values[grades_col]:
+            continue
+        try:
+            points = int(float(row_values[points_col]))
+        except (ValueError, TypeError):
+            skipped.append(row)
+            continue
+        grade_bins.append({"letter": row_values[grades_col], "points": points})
+    grade_bins.sort(key=lambda x: x['points'])
+    return grade_bins, skipped
+
+
+def parse_assignment_points(rows, first_row, start_row, end_row):
+    """
+    Returns {assignment name: points} from the name/points columns (A, B) of
+    rows start_row..end_row.
+    """
+    assignment_points = {}
+    for _, row_values in _sheet_rows(rows, first_row, start_row, end_row):
+        if len(row_values) >= 2 and row_values[0] and row_values[1]:
+            try:
+                assignment_points[row_values[0]] = int(float(row_values[1]))
+            except (ValueError, TypeError):
+                continue
+    return assignment_points
+
+
+def content_hash(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def changed_assignments(old_value, new_value):
+    """
+    Returns [category, concept] pairs whose score differs between two student
+    entries. Entries that are not student records yield an empty list.
+    """
+    try:
+        old_assignments = serializer.load_assignments(old_value)
+        new_assignments = serializer.load_assignments(new_value)
+    except (TypeError, ValueError):
+        return []
+    changed = []
+    for category in old_assignments.keys() | new_assignments.keys():
+        old_scores = old_assignments.get(category, {})
+        new_scores = new_assignments.get(category, {})
+        for concept in old_scores.keys() | new_scores.keys():
+            if old_scores.get(concept) != new_scores.get(concept):
+                changed.append([category, concept])
+    return sorted(changed)
+
+
+class ChunkedSync:
+    """
+    Writes (key, JSON string or bytes) pairs to a database chunk by chunk,
+    keeping a content hash of every key it manages in the HASHES_KEY hash for
+    scope. Memory use depends on the chunk size, not on the number of keys.
+
+    Incremental runs compare each chunk against the stored hashes, only write
+    keys whose content changed, and record the students and assignments
+    touched in the CHANGELOG_KEY stream, one entry per chunk with changes.
+    Keys seen during the run are collected in a Redis set of its own, so
+    finish() can delete managed keys the run no longer wrote. Runs against one
+    database should still hold its SyncLock: a run deletes keys another added.
+    When the run would keep less than min_ratio of the managed keys, finish()
+    deletes nothing and lists the keys in withheld instead, as a partial sheet
+    read looks just like a mass removal. Full runs rewrite every key and log a
+    single "full" entry. Nothing is logged when changelog is false.
+    """
+    def __init__(self, redis_client, incremental=True, scope="students", changelog=True, min_ratio=0):
+        self.redis_client = redis_client
+        self.incremental = incremental
+        self.changelog = changelog
+        self.min_ratio = min_ratio
+        self.withheld = []
+        self.hashes_key = HASHES_KEY.format(scope)
+        self.seen_key = SEEN_KEY.format(scope, uuid.uuid4().hex)
+        self.counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        if not incremental:
+            redis_client.delete(self.hashes_key)
+
+    def write_chunk(self, entries):
+        """
+        Syncs one chunk of entries and returns its SyncChanges.
+        """
+        redis_client = self.redis_client
+        entries = [(key, value if isinstance(value, (bytes, str)) else serializer.dumpb(value))
+                   for key, value in entries]
+        if not entries:
+            return SyncChanges([], [], [], 0, {})
+        keys = [key for key, _ in entries]
+        hashes = [content_hash(value) for _, value in entries]
+        old_hashes = [None] * len(keys)
+        if self.incremental:
+            old_hashes = [_decode(old_hash) for old_hash in redis_client.hmget(self.hashes_key, keys)]
+            redis_client.sadd(self.seen_key, *keys)
+            redis_client.expire(self.seen_key, SEEN_TTL)
+
+        added, changed, unchanged = [], [], 0
+        writes = []
+        for (key, value), new_hash, old_hash in zip(entries, hashes, old_hashes):
+            if old_hash == new_hash:
+                unchanged += 1
+                continue
+            (changed if old_hash is not None else added).append(key)
+            writes.append((key, value, new_hash))
+
+        assignments = {}
+        if changed and self.changelog:
+            values = {key: value for key, value, _ in writes}
+            for key, old_value in zip(changed, redis_client.mget(changed)):
+                touched = changed_assignments(old_value, values[key])
+                if touched:
+                    assignments[key] = touched
+
+        # Values go in before their hashes: if a run dies in between, the next
+        # run sees a stale hash and writes the key again.
+        if writes:
+            redis_client.mset({key: value for key, value, _ in writes})
+            redis_client.hset(self.hashes_key, mapping={key: new_hash for key, _, new_hash in writes})
+
+        if self.changelog and self.incremental and (added or changed):
+            redis_client.xadd(CHANGELOG_KEY, {
+                "added": serializer.dumpb(added),
+                "changed": serializer.dumpb(changed),
+                "removed": "[]",
+                "assignments": serializer.dumpb(assignments),
+            }, maxlen=CHANGELOG_MAXLEN, approximate=True)
+        self.counts["added"] += len(added)
+        self.counts["changed"] += len(changed)
+        self.counts["unchanged"] += unchanged
+        return SyncChanges(added, changed, [], unchanged, assignments)
+
+    def finish(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Deletes managed keys this incremental run did not write, logs the
+        removals (or the full rewrite) and returns the sorted removed keys.
+        Returns nothing if the removals were withheld.
+        """
+        redis_client = self.redis_client
+        removed = []
+        if self.incremental:
+            cursor = 0
+            while True:
+                cursor, fields = redis_client.hscan(self.hashes_key, cursor, count=chunk_size)
+                fields = list(fields)
+                if fields:
+                    seen = redis_client.smismember(self.seen_key, fields)
+                    removed.extend(_decode(field) for field, is_seen in zip(fields, seen) if not is_seen)
+                if not cursor:
+                    break
+            removed = sorted(set(removed))
+            managed = redis_client.hlen(self.hashes_key)
+            if removed and managed - len(removed) < managed * self.min_ratio:
+                self.withheld, removed = removed, []
+            for start in range(0, len(removed), chunk_size):
+                redis_client.delete(*removed[start:start + chunk_size])
+                redis_client.hdel(self.hashes_key, *removed[start:start + chunk_size])
+        redis_client.delete(self.seen_key)
+        self.counts["removed"] += len(removed)
+
+        if self.changelog and not self.incremental:
+            redis_client.xadd(CHANGELOG_KEY, {"full": "1"}, maxlen=CHANGELOG_MAXLEN, approximate=True)
+        elif self.changelog and removed:
+            redis_client.xadd(CHANGELOG_KEY, {
+                "added": "[]",
+                "changed": "[]",
+                "removed": serializer.dumpb(removed),
+                "assignments": "{}",
+            }, maxlen=CHANGELOG_MAXLEN, approximate=True)
+        return removed
+
+
+class SyncLocked(Exception):
+    pass
+
+
+class SyncLock:
+    """
+    Lock on one database held by the run syncing it, a SET NX EX key with a
+    per-holder token. It expires after ttl seconds unless refreshed, so a
+    killed run cannot block later ones for long. Used as a context manager,
+    acquiring raises SyncLocked when another run holds the lock.
+    """
+    def __init__(self, redis_client, ttl=LOCK_TTL, key=LOCK_KEY):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.key = key
+        self.token = uuid.uuid4().hex
+
+    def acquire(self, wait=0, poll=1.0):
+        """
+        Takes the lock, waiting up to wait seconds for it. Returns whether it
+        was taken.
+        """
+        deadline = time.monotonic() + wait
+        while not self.redis_client.set(self.key, self.token, nx=True, ex=self.ttl):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def _if_held(self, action):
+        # Checks the token and acts in one transaction, so a lock that expired
+        # and went to another run is left alone.
+        from redis.exceptions import WatchError
+
+        with self.redis_client.pipeline() as pipeline:
+            try:
+                pipeline.watch(self.key)
+                if _decode(pipeline.get(self.key)) != self.token:
+                    return False
+                pipeline.multi()
+                action(pipeline)
+                pipeline.execute()
+                return True
+            except WatchError:
+                return False
+
+    def refresh(self):
+        """
+        Restarts the lock's ttl. Returns False if the lock was lost.
+        """
+        return self._if_held(lambda pipeline: pipeline.expire(self.key, self.ttl))
+
+    def release(self):
+        return self._if_held(lambda pipeline: pipeline.delete(self.key))
+
+    def __enter__(self):
+        if not self.acquire():
+            raise SyncLocked("another sync holds {}".format(self.key))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def source_revision(source, log=print):
+    """
+    Returns the source's revision, or None when it has none or it cannot be
+    read; a failed pre-check must not stop the sync itself.
+    """
+    try:
+        return source.revision()
+    except Exception as e:
+        log("Could not read the spreadsheet revision, syncing anyway: {}".format(e))
+        return None
+
+
+def sync_fingerprint(revision, *inputs):
+    """
+    Digest of a sheet revision and the other inputs a sync's output depends on
+    (its course settings, the stored bins), or None without a revision.
+    """
+    if revision is None:
+        return None
+    return content_hash(serializer.dumpb([revision] + [_decode(value) for value in inputs]))
+
+
+def synced_fingerprint(redis_client, scope):
+    """
+    Returns the fingerprint stored by the last completed sync of scope.
+    """
+    return _decode(redis_client.get(REVISION_KEY.format(scope)))
+
+
+def record_fingerprint(redis_client, scope, fingerprint):
+    """
+    Stores the fingerprint of a completed sync; None clears it.
+    """
+    if fingerprint is None:
+        redis_client.delete(REVISION_KEY.format(scope))
+    else:
+        redis_client.set(REVISION_KEY.format(scope), fingerprint)
+
+
+def chunked(iterable, chunk_size):
+    """
+    Yields lists of up to chunk_size items.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sync_entries(redis_client, entries, chunk_size=DEFAULT_CHUNK_SIZE, incremental=True, scope="students",
+                 changelog=True):
+    """
+    Syncs all of entries with a ChunkedSync and returns the combined
+    SyncChanges.
+    """
+    sync = ChunkedSync(redis_client, incremental, scope, changelog)
+    added, changed, unchanged, assignments = [], [], 0, {}
+    for chunk in chunked(entries, chunk_size):
+        changes = sync.write_chunk(chunk)
+        added.extend(changes.added)
+        changed.extend(changes.changed)
+        unchanged += changes.unchanged
+        assignments.update(changes.assignments)
+    removed = sync.finish(chunk_size)
+    return SyncChanges(added, changed, removed, unchanged, assignments)
+
+
+def connect_redis(db):
+    """
+    Returns a client for a database index, using the same host rules as the
+    sync scripts.
+    """
+    import redis
+
+    password = os.getenv("REDIS_DB_SECRET")
+    host = os.getenv("SERVER_HOST")
+    if host == "redis":  # If running in Docker
+        return redis.Redis(host=host, port=int(os.getenv("SERVER_PORT")), db=db, password=password)
+    return redis.Redis(host="localhost", port=6379, db=db, password=password)
+
+
+def count_students(redis_client):
+    # Student keys are emails; the API lists students with the same pattern.
+    return sum(1 for _ in redis_client.scan_iter(match="*@*", count=1000))
+
+
+def validate_snapshot(students_client, bins_client, live_student_count=0, min_ratio=0.5):
+    """
+    Returns a list of problems with a freshly built snapshot, empty if it is
+    safe to publish. A snapshot with far fewer students than the live data is
+    rejected as a likely truncated sheet read.
+    """
+    problems = []
+    if not students_client.exists("Categories"):
+        problems.append("Categories record missing")
+    if not bins_client.exists("bins"):
+        problems.append("bins record missing")
+    student_count = count_students(students_client)
+    if student_count == 0:
+        problems.append("no student records")
+    elif student_count < live_student_count * min_ratio:
+        problems.append("only {} students, live data has {}".format(student_count, live_student_count))
+    return problems
+
+
+def swap_databases(redis_client, pairs):
+    """
+    Swaps each (live, staging) database index pair in one MULTI/EXEC, so
+    readers move from the old snapshot to the new one all at once.
+    """
+    pipeline = redis_client.pipeline(transaction=True)
+    for live_db, staging_db in pairs:
+        if live_db != staging_db:
+            pipeline.swapdb(live_db, staging_db)
+    pipeline.execute()
@@ -0,0 +1,100 @@
+"""
+Syncs every course in the registry (courses.py) from one process.
+
+    python sync_courses.py                  # every course in COURSE_REGISTRY
+    python sync_courses.py cs10 cs61c       # only some of them
+    python sync_courses.py --workers 8 --full
+    python sync_courses.py --force          # even courses whose sheet is unchanged
+
+Courses sync concurrently in a pool of --workers threads (SYNC_WORKERS,
+default 4), each its bins and then its students, into the course's own Redis
+databases. The Sheets requests of all courses draw from one token bucket of
+SHEETS_REQUESTS_PER_MINUTE (default 60, the per-user read quota) with bursts
+of up to SHEETS_BURST, and back off exponentially on 429 and 5xx answers, so
+the run takes about as long as its slowest course rather than the sum of
+them all. A course whose spreadsheet revision matches the one its last sync
+recorded costs one metadata request and is skipped, unless --force (or
+--full) is given. Without COURSE_REGISTRY the one course configured through the
+environment is synced, as update_bins.py and update_db.py would.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from courses import registered_courses
+from rate_limit import TokenBucket
+from sync import DEFAULT_INCREMENTAL, connect_redis
+from update_bins import update_bins
+from update_db import update_redis
+
+DEFAULT_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+BURST = int(os.getenv("SHEETS_BURST", "10"))
+
+
+def sync_course(course, rate_limiter=None, incremental=DEFAULT_INCREMENTAL, connect=connect_redis,
+                open_source=None, force=False):
+    """
+    Syncs one course's bins and then its students. open_source(course,
+    rate_limiter) returns its sheet source, by default course.open_source.
+    """
+    source = open_source(course, rate_limiter) if open_source else course.open_source(rate_limiter)
+    bins_client = connect(course.bins_db)
+    update_bins(target_client=bins_client, incremental=incremental, source=source, course=course, force=force)
+    update_redis(target_client=connect(course.db), incremental=incremental, source=source, bins_client=bins_client,
+                 course=course, force=force)
+
+
+def sync_courses(courses, workers=DEFAULT_WORKERS, rate_limiter=None, incremental=DEFAULT_INCREMENTAL,
+                 connect=connect_redis, open_source=None, force=False):
+    """
+    Syncs courses concurrently. Returns {course name: (seconds, error message
+    or None)}; one course failing does not stop the others.
+    """
+    def run(course):
+        start = time.perf_counter()
+        try:
+            sync_course(course, rate_limiter, incremental, connect, open_source, force)
+            error = None
+        except Exception as e:
+            error = "{}: {}".format(type(e).__name__, e)
+        return course.name, (time.perf_counter() - start, error)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return dict(executor.map(run, courses))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Sync every registered course into Redis.")
+    arg_parser.add_argument("courses", nargs="*", help="course names from the registry; all by default")
+    arg_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="courses synced at once")
+    arg_parser.add_argument("--full", action="store_true", help="rewrite every key instead of only changed ones")
+    arg_parser.add_argument("--force", action="store_true", help="sync even if a spreadsheet is unchanged")
+    args = arg_parser.parse_args(argv)
+
+    courses = registered_courses()
+    if args.courses:
+        wanted = set(args.courses)
+        missing = wanted - {course.name for course in courses}
+        if missing:
+            arg_parser.error("not in the registry: {}".format(", ".join(sorted(missing))))
+        courses = [course for course in courses if course.name in wanted]
+
+    start = time.perf_counter()
+    rate_limiter = TokenBucket.per_minute(REQUESTS_PER_MINUTE, BURST)
+    results = sync_courses(courses, args.workers, rate_limiter, DEFAULT_INCREMENTAL and not args.full,
+                           force=args.force or args.full)
+    for name, (seconds, error) in sorted(results.items()):
+        print("{}: {} in {:.1f}s".format(name or "course", error or "synced", seconds))
+    print("Synced {} courses in {:.1f}s".format(len(results), time.perf_counter() - start))
+    return 0 if all(error is None for _, error in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
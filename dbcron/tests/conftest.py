@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def connect(server):
+    return lambda db: fakeredis.FakeRedis(server=server, db=db)
+
+
+@pytest.fixture
+def redis_client(connect):
+    return connect(0)
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from courses import BINS_STAGING_DB, STAGING_DB, load_registry
+
+
+def write_registry(tmp_path, entries):
+    path = tmp_path / "courses.json"
+    path.write_text(json.dumps(entries))
+    return str(path)
+
+
+def test_load_registry_accepts_separate_databases(tmp_path):
+    courses = load_registry(write_registry(tmp_path, [{"name": "cs10", "db": 0, "bins_db": 1},
+                                                      {"name": "cs61c", "db": 2, "bins_db": 3}]))
+    assert [(course.name, course.db, course.bins_db) for course in courses] == [("cs10", 0, 1), ("cs61c", 2, 3)]
+
+
+@pytest.mark.parametrize("entries", [
+    [{"name": "cs10", "db": STAGING_DB, "bins_db": 1}],
+    [{"name": "cs10", "db": 0, "bins_db": BINS_STAGING_DB}],
+    [{"name": "cs10", "db": 0, "bins_db": 1}, {"name": "cs61c", "db": 1, "bins_db": 2}],
+    [{"name": "cs10", "db": 0, "bins_db": 0}],
+])
+def test_load_registry_rejects_shared_databases(tmp_path, entries):
+    with pytest.raises(ValueError, match="uses Redis database"):
+        load_registry(write_registry(tmp_path, entries))
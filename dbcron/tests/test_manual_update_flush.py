@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks.bench_sync_courses import make_courses
+from courses import BINS_STAGING_DB, STAGING_DB
+from manual_update_flush import reload_courses
+from sync import LOCK_KEY, SyncLock, count_students
+
+
+@pytest.fixture
+def courses(tmp_path):
+    return make_courses(str(tmp_path), 2, 20)
+
+
+@pytest.mark.parametrize("mode", ["swap", "flush"])
+def test_reload_courses_reloads_every_course(courses, connect, mode):
+    stale = connect(courses[1].db)
+    stale.set("stale@berkeley.edu", "{}")
+    assert reload_courses(courses, mode, connect) == []
+    for course in courses:
+        assert count_students(connect(course.db)) == 20
+        assert connect(course.bins_db).exists("bins")
+        assert not connect(course.db).exists(LOCK_KEY)
+    assert not stale.exists("stale@berkeley.edu")
+    assert connect(STAGING_DB).dbsize() == 0
+    assert connect(BINS_STAGING_DB).dbsize() == 0
+
+
+def test_reload_courses_goes_on_past_a_locked_course(courses, connect, monkeypatch):
+    monkeypatch.setattr("manual_update_flush.LOCK_WAIT", 0)
+    holder = SyncLock(connect(courses[0].db))
+    assert holder.acquire()
+    assert reload_courses(courses, "swap", connect) == [courses[0].name]
+    assert count_students(connect(courses[0].db)) == 0
+    assert count_students(connect(courses[1].db)) == 20
@@ -0,0 +1,15 @@
+import numpy
+
+from score_columns import column_stats, parse_score
+
+
+def test_parse_score_skips_blank_and_non_numeric_cells():
+    assert [parse_score(value) for value in (4, "2.5", " 3 ")] == [4, 2.5, 3]
+    assert all(numpy.isnan(parse_score(value)) for value in (None, "", "   ", "N/A", True))
+
+
+def test_column_stats_keeps_the_exact_average_and_median():
+    stats = column_stats(numpy.array([1, 1, 0, 0.5, numpy.nan]))
+    assert stats["average"] == 0.625 and stats["median"] == 0.75
+    stats = column_stats(numpy.array([1, 1, 0]))
+    assert stats["average"] == 2 / 3 and stats["count"] == 3
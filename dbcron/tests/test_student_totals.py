@@ -0,0 +1,11 @@
+from student_totals import compute_summaries
+
+
+def test_summary_total_is_unrounded_and_counts_blank_cells_as_zero():
+    categories, concepts = ["Quest", "Quest", "Labs", "Labs"], ["Quest 1", "Quest 2", "Lab 1", "Lab 2"]
+    students = [("oski@berkeley.edu", {"Assignments": {"Quest": {"Quest 1": 10.125, "Quest 2": "0.004"},
+                                                       "Labs": {"Lab 1": "  ", "Lab 2": "N/A"}}})]
+    summary = compute_summaries(students, categories, concepts, max_points_so_far=20)["oski@berkeley.edu"]
+    assert summary["Total"] == 10.129
+    assert summary["Category Totals"] == {"Quest": 10.129, "Labs": 0}
+    assert summary["Letter Grade"] is None
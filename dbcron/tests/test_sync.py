@@ -0,0 +1,109 @@
+import serializer
+from sync import CHANGELOG_KEY, HASHES_KEY, ChunkedSync, SyncLock, sync_entries
+
+
+def student(name, score):
+    return serializer.dumpb({"Legal Name": name, "Assignments": {"Quest": {"Abstraction": score}}})
+
+
+def roster(count, score=1):
+    return [("s{}@x".format(i), student("S{}".format(i), score)) for i in range(count)]
+
+
+def changelog(redis_client):
+    return [{field.decode(): value.decode() for field, value in entry.items()}
+            for _, entry in redis_client.xrange(CHANGELOG_KEY)]
+
+
+def test_incremental_writes_only_changed_keys(redis_client):
+    sync_entries(redis_client, roster(4), incremental=False)
+    entries = roster(4)
+    entries[1] = ("s1@x", student("S1", 5))
+    changes = sync_entries(redis_client, entries)
+    assert changes.added == [] and changes.changed == ["s1@x"] and changes.unchanged == 3
+    assert changes.assignments == {"s1@x": [["Quest", "Abstraction"]]}
+    assert serializer.loads(redis_client.get("s1@x"))["Assignments"]["Quest"]["Abstraction"] == 5
+
+
+def test_incremental_removes_keys_the_run_did_not_write(redis_client):
+    sync_entries(redis_client, roster(4), incremental=False)
+    changes = sync_entries(redis_client, roster(4)[:3] + [("new@x", student("New", 1))], chunk_size=2)
+    assert changes.added == ["new@x"]
+    assert changes.removed == ["s3@x"]
+    assert redis_client.get("s3@x") is None
+    assert redis_client.hget(HASHES_KEY.format("students"), "s3@x") is None
+
+
+def test_truncated_read_removes_nothing(redis_client):
+    sync_entries(redis_client, roster(10), incremental=False)
+    run = ChunkedSync(redis_client, min_ratio=0.5)
+    run.write_chunk(roster(4))
+    assert run.finish() == []
+    assert run.withheld == ["s{}@x".format(i) for i in range(4, 10)]
+    assert all(redis_client.exists("s{}@x".format(i)) for i in range(10))
+    assert redis_client.hlen(HASHES_KEY.format("students")) == 10
+
+
+def test_removals_within_the_ratio_go_ahead(redis_client):
+    sync_entries(redis_client, roster(10), incremental=False)
+    run = ChunkedSync(redis_client, min_ratio=0.5)
+    run.write_chunk(roster(6))
+    assert run.finish() == ["s{}@x".format(i) for i in range(6, 10)]
+    assert run.withheld == []
+
+
+def test_changelog_entries(redis_client):
+    sync_entries(redis_client, roster(3), incremental=False)
+    entries = roster(3)[1:] + [("s3@x", student("S3", 1))]
+    entries[0] = ("s1@x", student("S1", 2))
+    sync_entries(redis_client, entries)
+    full, written, removed = changelog(redis_client)
+    assert full == {"full": "1"}
+    assert serializer.loads(written["added"]) == ["s3@x"]
+    assert serializer.loads(written["changed"]) == ["s1@x"]
+    assert serializer.loads(written["assignments"]) == {"s1@x": [["Quest", "Abstraction"]]}
+    assert serializer.loads(removed["removed"]) == ["s0@x"]
+
+
+def test_seen_set_is_per_run_and_expires(redis_client):
+    first = ChunkedSync(redis_client)
+    second = ChunkedSync(redis_client)
+    assert first.seen_key != second.seen_key
+    first.write_chunk(roster(2))
+    assert 0 < redis_client.ttl(first.seen_key)
+    first.finish()
+    assert not redis_client.exists(first.seen_key)
+
+
+def test_overlapping_runs_do_not_delete_each_others_students(redis_client):
+    sync_entries(redis_client, roster(6), incremental=False)
+    # Run A writes its first chunk, run B runs to completion, then A writes
+    # its second chunk and finishes. Both read the same six students.
+    run_a = ChunkedSync(redis_client)
+    run_a.write_chunk(roster(6)[:3])
+    sync_entries(redis_client, roster(6))
+    run_a.write_chunk(roster(6)[3:])
+    assert run_a.finish() == []
+    assert all(redis_client.get(key) is not None for key, _ in roster(6))
+
+
+def test_lock_admits_one_holder(redis_client):
+    first = SyncLock(redis_client, ttl=60)
+    second = SyncLock(redis_client, ttl=60)
+    assert first.acquire()
+    assert not second.acquire()
+    assert not second.release()
+    assert first.refresh()
+    first.release()
+    assert second.acquire()
+
+
+def test_expired_lock_is_not_released_by_its_old_holder(redis_client):
+    first = SyncLock(redis_client, ttl=60)
+    assert first.acquire()
+    redis_client.delete(first.key)  # expired
+    second = SyncLock(redis_client, ttl=60)
+    assert second.acquire()
+    assert not first.refresh()
+    assert not first.release()
+    assert redis_client.get(first.key).decode() == second.token
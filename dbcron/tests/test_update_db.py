@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from benchmarks.bench_sync_courses import SHEETNAME, make_courses
+from sources import CsvSheetSource
+from sync import LOCK_KEY, REVISION_KEY, SyncLock, count_students
+from update_bins import update_bins
+from update_db import update_redis
+
+
+@pytest.fixture
+def course(tmp_path):
+    course, = make_courses(str(tmp_path), 1, 20)
+    return course
+
+
+def test_update_redis_skips_while_another_run_holds_the_lock(course, connect):
+    students, bins = connect(course.db), connect(course.bins_db)
+    holder = SyncLock(students)
+    assert holder.acquire()
+    update_redis(target_client=students, source=CsvSheetSource(course.source_path), bins_client=bins, course=course)
+    assert count_students(students) == 0
+    holder.release()
+    update_redis(target_client=students, source=CsvSheetSource(course.source_path), bins_client=bins, course=course)
+    assert count_students(students) == 20
+    assert not students.exists(LOCK_KEY)
+
+
+def test_update_bins_skips_while_another_run_holds_the_lock(course, connect):
+    bins = connect(course.bins_db)
+    holder = SyncLock(bins)
+    assert holder.acquire()
+    update_bins(target_client=bins, source=CsvSheetSource(course.source_path), course=course)
+    assert not bins.exists("bins")
+    holder.release()
+    update_bins(target_client=bins, source=CsvSheetSource(course.source_path), course=course)
+    assert bins.exists("bins")
+
+
+def test_update_redis_keeps_students_missing_from_a_truncated_read(course, tmp_path, connect):
+    students, bins = connect(course.db), connect(course.bins_db)
+    update_redis(target_client=students, source=CsvSheetSource(course.source_path), bins_client=bins, course=course)
+    sheet = os.path.join(course.source_path, SHEETNAME + ".csv")
+    with open(sheet, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(sheet, "w", encoding="utf-8") as f:
+        f.writelines(lines[:-15])
+    update_redis(target_client=students, source=CsvSheetSource(course.source_path), bins_client=bins, course=course)
+    assert count_students(students) == 20
+    assert not students.exists(REVISION_KEY.format("students"))
@@ -1,94 +1,76 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import argparse
 from dotenv import load_dotenv
-import json
-import os
-import redis
+import serializer
+from courses import course_from_env
+from sources import column_letter
+from sync import (DEFAULT_INCREMENTAL, SyncLock, connect_redis, parse_assignment_points, parse_grade_bins,
+                  record_fingerprint, source_revision, sync_entries, sync_fingerprint, synced_fingerprint)
 
 load_dotenv()
 
-PORT = int(os.getenv("SERVER_PORT"))
-SCOPES = json.loads(os.getenv("SPREADSHEET_SCOPES"))
-HOST = os.getenv("SERVER_HOST")
-DB = int(os.getenv("BINS_DBINDEX"))
-SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")  # Fixed: Use SPREADSHEET_ID
-SHEETNAME = os.getenv("SPREADSHEET_SHEETNAME")  # This is the sheet/tab name
-WORKSHEET = int(os.getenv("BINS_WORKSHEET"))
+ASSIGNMENT_POINTS_START_ROW = 16  # Assignments begin on row 16 of the Constants sheet
+ASSIGNMENT_POINTS_END_ROW = 49
 
-REDIS_PW = os.getenv("REDIS_DB_SECRET")
+def update_bins(target_client=None, incremental=DEFAULT_INCREMENTAL, source=None, course=None, force=False,
+                lock=None):
+    if course is None:
+        course = course_from_env()  # the course configured through SPREADSHEET_ID, BINS_DBINDEX, ...
+    if target_client is None:
+        target_client = connect_redis(course.bins_db)
+    log = course.log
+    log("Updating Bins from production spreadsheet...")
+    log(f"Spreadsheet ID: {course.spreadsheet_id}")
+    log(f"Sheet name: {course.sheet}")
 
-#needs both spreadsheet and drive access or else there is a permissions error, added as a viewer on the spreadsheet
-credentials_json = os.getenv("SERVICE_ACCOUNT_CREDENTIALS")
-credentials_dict = json.loads(credentials_json)
-credentials = Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
-client = gspread.authorize(credentials)
-
-#redis setup
-if HOST == "redis":  # If running in Docker
-    redis_client = redis.Redis(host=HOST, port=PORT, db=DB, password=REDIS_PW)
-else:  # If running locally
-    redis_client = redis.Redis(host="localhost", port=6379, db=DB, password=REDIS_PW)
-
-def update_bins():
-    print("Updating Bins from production spreadsheet...")
-    print(f"Spreadsheet ID: {SPREADSHEET_ID}")
-    print(f"Sheet name: {SHEETNAME}")
+    # Only one run writes a database at a time; two would delete each other's keys. A caller holding the lock passes it
+    held = lock is not None
+    if not held:
+        lock = SyncLock(target_client)
+        if not lock.acquire():
+            log("Another sync of this database is running, skipping")
+            return
     
     try:
         # Try to read grade bins dynamically from the Constants sheet
         # This follows the original design where bins are stored in the spreadsheet
         grade_bins = []
         assignment_points = {}
+        fingerprint = None  # recorded only when the bins were read from the sheet
         
         try:
-            constants_sheet = client.open_by_key(SPREADSHEET_ID).worksheet('Constants')
-            print("Successfully opened Constants sheet!")
-            
+            if source is None:
+                source = course.open_source()  # Google Sheets unless SHEET_SOURCE points at local exports
+
+            # One metadata request instead of the Constants read when nobody edited the spreadsheet
+            fingerprint = sync_fingerprint(source_revision(source, log), list(course))
+            if not force and fingerprint is not None and fingerprint == synced_fingerprint(target_client, "bins"):
+                log("Spreadsheet unchanged since the last sync, nothing to do")
+                return
+            record_fingerprint(target_client, "bins", None)
+
             # Read grade bins from the configured range (A51:B61 as per config)
             # This should contain point thresholds and letter grades
-            print("Reading grade bins from configured range...")
-            
-            # Read the bins data from the configured range
-            start_row = int(os.getenv("BINS_START_ROW", "51"))
-            end_row = int(os.getenv("BINS_END_ROW", "61"))
-            points_col = int(os.getenv("BINS_POINTS_COL", "0"))  # Column A
-            grades_col = int(os.getenv("BINS_GRADES_COL", "1"))  # Column B
-            
-            print(f"Reading bins from row {start_row} to {end_row}")
-            
-            for row in range(start_row, end_row + 1):
-                try:
-                    row_values = constants_sheet.row_values(row)
-                    
-                    # Skip empty rows
-                    if len(row_values) <= max(points_col, grades_col) or not row_values[points_col] or not row_values[grades_col]:
-                        continue
-                    
-                    # Try to parse the points as a number
-                    try:
-                        points = int(float(row_values[points_col]))
-                    except (ValueError, TypeError):
-                        print(f"Skipping row {row}: points value '{row_values[points_col]}' is not a number")
-                        continue
-                    
-                    # Create a bin entry
-                    grade_bin = {
-                        "letter": row_values[grades_col],
-                        "points": points
-                    }
-                    grade_bins.append(grade_bin)
-                    print(f"Added bin: {grade_bin}")
-                    
-                except Exception as row_error:
-                    print(f"Error processing row {row}: {row_error}")
-                    continue
-            
+            start_row = course.bins_start_row
+            end_row = course.bins_end_row
+            points_col = course.bins_points_col  # Column A
+            grades_col = course.bins_grades_col  # Column B
+
+            # One read covering both the bins and the assignment points rows
+            first_row = min(start_row, ASSIGNMENT_POINTS_START_ROW)
+            last_row = max(end_row, ASSIGNMENT_POINTS_END_ROW)
+            last_col = column_letter(max(points_col, grades_col, 1))
+            cell_range = f"A{first_row}:{last_col}{last_row}"
+            log(f"Reading grade bins (rows {start_row}-{end_row}) and assignment points from Constants!{cell_range}...")
+            rows, = source.batch_get("Constants", [cell_range])
+
+            grade_bins, skipped_rows = parse_grade_bins(rows, first_row, start_row, end_row, points_col, grades_col)
+            for row in skipped_rows:
+                log(f"Skipping row {row}: points value is not a number")
+
             if grade_bins:
-                print(f"Successfully read {len(grade_bins)} grade bins from spreadsheet!")
-                # Sort by points to ensure proper order
-                grade_bins.sort(key=lambda x: x['points'])
+                log(f"Successfully read {len(grade_bins)} grade bins from spreadsheet!")
             else:
-                print("No grade bins found in configured range, using fallback...")
+                log("No grade bins found in configured range, using fallback...")
                 # Fallback to standard bins if none found
                 grade_bins = [
                     {"letter": "A+", "points": 97},
@@ -105,28 +87,21 @@ def update_bins():
                     {"letter": "D-", "points": 60},
                     {"letter": "F", "points": 0}
                 ]
-                print("Using standard grade bins as fallback")
-            
+                log("Using standard grade bins as fallback")
+
             # Also read assignment points for reference
-            print("Reading assignment points...")
-            for row in range(16, 50):  # Start from row 16 where assignments begin
-                row_values = constants_sheet.row_values(row)
-                if len(row_values) >= 2 and row_values[0] and row_values[1]:
-                    try:
-                        assignment_name = row_values[0]
-                        points = int(float(row_values[1]))
-                        assignment_points[assignment_name] = points
-                    except (ValueError, TypeError):
-                        continue
-            
+            assignment_points = parse_assignment_points(rows, first_row, ASSIGNMENT_POINTS_START_ROW,
+                                                        ASSIGNMENT_POINTS_END_ROW)
+
             if assignment_points:
-                print(f"Found {len(assignment_points)} assignment point values")
+                log(f"Found {len(assignment_points)} assignment point values")
             else:
-                print("No assignment points found")
+                log("No assignment points found")
                 
         except Exception as sheet_error:
-            print(f"Error reading from Constants sheet: {sheet_error}")
-            print("Using standard grade bins as fallback")
+            fingerprint = None
+            log(f"Error reading from Constants sheet: {sheet_error}")
+            log("Using standard grade bins as fallback")
             # Fallback to standard bins
             grade_bins = [
                 {"letter": "A", "points": 90},
@@ -143,15 +118,19 @@ def update_bins():
             "total_course_points": sum(assignment_points.values()) if assignment_points else 0
         }
         
-        bins_json = json.dumps(bins_data)
-        redis_client.set("bins", bins_json)
-        print(f"Successfully updated bins in Redis with {len(grade_bins)} grade bins!")
-        print("Bins are now DYNAMIC and will update when you change the spreadsheet!")
+        bins_json = serializer.dumpb(bins_data)
+        changes = sync_entries(target_client, [("bins", bins_json)], incremental=incremental, scope="bins")
+        if changes.unchanged:
+            log("Bins unchanged, nothing written")
+        else:
+            log(f"Successfully updated bins in Redis with {len(grade_bins)} grade bins!")
+        record_fingerprint(target_client, "bins", fingerprint)
+        log("Bins are now DYNAMIC and will update when you change the spreadsheet!")
         
     except Exception as e:
-        print(f"Error updating bins: {e}")
-        print(f"Spreadsheet ID: {SPREADSHEET_ID}")
-        print(f"Sheet name: {SHEETNAME}")
+        log(f"Error updating bins: {e}")
+        log(f"Spreadsheet ID: {course.spreadsheet_id}")
+        log(f"Sheet name: {course.sheet}")
         # Store default bins to prevent errors
         default_bins = {
             "bins": [
@@ -164,8 +143,13 @@ def update_bins():
             "assignment_points": {},
             "total_course_points": 0
         }
-        redis_client.set("bins", json.dumps(default_bins))
-        print("Stored default bins to prevent errors")
+        sync_entries(target_client, [("bins", serializer.dumpb(default_bins))], incremental=incremental, scope="bins")
+        log("Stored default bins to prevent errors")
+    finally:
+        if not held:
+            lock.release()
 
 if __name__ == "__main__":
-    update_bins()
+    arg_parser = argparse.ArgumentParser(description="Sync the grade bins from the spreadsheet into Redis.")
+    arg_parser.add_argument("--force", action="store_true", help="sync even if the spreadsheet is unchanged")
+    update_bins(force=arg_parser.parse_args().force)
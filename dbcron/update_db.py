@@ -1,90 +1,132 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import argparse
 from dotenv import load_dotenv
-import json
-import os
-import redis
+import serializer
+from courses import course_from_env
+from score_columns import ScoreColumnsBuilder, score_matrix
+from student_totals import compute_summaries, max_points_total
+from sync import (DEFAULT_CHUNK_SIZE, DEFAULT_INCREMENTAL, MIN_RATIO, ChunkedSync, StageTimer, SyncLock,
+                  build_category_scores, chunked, connect_redis, read_gradebook_header, record_fingerprint,
+                  source_revision, sync_fingerprint, synced_fingerprint, transform_records)
 
 load_dotenv()
 
-PORT = int(os.getenv("SERVER_PORT"))
-SCOPES = json.loads(os.getenv("SPREADSHEET_SCOPES"))
-HOST = os.getenv("SERVER_HOST")
-DB = int(os.getenv("SERVER_DBINDEX"))
-SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")  # Fixed: Use SPREADSHEET_ID
-SHEETNAME = os.getenv("SPREADSHEET_SHEETNAME")  # This is the sheet/tab name
-WORKSHEET = int(os.getenv("SPREADSHEET_WORKSHEET"))
-CATEGORYCOL = int(os.getenv("ASSIGNMENT_CATEGORYCOL"))
-CATEGORYROW = int(os.getenv("ASSIGNMENT_CATEGORYROW"))
-CONCEPTSCOL = int(os.getenv("ASSIGNMENT_CONCEPTSCOL"))
-CONCEPTSROW = int(os.getenv("ASSIGNMENT_CONCEPTSROW"))
-MAXPOINTSROW = int(os.getenv("ASSIGNMENT_MAXPOINTSROW"))
-MAXPOINTSCOL = int(os.getenv("ASSIGNMENT_MAXPOINTSCOL"))
-REDIS_PW = os.getenv("REDIS_DB_SECRET")
-
-#needs both spreadsheet and drive access or else there is a permissions error, added as a viewer on the spreadsheet
-credentials_json = os.getenv("SERVICE_ACCOUNT_CREDENTIALS")
-credentials_dict = json.loads(credentials_json)
-credentials = Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
-client = gspread.authorize(credentials)
-
-#redis setup
-if HOST == "redis":  # If running in Docker
-    redis_client = redis.Redis(host=HOST, port=PORT, db=DB, password=REDIS_PW)
-else:  # If running locally
-    redis_client = redis.Redis(host="localhost", port=6379, db=DB, password=REDIS_PW)
-
-def update_redis():
-    print(f"Attempting to open spreadsheet with ID: {SPREADSHEET_ID}")
-    print(f"Looking for sheet/tab named: {SHEETNAME}")
-    
+def read_bins(bins_client):
+    raw_bins = bins_client.get("bins")
+    return serializer.loads(raw_bins)["bins"] if raw_bins is not None else None
+
+def update_redis(chunk_size=DEFAULT_CHUNK_SIZE, target_client=None, incremental=DEFAULT_INCREMENTAL, source=None,
+                 bins_client=None, course=None, force=False, lock=None):
+    if course is None:
+        course = course_from_env()  # the course configured through SPREADSHEET_ID, SERVER_DBINDEX, ...
+    if target_client is None:
+        target_client = connect_redis(course.db)
+    if bins_client is None:
+        bins_client = connect_redis(course.bins_db)  # letter grades use the bins update_bins stored
+    if source is None:
+        source = course.open_source()  # Google Sheets unless SHEET_SOURCE points at local exports
+    log = course.log
+    log(f"Attempting to open spreadsheet with ID: {course.spreadsheet_id}")
+    log(f"Looking for sheet/tab named: {course.sheet}")
+    timer = StageTimer()
+
+    #only one run writes a database at a time; two would delete each other's keys. A caller holding the lock passes it
+    held = lock is not None
+    if not held:
+        lock = SyncLock(target_client)
+        if not lock.acquire():
+            log("Another sync of this database is running, skipping")
+            return
+
     try:
-        sheet = client.open_by_key(SPREADSHEET_ID).worksheet(SHEETNAME)
-        print("Successfully opened spreadsheet!")
-        
-        categories = sheet.row_values(CATEGORYROW)[CATEGORYCOL:] #gets the categories from row 2, starting from column C
-        concepts = sheet.row_values(CONCEPTSROW)[CONCEPTSCOL:] #gets the concepts from row 1, starting from column C
-        max_points = sheet.row_values(MAXPOINTSROW)[MAXPOINTSCOL:] #gets the max points from row 3, starting from column C
-
-        print(f"Found categories: {categories[:3]}...")  # Show first 3 categories
-        print(f"Found concepts: {concepts[:3]}...")      # Show first 3 concepts
-
-        category_scores = {}
-        for category, concept, points in zip(categories, concepts, max_points):
-            if category not in category_scores:
-                category_scores[category] = {} #creates a hashmap entry for each category
-            category_scores[category][concept] = points #nested hashmap of     category:concept:points
-
-        redis_client.set("Categories", json.dumps(category_scores)) #the one record that holds all of the categories info
-
-        records = sheet.get_all_records()
-        print(f"Found {len(records)} student records")
-
-        for record in records:
-            email = record.pop('Email')
-            legal_name = record.pop('Legal Name')
-            if email == "CATEGORY":
-                continue
-            users_to_assignments = { #structure for db entries
-                "Legal Name": legal_name,
-                "Assignments": {}
-            }
-
-            for category, concept in zip(categories, concepts):
-                if category not in users_to_assignments["Assignments"]:
-                    users_to_assignments["Assignments"][category] = {}
-                users_to_assignments["Assignments"][category][concept] = record[concept]
-
-            redis_client.set(email, json.dumps(users_to_assignments)) #sets key value for user:other data
-        
-        print("Successfully updated Redis database!")
-        
+        #one metadata request; the sheet, the course settings and the stored bins are all the students depend on
+        fingerprint = sync_fingerprint(source_revision(source, log), list(course), bins_client.get("bins"))
+        if not force and fingerprint is not None and fingerprint == synced_fingerprint(target_client, "students"):
+            log("Spreadsheet unchanged since the last sync, nothing to do")
+            return
+        record_fingerprint(target_client, "students", None)  # a run that dies part way must not look complete
+
+        with timer.stage("sheet fetch"):
+            #categories from row 2, concepts from row 1 and max points from row 3, each starting from column C
+            categories, concepts, max_points = read_gradebook_header(source, course.sheet, *course.header_layout)
+            log("Successfully read spreadsheet header!")
+            #rows come in chunks of chunk_size; each chunk is transformed and written before the next is read
+            record_chunks = source.iter_records(course.sheet, chunk_size)
+
+        log(f"Found categories: {categories[:3]}...")  # Show first 3 categories
+        log(f"Found concepts: {concepts[:3]}...")      # Show first 3 concepts
+
+        with timer.stage("totals"):
+            bins = read_bins(bins_client)
+            if bins is None:
+                log("No bins stored yet, letter grades will be empty")
+            max_points_so_far = max_points_total(max_points)
+
+        with timer.stage("write"):
+            student_sync = ChunkedSync(target_client, incremental, min_ratio=MIN_RATIO)
+            #the one record that holds all of the categories info
+            student_sync.write_chunk([("Categories", serializer.dumpb(build_category_scores(categories, concepts, max_points)))])
+            columns = ScoreColumnsBuilder(target_client, categories, concepts) #per-assignment arrays and stats for the admin dashboards
+
+        record_count = 0
+        while True:
+            with timer.stage("sheet fetch"):
+                records = next(record_chunks, None)
+            if records is None:
+                break
+            record_count += len(records)
+
+            with timer.stage("transform"):
+                students = list(transform_records(records, categories, concepts))
+                scores = score_matrix(students, categories, concepts, students_only=False) #students x assignments
+
+            with timer.stage("totals"):
+                #course totals, percentage and letter grade
+                summaries = compute_summaries(students, categories, concepts, bins, scores, max_points_so_far)
+                for email, users_to_assignments in students:
+                    users_to_assignments["Summary"] = summaries[email]
+
+            with timer.stage("serialize"):
+                entries = [(email, serializer.dumpb(users_to_assignments)) for email, users_to_assignments in students]
+
+            with timer.stage("write"):
+                #sets key value for user:other data, only keys whose content changed unless incremental is off
+                student_sync.write_chunk(entries)
+                columns.add(scores)
+                if not lock.refresh():
+                    raise RuntimeError("Lost the sync lock, another run may be writing")
+
+        with timer.stage("write"):
+            student_sync.finish(chunk_size)
+
+        with timer.stage("score columns"):
+            column_sync = ChunkedSync(target_client, incremental, scope="columns", changelog=False)
+            for column_entries in chunked(columns.entries(), 16):
+                column_sync.write_chunk(column_entries)
+            column_sync.finish(chunk_size)
+
+        counts = student_sync.counts
+        log(f"Found {record_count} student records")
+        log(f"Successfully updated Redis database: {counts['added']} added, {counts['changed']} changed, "
+              f"{counts['removed']} removed, {counts['unchanged']} unchanged")
+        log(f"Stage timings: {timer.report()}")
+        if student_sync.withheld:
+            #likely a truncated sheet read; the next run reads the sheet again instead of skipping it as synced
+            log(f"Not removing {len(student_sync.withheld)} students missing from a read of only {record_count}; "
+                f"if they were dropped from the sheet, reload with manual_update_flush.py --mode flush")
+            return
+        record_fingerprint(target_client, "students", fingerprint)
+
     except Exception as e:
-        print(f"Error: {e}")
-        print(f"Spreadsheet ID: {SPREADSHEET_ID}")
-        print(f"Sheet name: {SHEETNAME}")
+        log(f"Error: {e}")
+        log(f"Spreadsheet ID: {course.spreadsheet_id}")
+        log(f"Sheet name: {course.sheet}")
         raise
+    finally:
+        if not held:
+            lock.release()
 
 if __name__ == "__main__":
-    update_redis()
+    arg_parser = argparse.ArgumentParser(description="Sync student grades from the spreadsheet into Redis.")
+    arg_parser.add_argument("--force", action="store_true", help="sync even if the spreadsheet is unchanged")
+    update_redis(force=arg_parser.parse_args().force)
 
@@ -1,10 +1,18 @@
-from flask import Flask, request, render_template
+from flask import Flask, Response, g, redirect, request, render_template, stream_with_context, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
-import json
+import gc
+import logging
 import os
+import time
 import parser
-import jsonschema
-from deprecated import deprecated
+import serializer
+from course_cache import course_cache, discover_courses
+from course_model import course_models
+from render_cache import levels_digest, page_response, render_cache
+from concept_index import DEFAULT_MATCH_MODE, MATCH_MODES
+from metrics import REQUEST_SECONDS, metrics, profiler
+from validation import MAX_BATCH_STUDENTS, validate_batch_post_request, validate_mastery_learning_post_request
 
 """
 Dream Team GUI
@@ -66,70 +74,173 @@ Dream Team GUI
 """
 
 app = Flask(__name__)
+app.json = serializer.JSONProvider(app)
+# The reverse proxy serves the app under /progress and says so in
+# X-Forwarded-Prefix, so URLs built with url_for carry the prefix.
+app.wsgi_app = ProxyFix(app.wsgi_app, x_prefix=1)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
-with open("meta/defaults.json", "r") as defaults_file:
-    default = json.load(defaults_file)
+with open("meta/defaults.json", "rb") as defaults_file:
+    default = serializer.loads(defaults_file.read())
 
 DEFAULT_SCHOOL = default["school"]
 DEFAULT_CLASS = default["class"]
+if course_models.redis_course is None:
+    # The Redis Categories record describes the default class unless REDIS_COURSE names another.
+    course_models.redis_course = DEFAULT_CLASS
+
+metrics.register("progress_report_cache_hits_total", "counter", "Cache lookups that found an entry.",
+                 lambda: [({"cache": "render"}, render_cache.hits), ({"cache": "course"}, course_cache.hits)])
+metrics.register("progress_report_cache_misses_total", "counter", "Cache lookups that had to build an entry.",
+                 lambda: [({"cache": "render"}, render_cache.misses), ({"cache": "course"}, course_cache.misses)])
+metrics.register("progress_report_cache_entries", "gauge", "Entries held in a cache.",
+                 lambda: [({"cache": "render"}, len(render_cache)), ({"cache": "course"}, len(course_cache))])
+
+
+def preload():
+    """
+    Builds the template of every course in meta/ and compiles the report page
+    template, then freezes everything allocated so far out of the garbage
+    collector's reach. Run in the master before it forks, workers start warm
+    and share these objects copy-on-write: a collection in a worker no longer
+    writes to, and so copies, the pages holding them.
+    """
+    start = time.perf_counter()
+    count = course_models.preload(discover_courses())
+    app.jinja_env.get_template("web_ui.html")
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded %d courses in %.3f s", count, time.perf_counter() - start)
+
+
+if os.getenv("PRELOAD_COURSES", "").lower() in ("1", "true"):
+    preload()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = profiler.start("{} {}".format(request.method, request.endpoint))
+
+
+@app.after_request
+def record_request_time(response):
+    start, profile = g.pop("request_start"), g.pop("profile", None)
+    labels = {"method": request.method, "status": response.status_code,
+              "route": request.url_rule.rule if request.url_rule is not None else "unmatched"}
+
+    # The server closes the response once the body is sent, after streamed
+    # /batch bodies too.
+    def record():
+        profiler.stop(profile)
+        metrics.observe(REQUEST_SECONDS, time.perf_counter() - start, **labels)
+
+    response.call_on_close(record)
+    return response
+
+
+@app.teardown_request
+def stop_profile(error=None):
+    # Only left set when the request failed before record_request_time.
+    profiler.stop(g.pop("profile", None))
+
+
+@app.route('/metrics', methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.errorhandler(parser.MetaParseError)
+def handle_meta_parse_error(error):
+    return "Malformed course meta file: {}".format(error), 500
+
+
+class InvalidMasteryData(ValueError):
+    pass
+
+
+@app.errorhandler(InvalidMasteryData)
+def handle_invalid_mastery_data(error):
+    return {"error": "Invalid mastery learning request", "details": [{"path": "/", "message": str(error)}]}, 400
 
 """
-Validates the fields of the mastery learning post request
+Returns the (student_level, class_level) pair for a leaf's matched mastery
+data. The legacy match mode can match a concept to a top-level string such as
+"class", which is rejected as a bad request.
 """
-def validate_mastery_learning_post_request(request_as_json):
-    schema = {
-        "type": "object",
-        # Matches mastery fields (fields other than "school" and "class"
-        "properties": {
-            # These fields are optional.
-            "school": {"type": "string"},
-            "class": {"type": "string"},
-        },
-        "additionalProperties": {
-            "type": "object",
-            "properties": {
-                "student_mastery": {"type": "integer"},
-                "class_mastery": {"type": "integer"}
-            },
-            "additionalProperties": False
-        },
-    }
-
-    # Intentionally not handling the error an improper format may produce for now.
-    jsonschema.validate(instance=request_as_json, schema=schema)
+def mastery_levels(mastery_data, concept_name):
+    if not mastery_data:
+        return 0, 0
+    if not isinstance(mastery_data, dict):
+        raise InvalidMasteryData("Concept {!r} matched a value that is not a mastery object".format(concept_name))
+    return mastery_data.get("student_mastery", 0), mastery_data.get("class_mastery", 0)
 
 """
-This method is deprecated.
+Renders a progress report for a course template and per-leaf levels. The page
+holds the per-node levels and loads the course structure from course_structure.
+"""
+def render_report(template, school_name, course_name, leaf_levels, use_url_class_mastery):
+    with metrics.timer("render"):
+        digest, _ = template.structure()
+        return render_template("web_ui.html",
+                               start_date=template.start_date,
+                               course_name=course_name,
+                               course_term=template.term,
+                               class_levels=template.class_levels,
+                               student_levels=template.student_levels,
+                               use_url_class_mastery=use_url_class_mastery,
+                               course_node_count=template.count,
+                               course_url=url_for("course_structure", school_name=secure_filename(school_name),
+                                                  course_name=secure_filename(course_name), digest=digest),
+                               levels=template.level_arrays(leaf_levels))
+
+
+"""
+Serves the structure of a course, without levels, as JSON. The URL holds a
+digest of the contents, so responses are immutable and the reverse proxy and
+browsers may cache them indefinitely; a stale digest redirects to the current one.
+"""
+@app.route('/course/<school_name>/<course_name>/<digest>.json', methods=["GET"])
+def course_structure(school_name, course_name, digest):
+    school_name = secure_filename(school_name)
+    course_name = secure_filename(course_name)
+    with metrics.timer("course"):
+        template = course_models.get(school_name, course_name)
+    if template is None:
+        return "Class not found", 404
+    current, body = template.structure()
+    if digest != current:
+        response = redirect(url_for("course_structure", school_name=school_name, course_name=course_name,
+                                    digest=current))
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    response = Response(body, mimetype="application/json")
+    response.set_etag(current)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response.make_conditional(request)
+
+"""
+This method is deprecated: query parameters are no longer used.
 """
-@deprecated(reason="Query parameters are no longer used.")
 @app.route('/', methods=["GET"])
 def index():
-    print("In GET route (index)")
-    def assign_node_levels(node, student_levels_count, class_levels_count):
+    logger.debug("In GET route (index)")
+    def leaf_levels(student_levels_count, class_levels_count):
         nonlocal student_mastery, class_mastery
-        if not node["children"]:
-            if student_mastery:
-                node["student_level"] = int(student_mastery[0]) if int(student_mastery[0]) < student_levels_count \
-                    else student_levels_count - 1
-            else:
-                node["student_level"] = 0
-            if class_mastery:
-                node["class_level"] = int(class_mastery[0]) if int(class_mastery[0]) < class_levels_count \
-                    else class_levels_count - 1
-            else:
-                node["class_level"] = 0
-            student_mastery = student_mastery[1:] if len(student_mastery) > 1 else ""
-            class_mastery = class_mastery[1:] if len(class_mastery) > 1 else ""
+        if student_mastery:
+            student_level = int(student_mastery[0]) if int(student_mastery[0]) < student_levels_count \
+                else student_levels_count - 1
+        else:
+            student_level = 0
+        if class_mastery:
+            class_level = int(class_mastery[0]) if int(class_mastery[0]) < class_levels_count \
+                else class_levels_count - 1
         else:
-            children_student_levels = []
-            children_class_levels = []
-            for child in node["children"]:
-                student_level, class_level = assign_node_levels(child, student_levels_count, class_levels_count)
-                children_student_levels.append(student_level)
-                children_class_levels.append(class_level)
-            node["student_level"] = sum(children_student_levels) // len(children_student_levels)
-            node["class_level"] = sum(children_class_levels) // len(children_class_levels)
-        return node["student_level"], node["class_level"]
+            class_level = 0
+        student_mastery = student_mastery[1:] if len(student_mastery) > 1 else ""
+        class_mastery = class_mastery[1:] if len(class_mastery) > 1 else ""
+        return student_level, class_level
 
     school_name = request.args.get("school", "Berkeley")
     course_name = request.args.get("class", "CS10")
@@ -140,166 +251,134 @@ def index():
         return "URL parameter student_mastery is invalid", 400
     if use_url_class_mastery and not class_mastery.isdigit():
         return "URL parameter class_mastery is invalid", 400
-    parser.generate_map(school_name=secure_filename(school_name), course_name=secure_filename(course_name), render=True)
-    try:
-        with open("data/{}_{}.json".format(secure_filename(school_name), secure_filename(course_name))) as data_file:
-            course_data = json.load(data_file)
-    except FileNotFoundError:
+    with metrics.timer("course"):
+        template = course_models.get(secure_filename(school_name), secure_filename(course_name))
+    if template is None:
         return "Class not found", 404
-    start_date = course_data["start date"]
-    course_term = course_data["term"]
-    class_levels = course_data["class levels"]
-    student_levels = course_data["student levels"]
-    course_node_count = course_data["count"]
-    course_nodes = course_data["nodes"]
-    assign_node_levels(course_nodes, len(student_levels), len(class_levels))
-    return render_template("web_ui.html",
-                           start_date=start_date,
-                           course_name=course_name,
-                           course_term=course_term,
-                           class_levels=class_levels,
-                           student_levels=student_levels,
-                           use_url_class_mastery=use_url_class_mastery,
-                           course_node_count=course_node_count,
-                           course_data=course_nodes)
+    student_levels_count = len(template.student_levels)
+    class_levels_count = len(template.class_levels)
+    with metrics.timer("levels"):
+        levels = [leaf_levels(student_levels_count, class_levels_count) for _ in template.leaf_positions]
+    # Pages embed the course structure URL, which depends on the proxy prefix.
+    cache_key = ("GET", request.script_root, school_name, course_name, template.version, use_url_class_mastery,
+                 levels_digest(levels))
+    page = render_cache.get(cache_key)
+    if page is None:
+        page = render_cache.put(cache_key, render_report(template, school_name, course_name, levels,
+                                                          use_url_class_mastery))
+    return page_response(page)
 
 
 @app.route('/', methods=["POST"])
 def generate_cm_from_post_parameters():
-    print("In generate_cm_from_post_parameters")
-    request_as_json = request.get_json()
-    print("Request", request)
-    validate_mastery_learning_post_request(request_as_json)
+    logger.debug("In generate_cm_from_post_parameters: %s", request)
+    with metrics.timer("decode"):
+        request_as_json = request.get_json()
+    with metrics.timer("validate"):
+        errors = validate_mastery_learning_post_request(request_as_json)
+    if errors:
+        return {"error": "Invalid mastery learning request", "details": errors}, 400
     school_name = request_as_json.get("school", DEFAULT_SCHOOL)
     course_name = request_as_json.get("class", DEFAULT_CLASS)
+    match_mode = request.args.get("match", DEFAULT_MATCH_MODE)
+    if match_mode not in MATCH_MODES:
+        return "URL parameter match must be one of {}".format(", ".join(MATCH_MODES)), 400
     
-    # Build dynamic tree structure from mastery data
-    def build_dynamic_tree(mastery_data):
-        """Build tree structure dynamically from mastery data"""
-        root = {
-            "id": 1,
-            "name": course_name,
-            "parent": "null",
-            "children": [],
-            "data": {
-                "week": 0
-            }
-        }
-
-        # Define the expected categories and their concepts based on the actual data structure
-        category_mapping = {
-            "Quest": ["Abstraction", "Number Representation", "Iteration", "Domain and Range", "Booleans", "Functions", "HOFs I"],
-            "Midterm": ["Algorithms", "Computers and Education", "Testing + 2048 + Mutable/Immutable", "Saving the World with Computing", "Debugging", "Scope", "Iteration and Randomness", "Recursion Tracing", "Algorithmic Complexity", "HOFs II", "Fractal"],
-            "Postterm": ["Python Advanced", "Programming Paradigms", "HCI", "Generative AI", "Ethics in AI", "Generic Base Conversion", "Concurrency", "HOFs III", "Coding Snap! Recursive Reporter and HOF", "Coding Python Data Structures"],
-            "Projects": ["Project 1: Wordle™-lite", "Project 2: Spelling Bee", "Project 3: 2048"]
-        }
-
-        # Build tree structure
-        node_id = 2
-        for category, expected_concepts in category_mapping.items():
-            category_node = {
-                "id": node_id,
-                "name": category,
-                "parent": "null",  # Changed from course_name to "null"
-                "children": [],
-                "data": {
-                    "week": 0  # Added data property for category nodes
-                }
-            }
-            node_id += 1
-
-            for concept_name in expected_concepts:
-                # Find mastery data for this concept
-                mastery_info = mastery_data.get(concept_name, {"student_mastery": 0, "class_mastery": 0})
-
-                concept_node = {
-                    "id": node_id,
-                    "name": concept_name,
-                    "parent": category,
-                    "children": [],
-                    "data": {
-                        "week": 0  # Default week
-                    }
-                }
-                node_id += 1
-                category_node["children"].append(concept_node)
-
-            root["children"].append(category_node)
-
-        return root, node_id - 1
-
-    def assign_node_levels(node):
-        if not node["children"]:
-            # For leaf nodes, get mastery from the concept name
-            concept_name = node["name"]
-            # Try to find matching mastery data
-            mastery_data = None
-            for key, value in request_as_json.items():
-                if concept_name in key or key in concept_name:
-                    mastery_data = value
-                    break
-
-            if mastery_data:
-                node["student_level"] = mastery_data.get("student_mastery", 0)
-                node["class_level"] = mastery_data.get("class_mastery", 0)
-            else:
-                node["student_level"] = 0
-                node["class_level"] = 0
-        else:
-            children_student_levels = []
-            children_class_levels = []
-            for child in node["children"]:
-                student_level, class_level = assign_node_levels(child)
-                children_student_levels.append(student_level)
-                children_class_levels.append(class_level)
-            node["student_level"] = sum(children_student_levels) // len(children_student_levels)
-            node["class_level"] = sum(children_class_levels) // len(children_class_levels)
-        return node["student_level"], node["class_level"]
-
-    # Build dynamic tree instead of using static parser
-    print("About to build dynamic tree with data:", list(request_as_json.keys())[:5])
-    course_nodes, course_node_count = build_dynamic_tree(request_as_json)
-    print("Dynamic tree built with", course_node_count, "nodes and", len(course_nodes["children"]), "categories")
-
-    # Use default values for other fields
-    start_date = "8/26/2024"
-    course_term = "Fall 2024"
-    class_levels = [
-        {"name": "Not Taught", "color": "#dddddd"},
-        {"name": "Taught", "color": "#8fbc8f"}
-    ]
-    student_levels = [
-        {"name": "First Steps", "color": "#dddddd"},
-        {"name": "Needs Practice", "color": "#a3d7fc"},
-        {"name": "In Progress", "color": "#59b0f9"},
-        {"name": "Almost There", "color": "#3981c1"},
-        {"name": "Mastered", "color": "#20476a"}
-    ]
-
-    # Assign mastery levels to the dynamic tree
-    assign_node_levels(course_nodes)
-
-    return render_template("web_ui.html",
-                           start_date=start_date,
-                           course_name=course_name,
-                           course_term=course_term,
-                           class_levels=class_levels,
-                           student_levels=student_levels,
-                           use_url_class_mastery=False,
-                           course_node_count=course_node_count,
-                           course_data=course_nodes)
+    with metrics.timer("course"):
+        template = course_models.get(secure_filename(school_name), secure_filename(course_name))
+    if template is None:
+        return "Class not found", 404
+
+    # Match every leaf to its mastery data in one pass over the request
+    with metrics.timer("levels"):
+        levels = [mastery_levels(mastery_data, concept_name) for mastery_data, concept_name
+                  in zip(template.concept_index.resolve(request_as_json, match_mode), template.concept_names)]
+
+    cache_key = ("POST", request.script_root, school_name, course_name, template.version, levels_digest(levels))
+    page = render_cache.get(cache_key)
+    if page is None:
+        page = render_cache.put(cache_key, render_report(template, school_name, course_name, levels, False))
+    return page_response(page)
+
+
+"""
+Builds the reports for many students of one course in a single request.
+
+Body: {"school": ..., "class": ..., "students": [{"id": ..., "mastery": {...}}]}
+where "mastery" has the shape of a POST / body, and at most BATCH_MAX_STUDENTS
+(default 1000) students; larger requests get a 413. The response is NDJSON with one
+line per student, in request order: {"id", "student_levels", "class_levels"}
+with per-node levels in node ID order (?format=json, the default), or
+{"id", "html"} with the rendered report (?format=html).
+"""
+@app.route('/batch', methods=["POST"])
+def generate_batch_from_post_parameters():
+    with metrics.timer("decode"):
+        request_as_json = request.get_json()
+    students = request_as_json.get("students") if type(request_as_json) is dict else None
+    if type(students) is list and len(students) > MAX_BATCH_STUDENTS:
+        return {"error": "Too many students in one batch request",
+                "details": [{"path": "/students", "message": "At most {} students per request".format(
+                    MAX_BATCH_STUDENTS)}]}, 413
+    with metrics.timer("validate"):
+        errors = validate_batch_post_request(request_as_json)
+    if errors:
+        return {"error": "Invalid batch request", "details": errors}, 400
+    school_name = request_as_json.get("school", DEFAULT_SCHOOL)
+    course_name = request_as_json.get("class", DEFAULT_CLASS)
+    match_mode = request.args.get("match", DEFAULT_MATCH_MODE)
+    if match_mode not in MATCH_MODES:
+        return "URL parameter match must be one of {}".format(", ".join(MATCH_MODES)), 400
+    output_format = request.args.get("format", "json")
+    if output_format not in ("json", "html"):
+        return "URL parameter format must be one of json, html", 400
+
+    with metrics.timer("course"):
+        template = course_models.get(secure_filename(school_name), secure_filename(course_name))
+    if template is None:
+        return "Class not found", 404
+
+    concept_index = template.concept_index
+    with metrics.timer("levels"):
+        students_leaf_levels = [[mastery_levels(mastery_data, concept_name) for mastery_data, concept_name
+                                 in zip(concept_index.resolve(student.get("mastery", {}), match_mode),
+                                        template.concept_names)]
+                                for student in students]
+
+    def generate_json():
+        with metrics.timer("levels"):
+            students_levels = template.level_matrix(students_leaf_levels)
+        for student, (student_levels, class_levels) in zip(students, students_levels):
+            yield serializer.dumpb({"id": student["id"], "student_levels": student_levels,
+                                    "class_levels": class_levels}) + b"\n"
+
+    def generate_html():
+        for student, levels in zip(students, students_leaf_levels):
+            # Shares cache entries with POST /.
+            cache_key = ("POST", request.script_root, school_name, course_name, template.version, levels_digest(levels))
+            page = render_cache.get(cache_key)
+            if page is None:
+                page = render_cache.put(cache_key, render_report(template, school_name, course_name, levels, False))
+            yield serializer.dumpb({"id": student["id"], "html": page.bodies["identity"].decode("utf-8")}) + b"\n"
+
+    generate = generate_json if output_format == "json" else generate_html
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 @app.route('/parse', methods=["POST"])
 def parse():
     school_name = request.args.get("school_name", DEFAULT_SCHOOL)
     course_name = request.form.get("course_name", DEFAULT_CLASS)
-    parser.generate_map(school_name=secure_filename(school_name), course_name=secure_filename(course_name), render=False)
-    try:
-        with open("data/{}_{}.json".format(secure_filename(school_name), secure_filename(course_name))) as data_file:
-            course_data = json.load(data_file)
-    except FileNotFoundError:
+    with metrics.timer("course"):
+        course_data = course_cache.get_shared(secure_filename(school_name), secure_filename(course_name),
+                                              render=False)
+    if course_data is None:
         return "Class not found", 404
+    # data/*.json is only written when explicitly requested.
+    if request.args.get("write", "").lower() in ("1", "true"):
+        with metrics.timer("map_write"):
+            parser.generate_map(school_name=secure_filename(school_name), course_name=secure_filename(course_name),
+                                render=False)
     return course_data
 
 if __name__ == '__main__':
@@ -0,0 +1,43 @@
+"""
+Compares N single-student POST / requests against one POST /batch request
+for the same students, in-process through the Flask test client.
+
+Run from progressReport/:
+    python -m benchmarks.bench_batch --students 100 1000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import generate_mastery_payload
+from course_model import course_models
+from render_cache import render_cache
+
+
+def bench(student_counts):
+    import app
+
+    client = app.app.test_client()
+    concepts = course_models.get(app.DEFAULT_SCHOOL, app.DEFAULT_CLASS).concept_names
+    print("{:>8} {:>14} {:>14} {:>14}".format("students", "single (s)", "batch json (s)", "batch html (s)"))
+    for count in student_counts:
+        payloads = [generate_mastery_payload(concepts, seed=seed) for seed in range(count)]
+        for payload in payloads:
+            del payload["school"], payload["class"]
+        body = {"students": [{"id": str(i), "mastery": payload} for i, payload in enumerate(payloads)]}
+
+        timings = []
+        for run in (lambda: [client.post("/", json=payload) for payload in payloads],
+                    lambda: client.post("/batch", json=body).data,
+                    lambda: client.post("/batch?format=html", json=body).data):
+            render_cache.clear()
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        print("{:>8} {:>14.3f} {:>14.3f} {:>14.3f}".format(count, *timings))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--students", type=int, nargs="+", default=[100, 1000])
+    args = arg_parser.parse_args()
+    bench(args.students)
@@ -0,0 +1,41 @@
+"""
+Compares the legacy per-leaf substring scan against ConceptIndex.resolve on
+mastery payloads with hundreds of concepts.
+
+Run from progressReport/:
+    python -m benchmarks.bench_concept_index --sizes 500 1000 2000
+"""
+import argparse
+import timeit
+
+from benchmarks.synthetic import generate_mastery_payload, generate_meta, leaf_names
+from concept_index import ConceptIndex
+
+
+def bench(sizes, repeat, number):
+    print("{:>8} {:>10} {:>12} {:>12} {:>12} {:>12}".format(
+        "concepts", "build (ms)", "legacy (ms)", "exact (ms)", "fuzzy (ms)", "speedup"))
+    for size in sizes:
+        # Enough nodes that the synthetic map has at least `size` leaves.
+        meta_text = generate_meta(size * 2)
+        concepts = leaf_names(meta_text)[:size]
+        payload = generate_mastery_payload(concepts)
+        # Some clients send decorated keys; exercise the normalized and fuzzy tiers too.
+        for concept in concepts[::10]:
+            payload[concept.upper() + " (Conceptual)"] = payload.pop(concept)
+
+        build = min(timeit.repeat(lambda: ConceptIndex(concepts), number=1, repeat=repeat))
+        index = ConceptIndex(concepts)
+        timings = [min(timeit.repeat(lambda: index.resolve(payload, mode), number=number, repeat=repeat)) / number
+                   for mode in ("legacy", "exact", "fuzzy")]
+        print("{:>8} {:>10.2f} {:>12.3f} {:>12.3f} {:>12.3f} {:>11.1f}x".format(
+            len(concepts), build * 1000, *(t * 1000 for t in timings), timings[0] / timings[2]))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--number", type=int, default=5)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat, args.number)
@@ -0,0 +1,91 @@
+"""
+Compares three ways of producing a levelled course tree per request:
+
+    scratch   build the node dicts from a category mapping, as the POST
+              handler used to, then aggregate levels recursively over them
+    deepcopy  copy.deepcopy a prebuilt tree, then aggregate levels
+    stamp     benchmarks.synthetic.stamp over CourseTemplate level arrays
+
+Run from progressReport/:
+    python -m benchmarks.bench_course_model --sizes 36 1000 10000
+"""
+import argparse
+import copy
+import io
+import random
+import timeit
+
+import parser
+from benchmarks.synthetic import generate_meta, stamp
+from course_model import CourseTemplate
+
+
+def aggregate_levels(root, leaf_levels):
+    """
+    Assigns "student_level"/"class_level" to every node of a node dict tree.
+
+    Leaves take leaf_levels(node), called in left-to-right order; inner nodes
+    take the floored mean of their children.
+    """
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        children = node.get("children")
+        if not children:
+            node["student_level"], node["class_level"] = leaf_levels(node)
+        elif children_done:
+            node["student_level"] = sum(child["student_level"] for child in children) // len(children)
+            node["class_level"] = sum(child["class_level"] for child in children) // len(children)
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+    return root["student_level"], root["class_level"]
+
+
+def build_from_scratch(course_name, category_mapping):
+    root = {"id": 1, "name": course_name, "parent": "null", "children": [], "data": {"week": 0}}
+    node_id = 2
+    for category, expected_concepts in category_mapping.items():
+        category_node = {"id": node_id, "name": category, "parent": "null", "children": [], "data": {"week": 0}}
+        node_id += 1
+        for concept_name in expected_concepts:
+            category_node["children"].append({"id": node_id, "name": concept_name, "parent": category,
+                                              "children": [], "data": {"week": 0}})
+            node_id += 1
+        root["children"].append(category_node)
+    return root
+
+
+def bench(sizes, repeat, number):
+    print("{:>8} {:>14} {:>14} {:>14}".format("nodes", "scratch (ms)", "deepcopy (ms)", "stamp (ms)"))
+    rng = random.Random(0)
+    for size in sizes:
+        # Two-level maps mirror the category -> concept shape the handler built.
+        meta = parser.parse_meta(io.StringIO(generate_meta(size, fanout=size, max_depth=2)))
+        course_data = parser.build_json("SYNTH", meta.term, meta.start_date, meta.class_levels,
+                                        meta.student_levels, meta.root, True, meta.count)
+        template = CourseTemplate.from_course_data(course_data, version="bench")
+        category_mapping = {category["name"]: [concept["name"] for concept in category["children"]]
+                            for category in course_data["nodes"]["children"]}
+        levels = [(rng.randrange(5), rng.randrange(2)) for _ in template.leaf_positions]
+
+        def scratch():
+            leaf_levels = iter(levels)
+            aggregate_levels(build_from_scratch("SYNTH", category_mapping), lambda node: next(leaf_levels))
+
+        def deepcopy():
+            leaf_levels = iter(levels)
+            aggregate_levels(copy.deepcopy(course_data["nodes"]), lambda node: next(leaf_levels))
+
+        timings = [min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+                   for fn in (scratch, deepcopy, lambda: stamp(template, levels))]
+        print("{:>8} {:>14.3f} {:>14.3f} {:>14.3f}".format(template.count, *timings))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[36, 1000, 10000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--number", type=int, default=20)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat, args.number)
@@ -0,0 +1,49 @@
+"""
+Compares what a report page carried per student before the course structure
+moved to its own URL (the stamped node tree, embedded with |tojson) with what
+it carries now (flat per-node level arrays), in bytes and in time to build
+and serialize.
+
+Run from progressReport/:
+    python -m benchmarks.bench_page --sizes 36 1000 10000
+"""
+import argparse
+import io
+import random
+import timeit
+
+import parser
+import serializer
+from benchmarks.synthetic import generate_meta, stamp
+from course_model import CourseTemplate
+
+
+def bench(sizes, repeat, number):
+    print("{:>8} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "nodes", "tree bytes", "level bytes", "tree (ms)", "levels (ms)", "struct bytes"))
+    rng = random.Random(0)
+    for size in sizes:
+        meta = parser.parse_meta(io.StringIO(generate_meta(size)))
+        course_data = parser.build_json("SYNTH", meta.term, meta.start_date, meta.class_levels,
+                                        meta.student_levels, meta.root, True, meta.count)
+        template = CourseTemplate.from_course_data(course_data, version="bench")
+        leaf_levels = [(rng.randrange(5), rng.randrange(2)) for _ in template.leaf_positions]
+
+        def tree():
+            return serializer.dumps(stamp(template, leaf_levels), sort_keys=True)
+
+        def levels():
+            return serializer.dumps(template.level_arrays(leaf_levels), sort_keys=True)
+
+        timings = [min(timeit.repeat(run, number=number, repeat=repeat)) / number * 1000 for run in (tree, levels)]
+        print("{:>8} {:>12} {:>12} {:>12.3f} {:>12.3f} {:>12}".format(
+            template.count, len(tree()), len(levels()), *timings, len(template.structure()[1])))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[36, 1000, 10000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--number", type=int, default=10)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat, args.number)
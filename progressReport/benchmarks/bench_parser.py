@@ -0,0 +1,34 @@
+"""
+Compares read_meta against parse_meta on synthetic meta files and prints the
+ratio each run measures. parse_meta's point is the line/column errors and
+correct dedents; speed is a side effect.
+
+Run from progressReport/:
+    python -m benchmarks.bench_parser --sizes 10000 50000 100000
+"""
+import argparse
+import io
+import timeit
+
+import parser
+from benchmarks.synthetic import generate_meta
+
+
+def bench(sizes, repeat):
+    print("{:>8} {:>14} {:>14} {:>8}".format("nodes", "read_meta (s)", "parse_meta (s)", "speedup"))
+    speedups = []
+    for size in sizes:
+        meta_text = generate_meta(size)
+        legacy = min(timeit.repeat(lambda: parser.read_meta(io.StringIO(meta_text)), number=1, repeat=repeat))
+        current = min(timeit.repeat(lambda: parser.parse_meta(io.StringIO(meta_text)), number=1, repeat=repeat))
+        print("{:>8} {:>14.4f} {:>14.4f} {:>7.2f}x".format(size, legacy, current, legacy / current))
+        speedups.append(legacy / current)
+    print("parse_meta is {:.2f}-{:.2f}x read_meta in this run".format(min(speedups), max(speedups)))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat)
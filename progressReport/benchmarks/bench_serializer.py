@@ -0,0 +1,77 @@
+"""
+Compares the standard library JSON calls the service used to make against
+serializer (backend: JSON_BACKEND, default the fastest installed) for each
+JSON document a request touches:
+
+    tojson    the stamped course data embedded in a report, sort_keys=True
+              as Flask's |tojson filter asks for
+    body      decoding a POST / body with a level for every concept
+    batch     100 /batch NDJSON lines of per-node levels
+    map       a data/*.json course map, formerly written with indent=4
+
+Both sides must decode to the same values.
+
+Run from progressReport/:
+    python -m benchmarks.bench_serializer --sizes 36 1000 10000
+    JSON_BACKEND=json python -m benchmarks.bench_serializer
+"""
+import argparse
+import io
+import json
+import random
+import timeit
+
+import parser
+import serializer
+from benchmarks.synthetic import generate_mastery_payload, generate_meta, stamp
+from course_model import CourseTemplate
+
+
+def bench(sizes, repeat, number):
+    print("backend: {}".format(serializer.BACKEND))
+    print("{:>8} {:>8} {:>14} {:>14}".format("nodes", "document", "stdlib (ms)", "serializer (ms)"))
+    rng = random.Random(0)
+    for size in sizes:
+        meta = parser.parse_meta(io.StringIO(generate_meta(size)))
+        course_data = parser.build_json("SYNTH", meta.term, meta.start_date, meta.class_levels,
+                                        meta.student_levels, meta.root, True, meta.count)
+        template = CourseTemplate.from_course_data(course_data, version="bench")
+        levels = [(rng.randrange(5), rng.randrange(2)) for _ in template.leaf_positions]
+        stamped = stamp(template, levels)
+        body = json.dumps(generate_mastery_payload(template.concept_names)).encode("utf-8")
+        lines = [{"id": str(i), "student_levels": student_levels, "class_levels": class_levels}
+                 for i, (student_levels, class_levels) in enumerate(template.level_matrix([levels] * 100))]
+
+        documents = {
+            "tojson": (stamped,
+                       lambda: json.dumps(stamped, sort_keys=True),
+                       lambda: serializer.dumps(stamped, sort_keys=True)),
+            "body": (json.loads(body),
+                     lambda: json.loads(body),
+                     lambda: serializer.loads(body)),
+            "batch": (lines,
+                      lambda: [json.dumps(line, separators=(",", ":")) + "\n" for line in lines],
+                      lambda: [serializer.dumpb(line) + b"\n" for line in lines]),
+            "map": (course_data,
+                    lambda: json.dumps(course_data, indent=4),
+                    lambda: serializer.dumpb(course_data)),
+        }
+        for name, (expected, stdlib, fast) in documents.items():
+            for run in (stdlib, fast):
+                result = run()
+                if name == "batch":
+                    result = [json.loads(line) for line in result]
+                elif name != "body":
+                    result = json.loads(result)
+                assert result == expected, name
+            timings = [min(timeit.repeat(run, number=number, repeat=repeat)) / number * 1000 for run in (stdlib, fast)]
+            print("{:>8} {:>8} {:>14.3f} {:>14.3f}".format(template.count, name, *timings))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[36, 1000, 10000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--number", type=int, default=10)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat, args.number)
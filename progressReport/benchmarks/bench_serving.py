@@ -0,0 +1,192 @@
+"""
+HTTP load test comparing the configuration the service used to run with, one
+synchronous single-threaded worker, against the opt-in threaded mode of
+gunicorn.conf.py (THREADS above 1): --workers processes (default: its WEB_CONCURRENCY or the CPU
+count) of --threads request threads each, on a synthetic --nodes course.
+--clients concurrent keep-alive clients send --requests requests per
+scenario:
+
+    get       GET / with per-concept levels
+    post      POST / with a JSON mastery payload
+    parse     POST /parse
+    write     POST /parse?write=1, which also writes data/<school>_<class>.json
+
+Reported are throughput and p50/p95/p99 latency as the clients see them.
+Threads overlap a request's waits on disk and Redis with other requests'
+work; CPU-bound requests only scale with worker processes.
+Needs gunicorn (requirements.txt). Run from progressReport/:
+    python -m benchmarks.bench_serving
+    python -m benchmarks.bench_serving --workers 2 --threads 16 --clients 32
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import load
+
+SCENARIOS = load.SCENARIOS + ("write",)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http_requests(scenario, count, concepts, distinct):
+    """
+    Returns count (method, path, body, headers) requests for a scenario.
+    """
+    built = load.build_requests("parse" if scenario == "write" else scenario, count, concepts, distinct)
+    requests = []
+    for environ, body in built:
+        query = environ.get("QUERY_STRING", "")
+        if scenario == "write":
+            query = query + "&write=1" if query else "write=1"
+        path = environ["PATH_INFO"] + ("?" + query if query else "")
+        headers = {"Content-Type": environ["CONTENT_TYPE"]} if environ.get("CONTENT_TYPE") else {}
+        requests.append((environ["REQUEST_METHOD"], path, body, headers))
+    return requests
+
+
+def start_server(workspace, port, workers, threads, env=None):
+    """
+    Starts gunicorn serving app.py from workspace; threads=None runs one
+    synchronous worker. env adds environment variables. Returns the process
+    once it answers requests.
+    """
+    here = os.getcwd()
+    command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(here, "gunicorn.conf.py"),
+               "--pythonpath", here, "--bind", "127.0.0.1:{}".format(port), "--log-level", "warning"]
+    if threads is None:
+        command += ["--workers", "1", "--worker-class", "sync"]
+    else:
+        command += ["--worker-class", "gthread", "--threads", str(threads)]
+        if workers is not None:
+            command += ["--workers", str(workers)]
+    env = dict(os.environ, LOG_LEVEL="WARNING", **(env or {}))
+    server = subprocess.Popen(command + ["app:app"], cwd=workspace, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited with status {}".format(server.returncode))
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/metrics")
+            connection.getresponse().read()
+            connection.close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    stop_server(server)
+    raise RuntimeError("gunicorn did not start within 30 s")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run_clients(port, requests, clients):
+    """
+    Sends requests from clients threads, each over its own keep-alive
+    connection. Returns {"requests", "errors", "rps", "p50_ms", "p95_ms",
+    "p99_ms", "max_ms"}.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(request):
+        nonlocal errors
+        method, path, body, headers = request
+        if not hasattr(local, "connection"):
+            local.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        start = time.perf_counter()
+        for _ in range(2):
+            try:
+                local.connection.request(method, path, body=body or None, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+                break
+            except (OSError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection; reconnect once.
+                local.connection.close()
+                status = 599
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(send, requests))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": load.percentile(latencies, 0.50) * 1000,
+        "p95_ms": load.percentile(latencies, 0.95) * 1000,
+        "p99_ms": load.percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--nodes", type=int, default=1000)
+    arg_parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    arg_parser.add_argument("--clients", type=int, default=16, help="concurrent client connections")
+    arg_parser.add_argument("--workers", type=int, default=None, help="worker processes in the threaded mode")
+    arg_parser.add_argument("--threads", type=int, default=8, help="threads per worker in the threaded mode")
+    arg_parser.add_argument("--distinct", type=int, default=100, help="distinct payloads per scenario")
+    arg_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    args = arg_parser.parse_args(argv)
+
+    workspace, concepts = load.make_workspace(args.nodes)
+    modes = (("sync", None), ("threaded", args.threads))
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            requests = http_requests(scenario, args.requests, concepts, args.distinct)
+            for mode, threads in modes:
+                port = free_port()
+                server = start_server(workspace, port, args.workers, threads)
+                try:
+                    run_clients(port, requests[:50], args.clients)  # warm up
+                    results[scenario, mode] = run_clients(port, requests, args.clients)
+                finally:
+                    stop_server(server)
+    finally:
+        load.remove_workspace(workspace)
+
+    print("{} nodes, {} clients; threaded: {} workers of {} threads".format(
+        args.nodes, args.clients, args.workers or "default", args.threads))
+    print("{:<8} {:<9} {:>8} {:>6} {:>10} {:>9} {:>9} {:>9} {:>9}".format(
+        "scenario", "mode", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for scenario in args.scenarios:
+        for mode, _ in modes:
+            print("{:<8} {:<9} {requests:>8} {errors:>6} {rps:>10.1f} {p50_ms:>9.3f} {p95_ms:>9.3f} {p99_ms:>9.3f} "
+                  "{max_ms:>9.3f}".format(scenario, mode, **results[scenario, mode]))
+        gain = results[scenario, "threaded"]["rps"] / results[scenario, "sync"]["rps"]
+        print("{:<8} {:<9} {:>25.2f}x".format(scenario, "gain", gain))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Measures worker startup and memory with and without PRELOAD_COURSES.
+
+Starts gunicorn (gunicorn.conf.py, --workers processes of --threads threads)
+on --courses synthetic courses of --nodes nodes each, once lazily and once
+preloading every course in the master before it forks, and reports:
+
+    ready ms      from launching gunicorn until it answers a request
+    first ms      mean latency of the first GET / of each course
+    rss/pss MiB   mean resident and proportional set size per worker once
+                  every worker has served every course
+    private MiB   mean memory per worker not shared with any other process
+
+Run from progressReport/ (Linux only, reads /proc):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --courses 40 --workers 8
+"""
+import argparse
+import http.client
+import os
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import load
+from benchmarks.bench_serving import free_port, start_server, stop_server
+from benchmarks.synthetic import generate_meta
+
+MODES = (("lazy", {}), ("preload", {"PRELOAD_COURSES": "1"}))
+
+
+def add_courses(workspace, courses, node_count):
+    """
+    Writes courses - 1 more synthetic meta files next to the workspace's
+    course. Returns every course name.
+    """
+    names = [load.COURSE] + ["{}{}".format(load.COURSE, i) for i in range(1, courses)]
+    for seed, name in enumerate(names[1:], 1):
+        with open(os.path.join(workspace, "meta", "{}_{}.txt".format(load.SCHOOL, name)), "w",
+                  encoding="utf-8") as f:
+            f.write(generate_meta(node_count, name=name, seed=seed))
+    return names
+
+
+def get(port, course_name):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request("GET", "/?" + urllib.parse.urlencode({"school": load.SCHOOL, "class": course_name}))
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError("GET {} returned {}".format(course_name, response.status))
+    finally:
+        connection.close()
+
+
+def worker_memory(master_pid):
+    """
+    Returns [(rss, pss, private)] in MiB for each child of master_pid.
+    """
+    with open("/proc/{0}/task/{0}/children".format(master_pid)) as f:
+        pids = f.read().split()
+    memory = []
+    for pid in pids:
+        fields = {}
+        with open("/proc/{}/smaps_rollup".format(pid)) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+        memory.append((fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]))
+    return memory
+
+
+def measure(workspace, names, workers, threads, env):
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(workspace, port, workers, threads, env)
+    ready = time.perf_counter() - start
+    try:
+        first = []
+        for name in names:
+            start = time.perf_counter()
+            get(port, name)
+            first.append(time.perf_counter() - start)
+        # Enough concurrent requests that every worker serves every course.
+        with ThreadPoolExecutor(max_workers=workers * threads) as executor:
+            list(executor.map(lambda name: get(port, name), names * workers * threads))
+        memory = worker_memory(server.pid)
+    finally:
+        stop_server(server)
+    return {
+        "ready_ms": ready * 1000,
+        "first_ms": sum(first) / len(first) * 1000,
+        "rss_mib": sum(m[0] for m in memory) / len(memory),
+        "pss_mib": sum(m[1] for m in memory) / len(memory),
+        "private_mib": sum(m[2] for m in memory) / len(memory),
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--courses", type=int, default=20)
+    arg_parser.add_argument("--nodes", type=int, default=1000)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--threads", type=int, default=8)
+    args = arg_parser.parse_args(argv)
+
+    workspace, _ = load.make_workspace(args.nodes)
+    try:
+        names = add_courses(workspace, args.courses, args.nodes)
+        results = {mode: measure(workspace, names, args.workers, args.threads, env) for mode, env in MODES}
+    finally:
+        load.remove_workspace(workspace)
+
+    print("{} courses of {} nodes, {} workers of {} threads".format(
+        args.courses, args.nodes, args.workers, args.threads))
+    print("{:<8} {:>9} {:>9} {:>9} {:>9} {:>12}".format("mode", "ready ms", "first ms", "rss MiB", "pss MiB",
+                                                        "private MiB"))
+    for mode, _ in MODES:
+        print("{:<8} {ready_ms:>9.1f} {first_ms:>9.2f} {rss_mib:>9.1f} {pss_mib:>9.1f} {private_mib:>12.1f}".format(
+            mode, **results[mode]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
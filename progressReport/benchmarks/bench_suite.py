@@ -0,0 +1,176 @@
+"""
+Reproducible benchmark suite for the progress report service, with baseline
+comparison so regressions show up between changes.
+
+Microbenchmarks (ms per call, best of --repeat) on a synthetic --nodes course:
+
+    read_meta     the legacy Node tree parser
+    parse_meta    the parser the service uses
+    to_json       build_json plus writing data/<school>_<class>.json
+    stamp         assigning per-leaf levels to a course template
+
+Load (benchmarks.load, in-process WSGI, --threads concurrent requests) for
+GET /, POST / and POST /parse: throughput, p50/p95/p99 latency and the
+worker's resident memory afterwards, the median of --rounds runs.
+
+Run from progressReport/:
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --baseline benchmarks/baseline.json --tolerance 0.25
+
+With --baseline the exit status is 1 when a timing is slower, throughput
+lower, or memory higher than the baseline by more than --tolerance. Baselines
+are machine specific: record one on the machine that compares against it.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import timeit
+
+from benchmarks import load
+
+# Figures compared against the baseline; throughput is the one where larger
+# is better. Counts and the max latency (a single sample) are only reported.
+COMPARED = ("ms", "rps", "p50_ms", "p95_ms", "p99_ms", "rss_mib")
+HIGHER_IS_BETTER = ("rps",)
+
+
+def micro(workspace, concepts, repeat):
+    import parser
+    from benchmarks.synthetic import stamp
+    from course_model import CourseTemplate
+
+    with open(os.path.join(workspace, "meta", "{}_{}.txt".format(load.SCHOOL, load.COURSE)), encoding="utf-8") as f:
+        meta_text = f.read()
+    meta = parser.parse_meta(io.StringIO(meta_text))
+    course_data = parser.build_json(load.COURSE, meta.term, meta.start_date, meta.class_levels, meta.student_levels,
+                                    meta.root, False, meta.count)
+    template = CourseTemplate.from_course_data(course_data, version="bench")
+    rng = random.Random(0)
+    levels = [(rng.randrange(5), rng.randrange(2)) for _ in concepts]
+
+    runs = {
+        "read_meta": lambda: parser.read_meta(io.StringIO(meta_text)),
+        "parse_meta": lambda: parser.parse_meta(io.StringIO(meta_text)),
+        "to_json": lambda: parser.to_json(load.SCHOOL, load.COURSE, meta.term, meta.start_date, meta.class_levels,
+                                          meta.student_levels, meta.root, False, meta.count),
+        "stamp": lambda: stamp(template, levels),
+    }
+    results = {}
+    for name, run in runs.items():
+        number, _ = timeit.Timer(run).autorange()
+        results[name] = {"ms": min(timeit.repeat(run, number=number, repeat=repeat)) / number * 1000}
+    return results
+
+
+def load_scenarios(concepts, requests, threads, distinct, rounds):
+    """
+    Runs each scenario rounds times from a cold render cache and keeps the
+    median of every figure.
+    """
+    import app
+    from render_cache import render_cache
+
+    results = {}
+    for scenario in load.SCENARIOS:
+        scenario_requests = load.build_requests(scenario, requests, concepts, distinct)
+        load.run_load(app.app, scenario_requests[:20], threads)  # warm up
+        runs = []
+        for _ in range(rounds):
+            render_cache.clear()
+            runs.append(load.run_load(app.app, scenario_requests, threads))
+        results[scenario] = {figure: statistics.median(run[figure] for run in runs) for figure in runs[0]}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints each figure next to its baseline; returns the regressed figures.
+    """
+    regressions = []
+    print("\n{:<24} {:>12} {:>12} {:>9}".format("figure", "baseline", "current", "change"))
+    for section, entries in results.items():
+        for name, figures in entries.items():
+            label = "{}.{}".format(name, "errors")
+            if figures.get("errors"):
+                regressions.append(label)
+                print("{:<24} {:>12} {:>12}".format(label, "", figures["errors"]))
+            for figure, value in figures.items():
+                base = baseline.get(section, {}).get(name, {}).get(figure)
+                if figure not in COMPARED or not isinstance(base, (int, float)) or not base:
+                    continue
+                change = value / base - 1
+                worse = -change if figure in HIGHER_IS_BETTER else change
+                label = "{}.{}".format(name, figure)
+                flag = "  REGRESSION" if worse > tolerance else ""
+                if flag:
+                    regressions.append(label)
+                print("{:<24} {:>12.3f} {:>12.3f} {:>+8.1f}%{}".format(label, base, value, change * 100, flag))
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--nodes", type=int, default=1000)
+    arg_parser.add_argument("--requests", type=int, default=1000, help="requests per load scenario")
+    arg_parser.add_argument("--threads", type=int, default=1)
+    arg_parser.add_argument("--distinct", type=int, default=100, help="distinct payloads per scenario")
+    arg_parser.add_argument("--rounds", type=int, default=3, help="load runs per scenario, the median is kept")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--baseline", help="JSON results to compare against")
+    arg_parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    arg_parser.add_argument("--tolerance", type=float, default=0.2)
+    args = arg_parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    config = {"nodes": args.nodes, "requests": args.requests, "threads": args.threads, "distinct": args.distinct,
+              "rounds": args.rounds}
+
+    workspace, concepts = load.make_workspace(args.nodes)
+    cwd = os.getcwd()
+    sys.path.insert(0, cwd)
+    os.chdir(workspace)
+    try:
+        results = {"micro": micro(workspace, concepts, args.repeat),
+                   "load": load_scenarios(concepts, args.requests, args.threads, args.distinct, args.rounds)}
+    finally:
+        os.chdir(cwd)
+        load.remove_workspace(workspace)
+
+    print("{} nodes ({} leaves)".format(args.nodes, len(concepts)))
+    print("{:<12} {:>10}".format("micro", "ms"))
+    for name, figures in results["micro"].items():
+        print("{:<12} {:>10.3f}".format(name, figures["ms"]))
+    print("\n{:<8} {:>8} {:>6} {:>10} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "load", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "max ms", "rss MiB"))
+    for scenario, figures in results["load"].items():
+        print("{:<8} {requests:>8} {errors:>6} {rps:>10.1f} {p50_ms:>9.3f} {p95_ms:>9.3f} {p99_ms:>9.3f} "
+              "{max_ms:>9.3f} {rss_mib:>9.1f}".format(scenario, **figures))
+
+    status = 0
+    if baseline is not None:
+        if baseline.get("config") != config:
+            print("\nwarning: baseline was recorded with {}".format(baseline.get("config")))
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressed beyond {:.0%}: {}".format(args.tolerance, ", ".join(regressions)))
+            status = 1
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            rounded = {section: {name: {figure: round(value, 3) for figure, value in figures.items()}
+                                 for name, figures in entries.items()} for section, entries in results.items()}
+            json.dump(dict(rounded, config=config), f, indent=2, sort_keys=True)
+            f.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Compares memory and serialization time of the parser.Node tree built by
+read_meta against the array-backed NodeTree built by parse_meta.
+
+Run from progressReport/:
+    python -m benchmarks.bench_tree --sizes 10000 50000
+"""
+import argparse
+import io
+import timeit
+import tracemalloc
+
+import parser
+from benchmarks.synthetic import generate_meta
+
+
+def measure(parse, meta_text):
+    tracemalloc.start()
+    result = parse(io.StringIO(meta_text))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def bench(sizes, repeat):
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format(
+        "nodes", "Node (KiB)", "Tree (KiB)", "Node json(s)", "Tree json(s)"))
+    for size in sizes:
+        meta_text = generate_meta(size)
+        legacy, legacy_size = measure(parser.read_meta, meta_text)
+        current, current_size = measure(parser.parse_meta, meta_text)
+        legacy_json = min(timeit.repeat(lambda: parser.nodes_to_json(legacy[7], True), number=1, repeat=repeat))
+        current_json = min(timeit.repeat(lambda: current.tree.to_json(True), number=1, repeat=repeat))
+        print("{:>8} {:>12.0f} {:>12.0f} {:>12.4f} {:>12.4f}".format(
+            size, legacy_size / 1024, current_size / 1024, legacy_json, current_json))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    bench(args.sizes, args.repeat)
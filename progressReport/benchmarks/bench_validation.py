@@ -0,0 +1,42 @@
+"""
+Measures mastery request validation throughput: the original per-request
+jsonschema.validate call against the prebuilt validator and its fast path.
+
+Run from progressReport/:
+    python -m benchmarks.bench_validation --concepts 50 500
+"""
+import argparse
+import copy
+import timeit
+
+import jsonschema
+
+from benchmarks.synthetic import generate_mastery_payload
+from validation import MASTERY_REQUEST_SCHEMA, validate_mastery_learning_post_request
+
+
+def validate_per_request(request_as_json):
+    # What every POST / used to do: rebuild the schema and validator each call.
+    jsonschema.validate(instance=request_as_json, schema=copy.deepcopy(MASTERY_REQUEST_SCHEMA))
+
+
+def bench(concept_counts, number):
+    print("{:>8} {:>16} {:>16} {:>16} {:>8}".format(
+        "concepts", "per-request /s", "fast path /s", "full check /s", "speedup"))
+    for count in concept_counts:
+        payload = generate_mastery_payload("Concept {}".format(i) for i in range(count))
+        # A float level is valid JSON Schema but skips the fast path.
+        slow_payload = dict(payload, **{"Concept 0": {"student_mastery": 1.0}})
+        rates = [number / min(timeit.repeat(lambda: fn(p), number=number, repeat=3))
+                 for fn, p in ((validate_per_request, payload),
+                               (validate_mastery_learning_post_request, payload),
+                               (validate_mastery_learning_post_request, slow_payload))]
+        print("{:>8} {:>16.0f} {:>16.0f} {:>16.0f} {:>7.1f}x".format(count, *rates, rates[1] / rates[0]))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--concepts", type=int, nargs="+", default=[50, 500])
+    arg_parser.add_argument("--number", type=int, default=200)
+    args = arg_parser.parse_args()
+    bench(args.concepts, args.number)
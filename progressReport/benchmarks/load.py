@@ -0,0 +1,173 @@
+"""
+In-process WSGI load generator for the progress report service.
+
+Requests are built up front as WSGI environs and bodies and fed straight to
+the Flask app from a pool of threads, the way a threaded worker would serve them, so
+the figures exclude the HTTP server and network. Each latency covers the
+whole response body and close(), which is also when app.py records its own
+request metrics.
+"""
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+from benchmarks.synthetic import generate_mastery_payload, generate_meta, leaf_names
+
+SCHOOL = "Bench"
+COURSE = "SYNTH"
+SCENARIOS = ("get", "post", "parse")
+
+
+def make_workspace(node_count, seed=0):
+    """
+    Creates a working directory holding meta/defaults.json and a synthetic
+    meta/Bench_SYNTH.txt with node_count nodes, plus an empty data/. app.py
+    resolves both relative to the working directory. Returns (path, leaf
+    names).
+    """
+    path = tempfile.mkdtemp(prefix="progress-report-bench-")
+    os.makedirs(os.path.join(path, "meta"))
+    os.makedirs(os.path.join(path, "data"))
+    meta_text = generate_meta(node_count, name=COURSE, seed=seed)
+    with open(os.path.join(path, "meta", "{}_{}.txt".format(SCHOOL, COURSE)), "w", encoding="utf-8") as f:
+        f.write(meta_text)
+    with open(os.path.join(path, "meta", "defaults.json"), "w", encoding="utf-8") as f:
+        json.dump({"school": SCHOOL, "class": COURSE}, f)
+    return path, leaf_names(meta_text)
+
+
+def remove_workspace(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def build_requests(scenario, count, concepts, distinct=100, seed=0):
+    """
+    Returns count (WSGI environ, body) requests for a scenario; call() can
+    replay each any number of times. Payloads cycle through
+    distinct variants, so the render cache hit ratio approaches
+    1 - distinct / count as it would for a class where students share levels.
+    """
+    rng = random.Random(seed)
+    variants = []
+    for variant in range(distinct):
+        if scenario == "get":
+            mastery = "".join(str(rng.randrange(5)) for _ in concepts)
+            variants.append(dict(method="GET", path="/", query_string={
+                "school": SCHOOL, "class": COURSE, "student_mastery": mastery}))
+        elif scenario == "post":
+            payload = generate_mastery_payload(concepts, seed=seed + variant)
+            payload["class"] = COURSE
+            payload["school"] = SCHOOL
+            variants.append(dict(method="POST", path="/", data=json.dumps(payload),
+                                 content_type="application/json"))
+        elif scenario == "parse":
+            variants.append(dict(method="POST", path="/parse", query_string={"school_name": SCHOOL},
+                                 data={"course_name": COURSE}))
+        else:
+            raise ValueError("scenario must be one of {}".format(", ".join(SCENARIOS)))
+    built = []
+    for variant in variants:
+        builder = EnvironBuilder(**variant)
+        try:
+            environ = builder.get_environ()
+            built.append((environ, environ["wsgi.input"].read()))
+        finally:
+            builder.close()
+    return [built[i % distinct] for i in range(count)]
+
+
+def call(app, request):
+    """
+    Runs one (environ, body) request through the WSGI app; returns the status
+    code.
+    """
+    environ, body = request
+    environ = dict(environ)
+    environ["wsgi.input"] = io.BytesIO(body)
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line.split(" ", 1)[0]))
+
+    response = app(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+    return status[0]
+
+
+def rss_mib():
+    """
+    Resident set size of this process in MiB, or the peak on platforms
+    without /proc.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_load(app, requests, threads=1):
+    """
+    Sends every request through app from threads threads. Returns {"requests",
+    "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "rss_mib"}.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(request):
+        nonlocal errors
+        start = time.perf_counter()
+        status = call(app, request)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    if threads == 1:
+        for request in requests:
+            send(request)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(send, requests))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "rss_mib": rss_mib(),
+    }
@@ -0,0 +1,105 @@
+"""
+Synthetic inputs for the progressReport benchmarks.
+"""
+import random
+
+
+META_HEADER = """name: {name}
+term: Fall 2024
+orientation: left to right
+start date: 2024 08 26
+styles:
+    name: root, shape: ellipse, style: filled, fillcolor: #3A73A5
+    name: blue2, shape: ellipse, style: filled, fillcolor: #87CEEB
+    name: default, shape: ellipse, style: filled, fillcolor: #E0E0E0
+class levels:
+    Not Taught: #dddddd
+    Taught: #8fbc8f
+student levels:
+    First Steps: #dddddd
+    Needs Practice: #a3d7fc
+    In Progress: #59b0f9
+    Almost There: #3981c1
+    Mastered: #20476a
+nodes:
+"""
+
+
+def generate_meta(node_count, fanout=8, max_depth=4, name="SYNTH", seed=0):
+    """
+    Returns the text of a meta file with node_count nodes, laid out depth-first
+    with up to fanout children per node and at most max_depth levels.
+    """
+    rng = random.Random(seed)
+    lines = [META_HEADER.format(name=name)]
+    emitted = 0
+    # Stack of (depth, remaining children) for the nodes being filled in.
+    stack = []
+    while emitted < node_count:
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+        depth = stack[-1][0] + 1 if stack else 1
+        if stack:
+            stack[-1][1] -= 1
+        style = "blue2" if depth < max_depth else "default"
+        lines.append("{}Concept {} [{}, Week{}]\n".format("    " * depth, emitted, style, rng.randint(1, 15)))
+        emitted += 1
+        if depth < max_depth:
+            stack.append([depth, rng.randint(1, fanout)])
+    lines.append("end\n")
+    return "".join(lines)
+
+
+def leaf_names(meta_text):
+    """
+    Returns the labels of every leaf node in a meta file produced by generate_meta.
+    """
+    entries = []
+    in_nodes = False
+    for line in meta_text.splitlines():
+        if line == "nodes:":
+            in_nodes = True
+            continue
+        if line.startswith("end"):
+            break
+        if in_nodes:
+            depth = (len(line) - len(line.lstrip())) // 4
+            entries.append((depth, line.strip().rsplit(" [", 1)[0]))
+    return [label for i, (depth, label) in enumerate(entries)
+            if i + 1 == len(entries) or entries[i + 1][0] <= depth]
+
+
+def generate_mastery_payload(concepts, student_levels=5, class_levels=2, seed=0):
+    """
+    Returns a POST / body assigning random levels to every concept name.
+    """
+    rng = random.Random(seed)
+    payload = {"school": "Berkeley", "class": "SYNTH"}
+    for concept in concepts:
+        payload[concept] = {
+            "student_mastery": rng.randrange(student_levels),
+            "class_mastery": rng.randrange(class_levels),
+        }
+    return payload
+
+
+def stamp(template, leaf_levels):
+    """
+    Returns a node dict tree carrying per-node levels, the document report
+    pages embedded before the course structure moved to its own URL.
+    """
+    student, klass = template.level_arrays(leaf_levels)
+    ids, labels, parents, weeks, children = (template.ids, template.labels, template.parents, template.weeks,
+                                             template.children)
+    stamped = [None] * template.count
+    for position in range(template.count - 1, -1, -1):
+        stamped[position] = {
+            "id": ids[position],
+            "name": labels[position],
+            "parent": parents[position],
+            "children": [stamped[child] for child in children[position]],
+            "data": {"week": weeks[position]},
+            "student_level": student[position],
+            "class_level": klass[position],
+        }
+    return stamped[0]
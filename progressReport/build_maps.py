@@ -0,0 +1,132 @@
+"""
+Builds data/<school>_<class>.json for every meta file up front.
+
+    python build_maps.py                     # every meta/*.txt
+    python build_maps.py Berkeley_CS10 --render --jobs 4
+    python build_maps.py --force             # rebuild unchanged maps too
+
+Meta files are parsed and serialized in parallel across a process pool. A
+manifest in the data directory records the SHA-256 of the meta file and the
+render flag each map was built from, and of the map written, so maps whose
+inputs have not changed (and whose output was not overwritten since, e.g. by
+POST /parse?write=1) are skipped. Maps and the manifest are written atomically (parser.write_atomic),
+so a server reading data/*.json never sees a partly written file.
+
+Run from progressReport/.
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import parser
+import serializer
+from course_cache import discover_courses
+
+MANIFEST_NAME = ".manifest.json"
+
+
+def file_digest(path):
+    """
+    Returns (contents, SHA-256 hex digest) of a file.
+    """
+    with open(path, "rb") as f:
+        contents = f.read()
+    return contents, hashlib.sha256(contents).hexdigest()
+
+
+def build_map(job):
+    """
+    Parses one meta file and writes its map. Runs in a pool worker; returns
+    (map name, manifest entry or None, error message or None).
+    """
+    meta_dir, data_dir, school_name, course_name, render = job
+    name = "{}_{}.json".format(school_name, course_name)
+    try:
+        contents, digest = file_digest(os.path.join(meta_dir, "{}_{}.txt".format(school_name, course_name)))
+        meta = parser.parse_meta(io.StringIO(contents.decode("utf-8")))
+        json_out = parser.build_json(course_name, meta.term, meta.start_date, meta.class_levels,
+                                     meta.student_levels, meta.root, render, meta.count)
+        data = serializer.dumpb(json_out)
+        parser.write_atomic(os.path.join(data_dir, name), data)
+    except Exception as error:
+        # One bad meta file should not stop the other courses from building.
+        return name, None, "{}: {}".format(type(error).__name__, error)
+    return name, {"digest": digest, "render": render, "output": hashlib.sha256(data).hexdigest()}, None
+
+
+def load_manifest(data_dir):
+    try:
+        with open(os.path.join(data_dir, MANIFEST_NAME), "rb") as f:
+            return serializer.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_maps(courses, meta_dir="meta", data_dir="data", render=False, jobs=None, force=False):
+    """
+    Builds the maps of (school, course) pairs whose meta file changed since
+    the last build. Returns {map name: "built" | "unchanged" | error message}.
+    """
+    manifest = load_manifest(data_dir)
+    results = {}
+    pending = []
+    for school_name, course_name in courses:
+        name = "{}_{}.json".format(school_name, course_name)
+        entry = manifest.get(name)
+        if not force and entry is not None and entry.get("render") == render:
+            meta_file = os.path.join(meta_dir, "{}_{}.txt".format(school_name, course_name))
+            try:
+                digests = {"digest": file_digest(meta_file)[1], "output": file_digest(os.path.join(data_dir, name))[1]}
+            except OSError:
+                digests = None
+            if digests is not None and all(entry.get(key) == digest for key, digest in digests.items()):
+                results[name] = "unchanged"
+                continue
+        pending.append((meta_dir, data_dir, school_name, course_name, render))
+
+    if jobs == 1 or len(pending) <= 1:
+        built = [build_map(job) for job in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            built = list(executor.map(build_map, pending))
+    for name, entry, error in built:
+        results[name] = error or "built"
+        if error is None:
+            manifest[name] = entry
+        else:
+            manifest.pop(name, None)
+
+    if pending:
+        parser.write_atomic(os.path.join(data_dir, MANIFEST_NAME), serializer.dumpb(manifest, sort_keys=True))
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Build data/*.json course maps from meta/*.txt.")
+    arg_parser.add_argument("courses", nargs="*", help="<school>_<course> names; every meta file by default")
+    arg_parser.add_argument("--meta-dir", default="meta")
+    arg_parser.add_argument("--data-dir", default="data")
+    arg_parser.add_argument("--render", action="store_true", help="give every node a children list")
+    arg_parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--force", action="store_true", help="rebuild maps whose meta file is unchanged")
+    args = arg_parser.parse_args(argv)
+
+    courses = discover_courses(args.meta_dir)
+    if args.courses:
+        wanted = set(args.courses)
+        courses = [course for course in courses if "_".join(course) in wanted]
+        missing = wanted - {"_".join(course) for course in courses}
+        if missing:
+            arg_parser.error("no meta file for {}".format(", ".join(sorted(missing))))
+
+    results = build_maps(courses, args.meta_dir, args.data_dir, args.render, args.jobs, args.force)
+    for name, status in sorted(results.items()):
+        print("{}: {}".format(name, status))
+    return 0 if all(status in ("built", "unchanged") for status in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
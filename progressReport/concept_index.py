@@ -0,0 +1,156 @@
+"""
+Concept-name index for matching mastery payload keys to course leaves.
+
+A ConceptIndex is built once per course from its leaf names, in the order the
+leaves are visited, and resolves a whole payload in one pass over its keys:
+
+    exact       the key equals a concept name
+    normalized  the key equals a concept name after case folding and
+                collapsing punctuation/whitespace
+    fuzzy       a concept name occurs inside the key (prefix trie walked from
+                every offset of the key) or the key occurs inside a concept
+                name (substring search over the joined names)
+
+A key that matches some concept exactly or normalized is not offered to other
+concepts as a fuzzy match. Better tiers always win, and ties within a tier go
+to the key closest in length to the concept name, then the smallest key, so
+the result does not depend on payload order. The "legacy" mode keeps the
+original first-key substring scan.
+"""
+import os
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+MATCH_MODES = ("exact", "fuzzy", "legacy")
+DEFAULT_MATCH_MODE = os.getenv("CONCEPT_MATCH_MODE", "fuzzy")
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Separates names in the substring haystack; removed by normalize, so no key contains it.
+_SEPARATOR = "\n"
+_TERMINAL = ""
+
+_EXACT = 0
+_NORMALIZED = 1
+_FUZZY = 2
+
+
+def normalize(name):
+    return _NON_WORD.sub(" ", name.casefold()).strip()
+
+
+class ConceptIndex:
+    def __init__(self, concept_names):
+        self.concept_names = list(concept_names)
+        self.exact = {}
+        self.normalized = {}
+        # Prefix trie over the normalized names; the _TERMINAL key holds the
+        # positions of the concepts ending at that node.
+        self.trie = {}
+        for position, name in enumerate(self.concept_names):
+            self.exact.setdefault(name, []).append(position)
+            normalized_name = normalize(name)
+            self.normalized.setdefault(normalized_name, []).append(position)
+            if not normalized_name:
+                continue
+            node = self.trie
+            for char in normalized_name:
+                node = node.setdefault(char, {})
+            node.setdefault(_TERMINAL, []).append(position)
+
+        # Every distinct normalized name joined into one string so "key in
+        # concept" is a str.find scan; _offsets maps a hit back to its name.
+        self._names = list(self.normalized)
+        self._offsets = []
+        offset = 0
+        for normalized_name in self._names:
+            self._offsets.append(offset)
+            offset += len(normalized_name) + len(_SEPARATOR)
+        self._haystack = _SEPARATOR.join(self._names)
+
+    def __len__(self):
+        return len(self.concept_names)
+
+    def _names_in(self, normalized_key):
+        """
+        Yields the positions of concepts whose normalized name occurs in the key.
+        """
+        trie = self.trie
+        for start in range(len(normalized_key)):
+            node = trie
+            for char in normalized_key[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+                if _TERMINAL in node:
+                    yield from node[_TERMINAL]
+
+    def _names_containing(self, normalized_key):
+        """
+        Yields the positions of concepts whose normalized name contains the key.
+        """
+        haystack = self._haystack
+        seen = set()
+        hit = haystack.find(normalized_key)
+        while hit != -1:
+            name_index = bisect_right(self._offsets, hit) - 1
+            if name_index not in seen:
+                seen.add(name_index)
+                yield from self.normalized[self._names[name_index]]
+            # Skip to the next name; one hit per name is enough.
+            next_start = self._offsets[name_index + 1] if name_index + 1 < len(self._offsets) else len(haystack)
+            hit = haystack.find(normalized_key, next_start)
+
+    def resolve(self, payload, mode=DEFAULT_MATCH_MODE):
+        """
+        Returns the payload value matched to each concept, in index order, or
+        None where nothing matched. Only dict values are considered.
+        """
+        if mode == "legacy":
+            return [self._legacy_match(name, payload) for name in self.concept_names]
+        if mode not in MATCH_MODES:
+            raise ValueError("Unknown concept match mode: {}".format(mode))
+
+        matches = [None] * len(self.concept_names)
+        ranks = [None] * len(self.concept_names)
+
+        def offer(position, rank, value):
+            if ranks[position] is None or rank < ranks[position]:
+                ranks[position] = rank
+                matches[position] = value
+
+        for key, value in payload.items():
+            if not isinstance(value, dict):
+                continue
+            positions = self.exact.get(key)
+            if positions:
+                for position in positions:
+                    offer(position, (_EXACT, 0, key), value)
+                continue
+            normalized_key = normalize(key)
+            positions = self.normalized.get(normalized_key)
+            if positions:
+                for position in positions:
+                    offer(position, (_NORMALIZED, 0, key), value)
+                continue
+            if mode != "fuzzy" or not normalized_key:
+                continue
+            for position in set(self._names_in(normalized_key)) | set(self._names_containing(normalized_key)):
+                distance = abs(len(self.concept_names[position]) - len(key))
+                offer(position, (_FUZZY, distance, key), value)
+        return matches
+
+    @staticmethod
+    def _legacy_match(concept_name, payload):
+        for key, value in payload.items():
+            if concept_name in key or key in concept_name:
+                return value
+        return None
+
+
+@lru_cache(maxsize=64)
+def get_concept_index(concept_names):
+    """
+    Returns the shared index for a tuple of concept names.
+    """
+    return ConceptIndex(concept_names)
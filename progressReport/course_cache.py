@@ -0,0 +1,147 @@
+"""
+In-process cache of parsed course maps.
+
+Parsing a meta file and round-tripping it through data/<school>_<class>.json on
+every request is the dominant cost of a progress report, so parsed maps are kept
+in memory instead. Entries are keyed by (school, course, render) and validated
+against the meta file's stat signature; when the mtime/size changes the file is
+re-hashed and only re-parsed if its contents actually differ. The cache is
+shared by every thread of a worker; concurrent misses on one course parse it
+once.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import parser
+from metrics import metrics
+
+
+DEFAULT_CACHE_SIZE = int(os.getenv("COURSE_CACHE_SIZE", "32"))
+
+
+def meta_path(school_name, course_name):
+    return "meta/{}_{}.txt".format(school_name, course_name)
+
+
+def discover_courses(meta_dir="meta"):
+    """
+    Returns the sorted (school, course) pairs of the meta files in meta_dir;
+    a file named <school>_<course>.txt yields (school, course).
+    """
+    courses = []
+    for name in os.listdir(meta_dir):
+        stem, extension = os.path.splitext(name)
+        if extension == ".txt" and "_" in stem:
+            courses.append(tuple(stem.split("_", 1)))
+    return sorted(courses)
+
+
+class _Entry:
+    __slots__ = ("signature", "digest", "course_data")
+
+    def __init__(self, signature, digest, course_data):
+        self.signature = signature
+        self.digest = digest
+        self.course_data = course_data
+
+
+class CourseCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_shared(self, school_name, course_name, render=False):
+        """
+        Returns the cached course map itself. Callers must not mutate it.
+        """
+        return self.get_versioned(school_name, course_name, render)[0]
+
+    def get_versioned(self, school_name, course_name, render=False):
+        """
+        Returns (course map, meta file digest) for the cached course map, or
+        (None, None) when the meta file does not exist. Callers must not
+        mutate the course map.
+        """
+        path = meta_path(school_name, course_name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(school_name, course_name)
+            return None, None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        key = (school_name, course_name, render)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.course_data, entry.digest
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # One thread per key reads and parses; concurrent requests for the same
+        # course wait for it rather than all parsing the same file.
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.course_data, entry.digest
+
+            try:
+                with metrics.timer("meta_read"), open(path, "rb") as f:
+                    contents = f.read()
+            except FileNotFoundError:
+                self.invalidate(school_name, course_name)
+                return None, None
+            digest = hashlib.sha256(contents).hexdigest()
+
+            if entry is not None and entry.digest == digest:
+                # Touched but unchanged; keep the parsed tree.
+                course_data = entry.course_data
+                entry = _Entry(signature, digest, course_data)
+                hit = True
+            else:
+                with metrics.timer("parse"):
+                    course_data = parse_course(course_name, contents.decode("utf-8"), render)
+                entry = _Entry(signature, digest, course_data)
+                hit = False
+
+            with self._lock:
+                if hit:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return course_data, digest
+
+    def invalidate(self, school_name=None, course_name=None):
+        with self._lock:
+            if school_name is None and course_name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == school_name and k[1] == course_name]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def parse_course(course_name, meta_text, render=False):
+    meta = parser.parse_meta(io.StringIO(meta_text))
+    return parser.build_json(course_name, meta.term, meta.start_date, meta.class_levels, meta.student_levels,
+                             meta.root, render, meta.count)
+
+
+course_cache = CourseCache()
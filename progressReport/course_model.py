@@ -0,0 +1,300 @@
+"""
+Immutable course templates.
+
+A CourseTemplate holds a course's structure flattened in preorder (children
+always after their parent) and is shared by every request for that course.
+Requests only supply per-leaf levels, which level_arrays() rolls up into flat
+per-node arrays. Report pages carry only those arrays; the tree itself is
+serialized once per template by structure() and fetched by the page from a URL
+holding its digest.
+
+Templates come from meta/<school>_<class>.txt through the course cache, or,
+for the one course named by REDIS_COURSE (default: the class in
+meta/defaults.json) when it has no meta file and SERVER_HOST is configured,
+from the "Categories" record that dbcron/update_db.py writes to Redis. redis is imported
+on first use, so workers serving only meta file courses never load it.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from course_cache import course_cache
+from concept_index import get_concept_index
+import serializer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_START_DATE = "8/26/2024"
+DEFAULT_TERM = "Fall 2024"
+DEFAULT_CLASS_LEVELS = (
+    {"name": "Not Taught", "color": "#dddddd"},
+    {"name": "Taught", "color": "#8fbc8f"},
+)
+DEFAULT_STUDENT_LEVELS = (
+    {"name": "First Steps", "color": "#dddddd"},
+    {"name": "Needs Practice", "color": "#a3d7fc"},
+    {"name": "In Progress", "color": "#59b0f9"},
+    {"name": "Almost There", "color": "#3981c1"},
+    {"name": "Mastered", "color": "#20476a"},
+)
+
+CATEGORIES_KEY = "Categories"
+CATEGORIES_TTL = float(os.getenv("COURSE_CATEGORIES_TTL", "60"))
+
+
+class CourseTemplate:
+    __slots__ = ("name", "term", "start_date", "class_levels", "student_levels", "count", "version",
+                 "ids", "labels", "parents", "weeks", "children", "parent_positions", "children_counts",
+                 "leaf_positions", "concept_names", "_structure")
+
+    def __init__(self, name, term, start_date, class_levels, student_levels, version, nodes):
+        self.name = name
+        self.term = term
+        self.start_date = start_date
+        self.class_levels = tuple(dict(level) for level in class_levels)
+        self.student_levels = tuple(dict(level) for level in student_levels)
+        self.version = version
+
+        ids, labels, parents, weeks, children, parent_positions = [], [], [], [], [], []
+        stack = [(nodes, None)]
+        while stack:
+            node, parent_position = stack.pop()
+            position = len(ids)
+            ids.append(node["id"])
+            labels.append(node["name"])
+            parents.append(node["parent"])
+            weeks.append(node["data"]["week"])
+            children.append([])
+            parent_positions.append(parent_position)
+            if parent_position is not None:
+                children[parent_position].append(position)
+            stack.extend((child, position) for child in reversed(node.get("children") or ()))
+        self.ids = tuple(ids)
+        self.labels = tuple(labels)
+        self.parents = tuple(parents)
+        self.weeks = tuple(weeks)
+        self.children = tuple(tuple(child_positions) for child_positions in children)
+        self.parent_positions = tuple(parent_positions)
+        self.children_counts = tuple(len(child_positions) for child_positions in children)
+        self.count = len(ids)
+        self.leaf_positions = tuple(position for position, child_positions in enumerate(self.children)
+                                    if not child_positions)
+        self.concept_names = tuple(labels[position] for position in self.leaf_positions)
+        self._structure = None
+
+    @classmethod
+    def from_course_data(cls, course_data, version):
+        """
+        Builds a template from parser.build_json output.
+        """
+        return cls(course_data["nodes"]["name"], course_data["term"], course_data["start date"],
+                   course_data["class levels"], course_data["student levels"], version, course_data["nodes"])
+
+    @classmethod
+    def from_categories(cls, course_name, categories, version):
+        """
+        Builds a template from a {category: {concept: max points}} record.
+        """
+        node_id = 1
+        root = {"id": node_id, "name": course_name, "parent": "null", "children": [], "data": {"week": 0}}
+        for category, concepts in categories.items():
+            node_id += 1
+            category_node = {"id": node_id, "name": category, "parent": "null", "children": [],
+                             "data": {"week": 0}}
+            for concept in concepts:
+                node_id += 1
+                category_node["children"].append({"id": node_id, "name": concept, "parent": category,
+                                                  "children": [], "data": {"week": 0}})
+            root["children"].append(category_node)
+        return cls(course_name, DEFAULT_TERM, DEFAULT_START_DATE, DEFAULT_CLASS_LEVELS, DEFAULT_STUDENT_LEVELS,
+                   version, root)
+
+    def structure(self):
+        """
+        Returns (digest, JSON bytes) of the course structure: the nested node
+        dicts parser.build_json produces. Levels from level_arrays() line up
+        with a preorder walk of it. Serialized once per template.
+        """
+        if self._structure is None:
+            ids, labels, parents, weeks, children = self.ids, self.labels, self.parents, self.weeks, self.children
+            nodes = [None] * self.count
+            for position in range(self.count - 1, -1, -1):
+                nodes[position] = {
+                    "id": ids[position],
+                    "name": labels[position],
+                    "parent": parents[position],
+                    "children": [nodes[child] for child in children[position]],
+                    "data": {"week": weeks[position]},
+                }
+            body = serializer.dumpb({"name": self.name, "count": self.count, "nodes": nodes[0]})
+            self._structure = (hashlib.blake2b(body, digest_size=16).hexdigest(), body)
+        return self._structure
+
+    @property
+    def concept_index(self):
+        return get_concept_index(self.concept_names)
+
+    def level_arrays(self, leaf_levels):
+        """
+        Returns flat (student levels, class levels) lists for every node, given
+        (student_level, class_level) pairs for the leaves in order. Inner nodes
+        take the floored mean of their children.
+        """
+        student = [0] * self.count
+        klass = [0] * self.count
+        for position, (student_level, class_level) in zip(self.leaf_positions, leaf_levels):
+            student[position] = student_level
+            klass[position] = class_level
+        # Children always follow their parent, so one reverse scan sees every
+        # child before it is summed into its parent.
+        parent_positions = self.parent_positions
+        children_counts = self.children_counts
+        for position in range(self.count - 1, 0, -1):
+            children_count = children_counts[position]
+            if children_count:
+                student[position] //= children_count
+                klass[position] //= children_count
+            parent = parent_positions[position]
+            student[parent] += student[position]
+            klass[parent] += klass[position]
+        if children_counts[0]:
+            student[0] //= children_counts[0]
+            klass[0] //= children_counts[0]
+        return student, klass
+
+    def level_matrix(self, students_leaf_levels):
+        """
+        level_arrays for many students at once. Returns one (student levels,
+        class levels) pair of per-node lists per student, computed node by node
+        over columns holding every student's value, with NumPy when available.
+        """
+        student_count = len(students_leaf_levels)
+        if not student_count:
+            return []
+        parent_positions = self.parent_positions
+        children_counts = self.children_counts
+        if numpy is not None:
+            leaves = numpy.asarray(students_leaf_levels, dtype=numpy.int64).reshape(student_count, -1, 2)
+            student = numpy.zeros((self.count, student_count), dtype=numpy.int64)
+            klass = numpy.zeros((self.count, student_count), dtype=numpy.int64)
+            student[list(self.leaf_positions)] = leaves[:, :, 0].T
+            klass[list(self.leaf_positions)] = leaves[:, :, 1].T
+            for position in range(self.count - 1, -1, -1):
+                children_count = children_counts[position]
+                if children_count:
+                    student[position] //= children_count
+                    klass[position] //= children_count
+                if position:
+                    student[parent_positions[position]] += student[position]
+                    klass[parent_positions[position]] += klass[position]
+            return list(zip(student.T.tolist(), klass.T.tolist()))
+
+        student = [[0] * student_count for _ in range(self.count)]
+        klass = [[0] * student_count for _ in range(self.count)]
+        for leaf, position in enumerate(self.leaf_positions):
+            student[position] = [leaf_levels[leaf][0] for leaf_levels in students_leaf_levels]
+            klass[position] = [leaf_levels[leaf][1] for leaf_levels in students_leaf_levels]
+        for position in range(self.count - 1, -1, -1):
+            children_count = children_counts[position]
+            if children_count:
+                student[position] = [level // children_count for level in student[position]]
+                klass[position] = [level // children_count for level in klass[position]]
+            if position:
+                parent = parent_positions[position]
+                student[parent] = [a + b for a, b in zip(student[parent], student[position])]
+                klass[parent] = [a + b for a, b in zip(klass[parent], klass[position])]
+        return [(list(student_levels), list(class_levels))
+                for student_levels, class_levels in zip(zip(*student), zip(*klass))]
+
+
+class CourseModels:
+    """
+    Loads and caches one template per course. Only redis_course, when set, is
+    built from the Redis Categories record; any other course without a meta
+    file is unknown, so request-supplied names never add cache entries.
+    """
+    def __init__(self, redis_course=None):
+        self.redis_course = redis_course
+        self._templates = {}
+        self._redis_template = None
+        self._lock = threading.Lock()
+        self._redis_client = None
+
+    def get(self, school_name, course_name):
+        """
+        Returns the current template for a course, or None if it is unknown.
+        """
+        course_data, version = course_cache.get_versioned(school_name, course_name, render=True)
+        if course_data is not None:
+            return self._cached((school_name, course_name, version),
+                                lambda: CourseTemplate.from_course_data(course_data, version))
+        if self.redis_course is None or course_name != self.redis_course:
+            return None
+        return self._from_redis()
+
+    def preload(self, courses):
+        """
+        Builds the template and structure of every (school, course) pair ahead
+        of the first request. Returns the number of templates built.
+        """
+        count = 0
+        for school_name, course_name in courses:
+            template = self.get(school_name, course_name)
+            if template is not None:
+                template.structure()
+                count += 1
+        return count
+
+    def _cached(self, key, build):
+        course_key = key[:2]
+        with self._lock:
+            template = self._templates.get(course_key)
+            if template is not None and template[0] == key:
+                return template[1]
+        built = build()
+        with self._lock:
+            self._templates[course_key] = (key, built)
+        return built
+
+    def _from_redis(self):
+        # One entry, replaced when the Categories record changes.
+        with self._lock:
+            cached = self._redis_template
+        if cached is not None and time.monotonic() - cached[0] < CATEGORIES_TTL:
+            return cached[1]
+        client = self._redis()
+        if client is None:
+            return None
+        raw_categories = client.get(CATEGORIES_KEY)
+        if raw_categories is None:
+            return None
+        version = hashlib.sha256(raw_categories).hexdigest()
+        if cached is not None and cached[1].version == version:
+            template = cached[1]
+        else:
+            template = CourseTemplate.from_categories(self.redis_course, serializer.loads(raw_categories), version)
+        with self._lock:
+            self._redis_template = (time.monotonic(), template)
+        return template
+
+    def _redis(self):
+        if self._redis_client is None and os.getenv("SERVER_HOST"):
+            try:
+                import redis
+            except ImportError:
+                return None
+            with self._lock:
+                # redis.Redis is thread-safe; request threads share one connection pool.
+                if self._redis_client is None:
+                    self._redis_client = redis.Redis(host=os.getenv("SERVER_HOST"),
+                                                     port=int(os.getenv("SERVER_PORT", "6379")),
+                                                     db=int(os.getenv("SERVER_DBINDEX", "0")),
+                                                     password=os.getenv("REDIS_DB_SECRET"))
+        return self._redis_client
+
+
+course_models = CourseModels(os.getenv("REDIS_COURSE"))
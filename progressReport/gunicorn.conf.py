@@ -0,0 +1,20 @@
+"""
+Gunicorn settings for serving the progress report:
+
+    gunicorn -c gunicorn.conf.py app:app             # synchronous workers
+    THREADS=8 gunicorn -c gunicorn.conf.py app:app   # opt-in threaded workers
+
+With THREADS above 1 each worker process runs that many request threads
+(gthread) sharing its course and render caches, so a request waiting on disk
+or Redis does not hold up the whole worker. The app is imported once before
+the workers fork.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+preload_app = True
+keepalive = 5
@@ -0,0 +1,200 @@
+"""
+Request metrics and sampled profiling.
+
+app.py times every request per route and the hot stages inside them
+(validation, course template lookup, level assignment, rendering, meta file
+I/O and parsing) with metrics.timer(stage). Durations are aggregated into
+fixed-bucket histograms and served in the Prometheus text format on
+/metrics, along with the render and course cache counters. Metrics live in
+the worker process that recorded them; with several uWSGI workers each scrape
+sees one worker.
+
+PROFILE_EVERY=N profiles one request in N. PROFILER picks cProfile (the
+default) or pyinstrument, when installed. Profiles go to PROFILE_DIR as .prof
+(pstats) or .html files when it is set, and otherwise the top functions are
+logged.
+"""
+import bisect
+import io
+import itertools
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_EVERY = int(os.getenv("PROFILE_EVERY", "0"))
+PROFILER = os.getenv("PROFILER", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+REQUEST_SECONDS = "progress_report_request_seconds"
+STAGE_SECONDS = "progress_report_stage_seconds"
+_HELP = {
+    REQUEST_SECONDS: "Time to handle a request, by method, route and status.",
+    STAGE_SECONDS: "Time spent in one stage of handling a request.",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket, not cumulative.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                          for name, value in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage)
+
+    def register(self, name, kind, help_text, collect):
+        """
+        Adds a metric read at scrape time: collect() returns [(labels dict,
+        value)]. kind is a Prometheus type, e.g. "counter" or "gauge".
+        """
+        self._collectors.append((name, kind, help_text, collect))
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        with self._lock:
+            histograms = sorted((key, list(histogram.counts), histogram.sum, histogram.count)
+                                for key, histogram in self._histograms.items())
+        lines = []
+        described = set()
+        for (name, labels), counts, total, count in histograms:
+            if name not in described:
+                described.add(name)
+                lines.append("# HELP {} {}".format(name, _HELP.get(name, name)))
+                lines.append("# TYPE {} histogram".format(name))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append("{}_bucket{} {}".format(name, _labels(labels, [("le", bound)]), cumulative))
+            lines.append("{}_sum{} {}".format(name, _labels(labels), total))
+            lines.append("{}_count{} {}".format(name, _labels(labels), count))
+        for name, kind, help_text, collect in self._collectors:
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for labels, value in collect():
+                lines.append("{}{} {}".format(name, _labels(sorted(labels.items())), value))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class SampledProfiler:
+    """
+    Profiles one start()/stop() span in every, or none when every is 0.
+    """
+    def __init__(self, every=PROFILE_EVERY, profiler=PROFILER, output_dir=PROFILE_DIR):
+        if profiler not in ("cprofile", "pyinstrument"):
+            raise ValueError("PROFILER must be one of cprofile, pyinstrument")
+        if profiler == "pyinstrument" and pyinstrument is None:
+            logger.warning("pyinstrument is not installed, profiling with cProfile")
+            profiler = "cprofile"
+        self.every = every
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self._calls = itertools.count(1)
+
+    def start(self, name):
+        """
+        Starts profiling the current thread when this call is sampled.
+        Returns a handle to pass to stop(), or None.
+        """
+        if self.every <= 0:
+            return None
+        call = next(self._calls)
+        if call % self.every:
+            return None
+        if self.profiler == "pyinstrument":
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a concurrent sampled request) is active.
+                return None
+        return name, call, profiler
+
+    def stop(self, handle):
+        if handle is None:
+            return
+        name, call, profiler = handle
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        self._report(name, call, profiler)
+
+    def _report(self, name, call, profiler):
+        name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name).strip("_") or "request"
+        if self.output_dir:
+            path = os.path.join(self.output_dir, "{}-{}-{}".format(name, os.getpid(), call))
+            if self.profiler == "pyinstrument":
+                with open(path + ".html", "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            else:
+                profiler.dump_stats(path + ".prof")
+            return
+        if self.profiler == "pyinstrument":
+            logger.info("Profile of %s:\n%s", name, profiler.output_text())
+        else:
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(20)
+            logger.info("Profile of %s:\n%s", name, text.getvalue())
+
+
+metrics = Metrics()
+profiler = SampledProfiler()
@@ -0,0 +1,134 @@
+"""
+Array-backed course trees.
+
+A NodeTree stores a parsed course map as parallel arrays indexed by position
+(node ID - 1): parent, first child and next sibling links plus interned labels
+and styles. Large merged maps hold tens of thousands of nodes, and this avoids
+a per-node object and __dict__. NodeView gives read-only, parser.Node-compatible
+access to single nodes. Every traversal here is iterative, so depth is bounded
+by memory rather than the recursion limit.
+"""
+import sys
+from array import array
+
+NO_NODE = -1
+
+
+class NodeTree:
+    __slots__ = ("labels", "styles", "weeks", "parents", "first_child", "next_sibling", "_last_child")
+
+    def __init__(self):
+        self.labels = []
+        self.styles = []
+        self.weeks = array("i")
+        self.parents = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self._last_child = array("i")
+
+    def add(self, label, style, week, parent=NO_NODE):
+        """
+        Appends a node as the last child of parent and returns its index.
+        """
+        index = len(self.labels)
+        self.labels.append(sys.intern(label))
+        self.styles.append(sys.intern(style))
+        self.weeks.append(int(week))
+        self.parents.append(parent)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self._last_child.append(NO_NODE)
+        if parent != NO_NODE:
+            last = self._last_child[parent]
+            if last == NO_NODE:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[last] = index
+            self._last_child[parent] = index
+        return index
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def root(self):
+        return NodeView(self, 0)
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def to_json(self, render=False):
+        """
+        Returns the nested node dicts produced by parser.build_json.
+
+        Parents always precede their children in the arrays and siblings are
+        stored in order, so a single forward scan rebuilds the nesting.
+        """
+        labels = self.labels
+        weeks = self.weeks
+        parents = self.parents
+        first_child = self.first_child
+        nodes_json = []
+        for index in range(len(labels)):
+            parent = parents[index]
+            node_json = {
+                "id": index + 1,
+                "name": labels[index],
+                "parent": labels[parent] if parent > 0 else "null",
+            }
+            if render or first_child[index] != NO_NODE:
+                node_json["children"] = []
+            node_json["data"] = {"week": weeks[index]}
+            nodes_json.append(node_json)
+            if parent != NO_NODE:
+                nodes_json[parent]["children"].append(node_json)
+        return nodes_json[0] if nodes_json else None
+
+
+class NodeView:
+    """
+    A parser.Node-compatible, read-only view of one node in a NodeTree.
+    """
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def id(self):
+        return self.index + 1
+
+    @property
+    def label(self):
+        return self.tree.labels[self.index]
+
+    @property
+    def style(self):
+        return self.tree.styles[self.index]
+
+    @property
+    def week(self):
+        return self.tree.weeks[self.index]
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        return NodeView(self.tree, parent) if parent > 0 else None
+
+    @property
+    def children(self):
+        return [NodeView(self.tree, child) for child in self.tree.children(self.index)]
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self):
+        return "NodeView(id={}, label={!r})".format(self.id, self.label)
+
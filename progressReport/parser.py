@@ -1,12 +1,21 @@
+import itertools
+import logging
+import os
 import re
-import json
+import tempfile
+from collections import namedtuple
 
+import serializer
+from node_tree import NodeTree
 
-class Node:
-    count = 0
+logger = logging.getLogger(__name__)
 
-    def __init__(self, label, style, week, parent=None, children=None):
-        self.id = Node.count + 1
+
+class Node:
+    def __init__(self, label, style, week, parent=None, children=None, id=None):
+        # IDs are allocated by whichever parse builds the tree, never from
+        # shared state, so concurrent parses cannot interleave their numbering.
+        self.id = id
         self.label = label
         self.style = style
         self.week = int(week)
@@ -14,11 +23,155 @@ class Node:
         if children is None:
             children = []
         self.children = children
-        Node.count += 1
+
+
+class MetaParseError(ValueError):
+    def __init__(self, message, line, column, text=""):
+        super().__init__("line {}, column {}: {}".format(line, column, message))
+        self.message = message
+        self.line = line
+        self.column = column
+        self.text = text
+
+
+ParsedMeta = namedtuple("ParsedMeta", ["name", "orientation", "start_date", "term", "class_levels",
+                                       "student_levels", "styles", "root", "count", "tree"])
+
+# Each section has a single tokenizer with one alternative per line shape;
+# parse_meta dispatches on the name of the outermost group that matched
+# (Match.lastgroup), so every line costs exactly one regex match.
+_HEADER_TOKENS = r"""
+    (?P<SECTION>(?P<section>styles|class\ levels|student\ levels|nodes):.*)
+  | (?P<END>end.*)
+  | (?P<NAME>name:\ (?P<name>[A-Za-z0-9\-_]+).*)
+  | (?P<TERM>term:\ (?P<season>[A-Za-z0-9]+)\ (?P<year>[0-9]+).*)
+  | (?P<ORIENTATION>orientation:\ (?P<from>[A-Za-z]+)\ to\ (?P<to>[A-Za-z]+).*)
+  | (?P<START_DATE>start\ date:\ (?P<year_>\d{4})\ (?P<month>\d{2})\ (?P<day>\d{2}).*)
+"""
+
+_SECTION_TOKENS = {
+    None: "",
+    "STYLE": r"""
+  | (?P<STYLE>\s+name:\ (?P<style_name>[A-Za-z0-9]+),\ shape:\ (?P<shape>[A-Za-z]+),
+        \ style:\ (?P<style>[A-Za-z]+),\ fillcolor:\ \#(?P<fillcolor>[A-Za-z0-9]+).*)
+""",
+    "CLASS_LEVEL": r"""
+  | (?P<LEVEL>\s*(?P<level>[A-Za-z\-_\s]+):\ \#(?P<color>[A-Za-z0-9]+).*)
+""",
+    "NODE": r"""
+  | (?P<NODE>(?P<indent>\s+)(?P<label>[^\[]+)\ \[(?P<node_style>[A-Za-z0-9]+),\ Week(?P<week>[0-9]+)].*)
+""",
+}
+_SECTION_TOKENS["STUDENT_LEVEL"] = _SECTION_TOKENS["CLASS_LEVEL"]
+
+_META_TOKENIZERS = {mode: re.compile(_HEADER_TOKENS + tokens, re.VERBOSE)
+                    for mode, tokens in _SECTION_TOKENS.items()}
+
+_HEADER_SYNTAX = {
+    "name:": "name: <name>",
+    "term:": "term: <season> <year>",
+    "orientation:": "orientation: <from> to <to>",
+    "start date:": "start date: <yyyy> <mm> <dd>",
+}
+
+_SECTION_SYNTAX = {
+    "STYLE": "style 'name: <name>, shape: <shape>, style: <style>, fillcolor: #<color>'",
+    "CLASS_LEVEL": "level '<name>: #<color>'",
+    "STUDENT_LEVEL": "level '<name>: #<color>'",
+    "NODE": "node '<label> [<style>, Week<n>]'",
+}
+
+_SECTION_MODES = {
+    "styles": "STYLE",
+    "class levels": "CLASS_LEVEL",
+    "student levels": "STUDENT_LEVEL",
+    "nodes": "NODE",
+}
+
+
+def parse_meta(f):
+    """
+    Parses a meta file in a single pass, one tokenizer match per line.
+
+    Unlike read_meta, malformed lines raise MetaParseError with the line and
+    column at fault. Nodes are stored in a NodeTree; the returned root is a
+    Node-compatible view of it.
+    """
+    name = ""
+    term = ""
+    orientation = ""
+    start_date = []
+    styles = {}
+    class_levels = []
+    student_levels = []
+    tree = NodeTree()
+    root = tree.add(label="", style="root", week=0)
+    max_week = 0
+
+    parse_mode = None
+    # stack[d - 1] is the index of the most recent node at depth d.
+    stack = []
+
+    tokenizer = _META_TOKENIZERS[parse_mode]
+    for line_no, line in enumerate(f, start=1):
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        m = tokenizer.fullmatch(line)
+        if m is None:
+            for keyword, syntax in _HEADER_SYNTAX.items():
+                if line.startswith(keyword):
+                    raise MetaParseError("expected '{}'".format(syntax), line_no, len(keyword) + 2, line)
+            if parse_mode is None:
+                # Anything else outside a section is a comment.
+                continue
+            column = len(line) - len(line.lstrip()) + 1
+            raise MetaParseError("expected {}".format(_SECTION_SYNTAX[parse_mode]), line_no, column, line)
+        kind = m.lastgroup
+
+        if kind == "NODE":
+            week = int(m.group("week"))
+            if week > max_week:
+                max_week = week
+            depth = max(len(m.group("indent")) // 4, 1)
+            if depth > len(stack) + 1:
+                depth = len(stack) + 1
+            del stack[depth - 1:]
+            parent = stack[-1] if stack else root
+            stack.append(tree.add(m.group("label"), m.group("node_style"), week, parent))
+        elif kind == "LEVEL":
+            level = {"name": m.group("level"), "color": "#{}".format(m.group("color"))}
+            (class_levels if parse_mode == "CLASS_LEVEL" else student_levels).append(level)
+        elif kind == "STYLE":
+            styles[m.group("style_name")] = {
+                "shape": m.group("shape"),
+                "style": m.group("style"),
+                "fillcolor": "#{}".format(m.group("fillcolor"))
+            }
+        elif kind == "SECTION":
+            parse_mode = _SECTION_MODES[m.group("section")]
+            tokenizer = _META_TOKENIZERS[parse_mode]
+        elif kind == "END":
+            parse_mode = None
+            tokenizer = _META_TOKENIZERS[parse_mode]
+        elif kind == "NAME":
+            name = m.group("name")
+        elif kind == "TERM":
+            term = "{} {}".format(m.group("season"), m.group("year"))
+        elif kind == "ORIENTATION":
+            orientation = "LR" if m.group("from") == "left" and m.group("to") == "right" else "RL"
+        elif kind == "START_DATE":
+            start_date.extend([int(m.group("year_")), int(m.group("month")), int(m.group("day"))])
+
+    tree.labels[root] = name
+    tree.weeks[root] = max_week
+
+    return ParsedMeta(name, orientation, start_date, term, class_levels, student_levels, styles, tree.root,
+                      len(tree), tree)
 
 
 def read_meta(f):
-    Node.count = 0
+    ids = itertools.count(1)
     name = ""
     term = ""
     orientation = ""
@@ -27,7 +180,7 @@ def read_meta(f):
     class_levels = []
     student_levels = []
     nodes = []
-    root = Node(label="", style="root", week=0, parent=None, children=nodes)
+    root = Node(label="", style="root", week=0, parent=None, children=nodes, id=next(ids))
 
     parse_mode = None
 
@@ -80,20 +233,23 @@ def read_meta(f):
             node_match = re.search(r"(\s+)([^\[]+) \[([A-Za-z0-9]+), Week([0-9]+)]", line)
             root.week = max(root.week, int(node_match.group(4)))
             if len(node_match.group(1)) // 4 == 1:
-                cur_node_parent = Node(node_match.group(2), node_match.group(3), node_match.group(4))
+                cur_node_parent = Node(node_match.group(2), node_match.group(3), node_match.group(4), id=next(ids))
                 nodes.append(cur_node_parent)
                 cur_node_parent_depth = 1
             elif len(node_match.group(1)) // 4 < cur_node_parent_depth:
                 cur_node_parent = cur_node_parent.parent
                 cur_node_parent_depth -= 1
                 cur_node_parent.parent.children.append(
-                    Node(node_match.group(2), node_match.group(3), node_match.group(4), cur_node_parent))
+                    Node(node_match.group(2), node_match.group(3), node_match.group(4), cur_node_parent,
+                         id=next(ids)))
             elif len(node_match.group(1)) // 4 == cur_node_parent_depth:
-                new_children = Node(node_match.group(2), node_match.group(3), node_match.group(4), cur_node_parent.parent)
+                new_children = Node(node_match.group(2), node_match.group(3), node_match.group(4),
+                                    cur_node_parent.parent, id=next(ids))
                 cur_node_parent.parent.children.append(new_children)
                 cur_node_parent = new_children
             elif len(node_match.group(1)) // 4 > cur_node_parent_depth:
-                new_children = Node(node_match.group(2), node_match.group(3), node_match.group(4), cur_node_parent)
+                new_children = Node(node_match.group(2), node_match.group(3), node_match.group(4), cur_node_parent,
+                                    id=next(ids))
                 cur_node_parent.children.append(new_children)
                 cur_node_parent = new_children
                 cur_node_parent_depth += 1
@@ -105,28 +261,12 @@ def read_meta(f):
     return name, orientation, start_date, term, class_levels, student_levels, styles, root
 
 
-def to_json(school_name, course_name, term, start_date, class_levels, student_levels, root, render=False):
-    def nodes_to_json(node):
-        if render or node.children:
-            nodes_json = {
-                "id": node.id,
-                "name": node.label,
-                "parent": node.parent.label if node.parent else "null",
-                "children": [nodes_to_json(c) for c in node.children],
-                "data": {
-                    "week": node.week,
-                }
-            }
-        else:
-            nodes_json = {
-                "id": node.id,
-                "name": node.label,
-                "parent": node.parent.label if node.parent else "null",
-                "data": {
-                    "week": node.week,
-                }
-            }
-        return nodes_json
+def build_json(course_name, term, start_date, class_levels, student_levels, root, render=False, count=None):
+    tree = getattr(root, "tree", None)
+    if tree is not None and root.index == 0:
+        nodes = tree.to_json(render)
+    else:
+        nodes = nodes_to_json(root, render)
 
     json_out = {
         "name": course_name,
@@ -134,18 +274,84 @@ def to_json(school_name, course_name, term, start_date, class_levels, student_le
         "start date": "{}/{}/{}".format(start_date[1], start_date[2], start_date[0]),
         "class levels": class_levels,
         "student levels": student_levels,
-        "count": Node.count,
-        "nodes": nodes_to_json(root)
+        "count": count_nodes(root) if count is None else count,
+        "nodes": nodes
     }
+    return json_out
+
+
+def count_nodes(root):
+    tree = getattr(root, "tree", None)
+    if tree is not None and root.index == 0:
+        return len(tree)
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def nodes_to_json(root, render=False):
+    """
+    Converts a Node tree to nested dicts without recursing.
+    """
+    def node_json(node):
+        nodes_json = {
+            "id": node.id,
+            "name": node.label,
+            "parent": node.parent.label if node.parent else "null",
+        }
+        if render or node.children:
+            nodes_json["children"] = []
+        nodes_json["data"] = {
+            "week": node.week,
+        }
+        return nodes_json
+
+    root_json = node_json(root)
+    stack = [(root, root_json)]
+    while stack:
+        node, parent_json = stack.pop()
+        for child in node.children:
+            child_json = node_json(child)
+            parent_json["children"].append(child_json)
+            stack.append((child, child_json))
+    return root_json
+
+
+def to_json(school_name, course_name, term, start_date, class_levels, student_levels, root, render=False,
+            count=None):
+    json_out = build_json(course_name, term, start_date, class_levels, student_levels, root, render, count)
+    write_atomic('data/{}_{}.json'.format(school_name, course_name), serializer.dumpb(json_out))
+
+
+def write_atomic(path, data):
+    """
+    Writes bytes to path through a temporary file in the same directory and a
+    rename, so readers see either the old file or the complete new one.
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp", dir=directory or ".")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            os.fchmod(temp_file.fileno(), 0o644)  # mkstemp creates the file owner-only
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
-    with open('data/{}_{}.json'.format(school_name, course_name), 'w', encoding='utf-8') as json_out_file:
-        json.dump(json_out, json_out_file, indent=4)
 
 def generate_map(school_name, course_name, render=False):
-    print("Log: {}_{}".format(school_name, course_name))
+    logger.info("Generating map %s_%s", school_name, course_name)
     try:
         with open("meta/{}_{}.txt".format(school_name, course_name), "r") as f:
-            name, orientation, start_date, term, class_levels, student_levels, styles, root = read_meta(f)
-            to_json(school_name, course_name, term, start_date, class_levels, student_levels, root, render)
+            meta = parse_meta(f)
+            to_json(school_name, course_name, meta.term, meta.start_date, meta.class_levels, meta.student_levels,
+                    meta.root, render, meta.count)
     except FileNotFoundError:
         return
\ No newline at end of file
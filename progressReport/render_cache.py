@@ -0,0 +1,119 @@
+"""
+Cache of rendered progress report pages.
+
+Reports only differ by course and per-leaf levels, and many students share the
+same levels (early in term most are all zero), so rendered pages are cached by
+a key made of the course, its version and a digest of the leaf levels. The key
+is deterministic, so every worker derives the same ETag and clients can
+revalidate GET requests with If-None-Match. POST responses carry no ETag:
+conditional requests only apply to GET and HEAD, so a POST always gets the
+full page. Bodies can be pre-compressed once per entry with
+the encodings listed in RENDER_CACHE_ENCODINGS (gzip, br).
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "1024"))
+DEFAULT_ENCODINGS = [encoding.strip() for encoding in os.getenv("RENDER_CACHE_ENCODINGS", "").split(",")
+                     if encoding.strip()]
+
+_COMPRESSORS = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body)
+
+
+def levels_digest(levels):
+    """
+    Digest of a sequence of per-leaf (student_level, class_level) pairs.
+    """
+    return hashlib.blake2b(repr(list(levels)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CachedPage:
+    __slots__ = ("etag", "bodies")
+
+    def __init__(self, etag, bodies):
+        self.etag = etag
+        self.bodies = bodies
+
+
+class RenderCache:
+    def __init__(self, max_size=DEFAULT_RENDER_CACHE_SIZE, encodings=None):
+        self.max_size = max_size
+        self.encodings = [encoding for encoding in (DEFAULT_ENCODINGS if encodings is None else encodings)
+                          if encoding in _COMPRESSORS]
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag_for(key):
+        return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, html):
+        body = html.encode("utf-8")
+        bodies = {"identity": body}
+        for encoding in self.encodings:
+            bodies[encoding] = _COMPRESSORS[encoding](body)
+        page = CachedPage(self.etag_for(key), bodies)
+        if self.max_size <= 0:
+            return page
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def __len__(self):
+        return len(self._pages)
+
+
+def page_response(page):
+    """
+    Builds the response for a cached page, honouring Accept-Encoding and, for
+    GET and HEAD, If-None-Match.
+    """
+    encoding = "identity"
+    if len(page.bodies) > 1:
+        encoding = request.accept_encodings.best_match([e for e in page.bodies if e != "identity"]) or "identity"
+    response = Response(page.bodies[encoding], mimetype="text/html")
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "private, no-cache"
+    if request.method not in ("GET", "HEAD"):
+        return response
+    # The same ETag covers every encoding of a page, so it is weak.
+    response.set_etag(page.etag, weak=True)
+    return response.make_conditional(request)
+
+
+render_cache = RenderCache()
@@ -0,0 +1,106 @@
+"""
+JSON encoding and decoding for the progress report service.
+
+Every JSON document the service reads or writes goes through this module:
+request bodies, the |tojson course data in rendered reports, /batch NDJSON
+lines and the data/*.json maps. It uses orjson when installed, then msgspec,
+then the standard library; JSON_BACKEND=orjson|msgspec|json picks one
+explicitly. Output is compact unless JSON_DEBUG is set, in which case it is
+indented by 2 spaces (the only indent orjson supports). Non-ASCII characters
+are written as UTF-8 rather than \\u escapes by every backend, and decoding
+errors are always raised as ValueError.
+"""
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+BACKENDS = ("orjson", "msgspec", "json")
+DEBUG = os.getenv("JSON_DEBUG", "").lower() in ("1", "true")
+
+
+def _orjson_codec(debug):
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if debug else 0)
+
+    def dumpb(obj, sort_keys=False):
+        return orjson.dumps(obj, option=option | orjson.OPT_SORT_KEYS if sort_keys else option)
+
+    return dumpb, orjson.loads
+
+
+def _msgspec_codec(debug):
+    import msgspec
+
+    encoders = {False: msgspec.json.Encoder(), True: msgspec.json.Encoder(order="sorted")}
+    decoder = msgspec.json.Decoder()
+
+    def dumpb(obj, sort_keys=False):
+        data = encoders[sort_keys].encode(obj)
+        return msgspec.json.format(data, indent=2) if debug else data
+
+    def loads(data):
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as error:
+            raise ValueError(str(error)) from error
+
+    return dumpb, loads
+
+
+def _json_codec(debug):
+    indent, separators = (2, None) if debug else (None, (",", ":"))
+
+    def dumpb(obj, sort_keys=False):
+        return json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators,
+                          sort_keys=sort_keys).encode("utf-8")
+
+    return dumpb, json.loads
+
+
+def select_backend(name="auto"):
+    """
+    Returns the backend name to use for name: "auto" picks the first of
+    BACKENDS that is installed.
+    """
+    if name == "auto":
+        for backend in BACKENDS[:-1]:
+            try:
+                __import__(backend)
+            except ImportError:
+                continue
+            return backend
+        return "json"
+    if name not in BACKENDS:
+        raise ValueError("JSON_BACKEND must be one of auto, {}".format(", ".join(BACKENDS)))
+    return name
+
+
+BACKEND = select_backend(os.getenv("JSON_BACKEND", "auto"))
+_CODECS = {"orjson": _orjson_codec, "msgspec": _msgspec_codec, "json": _json_codec}
+# dumpb(obj, sort_keys=False) returns UTF-8 encoded JSON bytes.
+dumpb, loads = _CODECS[BACKEND](DEBUG)
+
+
+def dumps(obj, sort_keys=False):
+    """
+    Returns obj as a JSON string.
+    """
+    return dumpb(obj, sort_keys).decode("utf-8")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by this module, used by request.get_json(),
+    jsonify and the |tojson template filter. Objects the backend cannot encode
+    fall back to Flask's default provider.
+    """
+    def dumps(self, obj, **kwargs):
+        try:
+            return dumps(obj, kwargs.get("sort_keys", self.sort_keys))
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app reads meta/ relative to the working directory, from import time on.
+os.chdir(ROOT)
+
+from app import app  # noqa: E402
+from course_cache import course_cache  # noqa: E402
+from render_cache import render_cache  # noqa: E402
+
+TEST_META = """name: {name}
+term: Spring 2024
+orientation: left to right
+start date: 2024 01 15
+styles:
+    name: default, shape: ellipse, style: filled, fillcolor: #E0E0E0
+class levels:
+    Not Taught: #dddddd
+    Taught: #8fbc8f
+student levels:
+    First Steps: #dddddd
+    Needs Practice: #a3d7fc
+    In Progress: #59b0f9
+    Almost There: #3981c1
+    Mastered: #20476a
+nodes:
+    Objects [default, Week1]
+        Subclassing [default, Week1]
+        Iteration [default, Week2]
+end
+"""
+
+
+@pytest.fixture
+def client():
+    render_cache.clear()
+    return app.test_client()
+
+
+@pytest.fixture
+def test_course(tmp_path, monkeypatch):
+    """
+    Runs the test from a directory holding meta/Test_OOP.txt, a two-leaf
+    course whose "Subclassing" concept contains the payload key "class".
+    """
+    (tmp_path / "meta").mkdir()
+    (tmp_path / "meta" / "Test_OOP.txt").write_text(TEST_META.format(name="OOP"))
+    monkeypatch.chdir(tmp_path)
+    course_cache.invalidate()
+    render_cache.clear()
+    yield "Test", "OOP"
+    course_cache.invalidate()
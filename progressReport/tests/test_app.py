@@ -0,0 +1,47 @@
+def test_post_renders_report(client, test_course):
+    school, course = test_course
+    response = client.post("/", json={"school": school, "class": course,
+                                      "Iteration": {"student_mastery": 2, "class_mastery": 1}})
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+
+
+def test_legacy_match_on_non_mastery_value_is_bad_request(client, test_course):
+    school, course = test_course
+    # "class" is a substring of "Subclassing", so the legacy scan matches the course name string to it.
+    response = client.post("/?match=legacy", json={"school": school, "class": course,
+                                                   "Iteration": {"student_mastery": 2}})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid mastery learning request"
+
+
+def test_batch_legacy_match_on_non_mastery_value_is_bad_request(client, test_course):
+    school, course = test_course
+    response = client.post("/batch?match=legacy", json={"school": school, "class": course, "students": [
+        {"id": "a", "mastery": {"class": "x", "Iteration": {"student_mastery": 1}}}]})
+    assert response.status_code == 400
+
+
+def test_out_of_range_level_is_bad_request(client):
+    response = client.post("/", json={"school": "Berkeley", "class": "CS10",
+                                      "Abstraction": {"student_mastery": 2 ** 63}})
+    assert response.status_code == 400
+    assert response.get_json()["details"][0]["path"] == "/Abstraction/student_mastery"
+
+
+def test_batch_out_of_range_level_is_bad_request(client):
+    response = client.post("/batch", json={"school": "Berkeley", "class": "CS10", "students": [
+        {"id": "a", "mastery": {"Abstraction": {"student_mastery": 10 ** 30}}}]})
+    assert response.status_code == 400
+
+
+def test_batch_too_large_is_rejected(client, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "MAX_BATCH_STUDENTS", 2)
+    students = [{"id": str(i), "mastery": {}} for i in range(3)]
+    response = client.post("/batch", json={"school": "Berkeley", "class": "CS10", "students": students})
+    assert response.status_code == 413
+    response = client.post("/batch", json={"school": "Berkeley", "class": "CS10", "students": students[:2]})
+    assert response.status_code == 200
+    assert len(response.data.splitlines()) == 2
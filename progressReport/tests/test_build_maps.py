@@ -0,0 +1,67 @@
+import os
+import shutil
+import stat
+
+import pytest
+
+import build_maps
+import parser
+import serializer
+
+GOOD = ["Berkeley_CS10", "Berkeley_CS61C", "Stanford_CS101"]
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    meta_dir, data_dir = tmp_path / "meta", tmp_path / "data"
+    meta_dir.mkdir()
+    data_dir.mkdir()
+    for name in GOOD:
+        shutil.copy(os.path.join("meta", name + ".txt"), meta_dir)
+    return str(meta_dir), str(data_dir)
+
+
+def run(meta_dir, data_dir, *args):
+    return build_maps.main(["--meta-dir", meta_dir, "--data-dir", data_dir, "--jobs", "2"] + list(args))
+
+
+def test_builds_every_map_readable_by_all(dirs):
+    meta_dir, data_dir = dirs
+    assert run(meta_dir, data_dir) == 0
+    for name in GOOD:
+        path = os.path.join(data_dir, name + ".json")
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+        with open(path, "rb") as f:
+            assert serializer.loads(f.read())["nodes"]["name"] == name.split("_")[1]
+    manifest = build_maps.load_manifest(data_dir)
+    assert sorted(manifest) == [name + ".json" for name in GOOD]
+    # Nothing changed, so nothing is rebuilt.
+    assert build_maps.build_maps([tuple(name.split("_")) for name in GOOD], meta_dir, data_dir) == {
+        name + ".json": "unchanged" for name in GOOD}
+
+
+def test_bad_meta_file_fails_the_run_without_partial_files(dirs, capsys):
+    meta_dir, data_dir = dirs
+    with open(os.path.join(meta_dir, "Test_Broken.txt"), "w") as f:
+        f.write("name: Broken\nnodes:\n    no brackets here\nend\n")
+    assert run(meta_dir, data_dir) == 1
+    assert "Test_Broken.json: MetaParseError: line 3, column 5" in capsys.readouterr().out
+    assert sorted(os.listdir(data_dir)) == sorted([build_maps.MANIFEST_NAME] + [name + ".json" for name in GOOD])
+    assert "Test_Broken.json" not in build_maps.load_manifest(data_dir)
+
+
+def test_changed_meta_file_is_rebuilt(dirs):
+    meta_dir, data_dir = dirs
+    assert run(meta_dir, data_dir) == 0
+    with open(os.path.join(meta_dir, "Stanford_CS101.txt"), "a") as f:
+        f.write("\n")
+    results = build_maps.build_maps([tuple(name.split("_")) for name in GOOD], meta_dir, data_dir, jobs=1)
+    assert results["Stanford_CS101.json"] == "built"
+    assert results["Berkeley_CS10.json"] == "unchanged"
+
+
+def test_failed_write_leaves_no_files(tmp_path):
+    path = str(tmp_path / "Test_OOP.json")
+    with pytest.raises(TypeError):
+        parser.write_atomic(path, "not bytes")
+    assert os.listdir(str(tmp_path)) == []
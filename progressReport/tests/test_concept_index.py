@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from concept_index import ConceptIndex, normalize
+
+HOFS = ["HOFs I", "HOFs II", "HOFs III"]
+
+
+def values(*names):
+    return {name: {"student_mastery": index} for index, name in enumerate(names, start=1)}
+
+
+def test_exact_names_win_over_near_misses():
+    payload = values("HOFs III", "HOFs II", "HOFs I")
+    assert ConceptIndex(HOFS).resolve(payload) == [payload["HOFs I"], payload["HOFs II"], payload["HOFs III"]]
+
+
+def test_normalized_names_win_over_fuzzy_matches():
+    payload = {"hofs-ii": {"student_mastery": 2}, "HOFs III (extra credit)": {"student_mastery": 3},
+               "HOFs I": {"student_mastery": 1}}
+    # "hofs iii extra credit" contains all three names, but the other two
+    # already have better matches.
+    assert ConceptIndex(HOFS).resolve(payload) == [
+        payload["HOFs I"], payload["hofs-ii"], payload["HOFs III (extra credit)"]]
+    assert normalize("HOFs III (extra credit)") == "hofs iii extra credit"
+
+
+def test_fuzzy_prefers_the_closest_length():
+    payload = values("Recursion Tracing Quiz", "Recursion I", "Recurs")
+    assert ConceptIndex(["Recursion"]).resolve(payload) == [payload["Recursion I"]]
+
+
+def test_exact_mode_skips_fuzzy_matches():
+    payload = values("Recursion I", "hofs  i")
+    assert ConceptIndex(["Recursion", "HOFs I"]).resolve(payload, "exact") == [None, payload["hofs  i"]]
+
+
+@pytest.mark.parametrize("mode", ["exact", "fuzzy"])
+def test_results_do_not_depend_on_payload_order(mode):
+    index = ConceptIndex(HOFS + ["Recursion"])
+    payload = values("HOFs", "hofs ii", "Recursion Tracing", "Recursion Basics", "HOFs III quiz")
+    expected = index.resolve(payload, mode)
+    assert index.resolve(dict(reversed(list(payload.items()))), mode) == expected
+    if mode == "fuzzy":
+        assert expected[3] == payload["Recursion Basics"]  # same distance: the smaller key
+
+
+def test_non_dict_values_are_ignored_outside_legacy():
+    payload = {"class": "CS10", "Subclassing": {"student_mastery": 1}}
+    assert ConceptIndex(["Subclassing"]).resolve(payload) == [payload["Subclassing"]]
+
+
+def test_legacy_keeps_the_first_substring_match():
+    payload = {"HOFs II": {"student_mastery": 2}, "HOFs I": {"student_mastery": 1}, "class": "CS10"}
+    index = ConceptIndex(HOFS + ["Subclassing"])
+    # The original scan takes the first key either containing or contained in
+    # the name, including non-dict values.
+    assert index.resolve(payload, "legacy") == [payload["HOFs II"], payload["HOFs II"], payload["HOFs II"], "CS10"]
+    # A key that matched exactly is not offered to the other names.
+    assert index.resolve(payload, "fuzzy") == [payload["HOFs I"], payload["HOFs II"], None, None]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ConceptIndex(HOFS).resolve({}, "closest")
+
+
+def test_batch_match_modes(client, test_course):
+    school, course = test_course
+    # The test client sends sorted keys, so "All ..." comes first.
+    mastery = {"All Subclassing Iteration": {"student_mastery": 4}, "Iteration": {"student_mastery": 2}}
+    levels = {}
+    for mode in ("legacy", "fuzzy"):
+        response = client.post("/batch?match={}".format(mode), json={"school": school, "class": course,
+                                                                     "students": [{"id": "a", "mastery": mastery}]})
+        assert response.status_code == 200
+        levels[mode] = json.loads(response.get_data(as_text=True))["student_levels"]
+    # Nodes in preorder: the course, Objects, Subclassing, Iteration.
+    assert levels["legacy"] == [4, 4, 4, 4]
+    assert levels["fuzzy"] == [3, 3, 4, 2]
@@ -0,0 +1,44 @@
+import serializer
+from course_model import CourseModels
+
+
+class FakeRedis:
+    def __init__(self, categories):
+        self.value = serializer.dumpb(categories)
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.value
+
+
+def models_with(categories, redis_course="CS10"):
+    models = CourseModels(redis_course)
+    models._redis_client = FakeRedis(categories)
+    return models
+
+
+def test_redis_template_only_for_configured_course(test_course):
+    models = models_with({"Quest": {"Abstraction": 2}})
+    template = models.get("Berkeley", "CS10")
+    assert template.concept_names == ("Abstraction",)
+    for name in ("cs10", "Anything", "x" * 50):
+        assert models.get("Berkeley", name) is None
+    assert models._templates == {}
+
+
+def test_redis_template_keyed_by_categories_version(test_course):
+    models = models_with({"Quest": {"Abstraction": 2}})
+    first = models.get("Berkeley", "CS10")
+    assert models.get("Berkeley", "CS10") is first
+    models._redis_client.value = serializer.dumpb({"Quest": {"Abstraction": 2, "Iteration": 4}})
+    models._redis_template = (0, first)  # expired
+    second = models.get("Berkeley", "CS10")
+    assert second is not first
+    assert second.concept_names == ("Abstraction", "Iteration")
+
+
+def test_without_redis_course_nothing_falls_back(test_course):
+    models = models_with({"Quest": {"Abstraction": 2}}, redis_course=None)
+    assert models.get("Berkeley", "CS10") is None
+    assert models._redis_client.gets == 0
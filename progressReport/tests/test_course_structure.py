@@ -0,0 +1,57 @@
+import json
+import re
+
+import pytest
+
+COURSE_URL = re.compile(r"let courseUrl = (\"[^\"]*\");")
+
+
+def course_url(response):
+    return json.loads(COURSE_URL.search(response.get_data(as_text=True)).group(1))
+
+
+@pytest.fixture
+def page_url(client, test_course):
+    school, course = test_course
+    return course_url(client.get("/?school={}&class={}".format(school, course)))
+
+
+def test_current_digest_is_immutable(client, page_url):
+    assert re.fullmatch(r"/course/Test/OOP/[0-9a-f]{32}\.json", page_url)
+    response = client.get(page_url)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    digest = page_url.rsplit("/", 1)[1][:-len(".json")]
+    assert response.headers["ETag"] == '"{}"'.format(digest)
+    structure = response.get_json()
+    assert structure["name"] == "OOP" and structure["count"] == 4
+    revalidated = client.get(page_url, headers={"If-None-Match": response.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_stale_digest_redirects_to_the_current_one(client, page_url):
+    response = client.get("/course/Test/OOP/{}.json".format("0" * 32))
+    assert response.status_code == 302
+    assert response.headers["Location"] == page_url
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_unknown_course_is_not_found(client, test_course):
+    assert client.get("/course/Test/Missing/{}.json".format("0" * 32)).status_code == 404
+
+
+@pytest.mark.parametrize("method", ["GET", "POST"])
+def test_page_embeds_the_proxy_prefix(client, test_course, method):
+    school, course = test_course
+    headers = {"X-Forwarded-Prefix": "/progress"}
+    if method == "GET":
+        response = client.get("/?school={}&class={}".format(school, course), headers=headers)
+    else:
+        response = client.post("/", json={"school": school, "class": course}, headers=headers)
+    url = course_url(response)
+    assert url.startswith("/progress/course/Test/OOP/")
+    # The prefix is stripped again behind the proxy.
+    assert client.get(url[len("/progress"):]).status_code == 200
+    # Pages cached for one prefix are not served for another.
+    if method == "GET":
+        assert course_url(client.get("/?school={}&class={}".format(school, course))).startswith("/course/")
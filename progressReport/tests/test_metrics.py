@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from metrics import REQUEST_SECONDS, STAGE_SECONDS, Histogram, Metrics, SampledProfiler, metrics, profiler
+
+REQUEST_COUNT = 'progress_report_request_seconds_count{method="POST",route="/",status="200"}'
+
+
+def post_report(client, test_course):
+    school, course = test_course
+    response = client.post("/", json={"school": school, "class": course,
+                                      "Iteration": {"student_mastery": 2, "class_mastery": 1}})
+    assert response.status_code == 200
+    response.close()  # runs the call_on_close hooks that record the request
+
+
+def request_histogram(**labels):
+    key = (REQUEST_SECONDS, tuple(sorted(labels.items())))
+    return metrics._histograms.get(key)
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert (histogram.count, histogram.sum) == (4, 2.65)
+
+
+def test_render_is_cumulative():
+    local = Metrics(buckets=(0.1, 1.0))
+    local.observe(STAGE_SECONDS, 0.05, stage="parse")
+    local.observe(STAGE_SECONDS, 0.5, stage="parse")
+    lines = local.render().splitlines()
+    assert lines[:2] == ["# HELP {} Time spent in one stage of handling a request.".format(STAGE_SECONDS),
+                         "# TYPE {} histogram".format(STAGE_SECONDS)]
+    assert lines[2:] == [
+        'progress_report_stage_seconds_bucket{stage="parse",le="0.1"} 1',
+        'progress_report_stage_seconds_bucket{stage="parse",le="1.0"} 2',
+        'progress_report_stage_seconds_bucket{stage="parse",le="+Inf"} 2',
+        'progress_report_stage_seconds_sum{stage="parse"} 0.55',
+        'progress_report_stage_seconds_count{stage="parse"} 2',
+    ]
+
+
+def test_request_moves_the_route_histogram(client, test_course):
+    metrics.reset()
+    post_report(client, test_course)
+    assert request_histogram(method="POST", route="/", status=200).count == 1
+    post_report(client, test_course)
+    assert request_histogram(method="POST", route="/", status=200).count == 2
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert "{} 2".format(REQUEST_COUNT) in body.splitlines()
+    assert 'progress_report_stage_seconds_count{stage="render"}' in body
+    assert 'progress_report_cache_entries{cache="render"}' in body
+
+
+def test_sample_rate_zero_disables_profiling(tmp_path):
+    sampler = SampledProfiler(every=0, output_dir=str(tmp_path))
+    assert [sampler.start("GET index") for _ in range(5)] == [None] * 5
+    sampler = SampledProfiler(every=2, output_dir=str(tmp_path))
+    assert sampler.start("GET index") is None
+    handle = sampler.start("GET index")
+    assert handle is not None
+    sampler.stop(handle)
+    assert os.listdir(str(tmp_path)) == ["GET_index-{}-2.prof".format(os.getpid())]
+
+
+@pytest.mark.parametrize("every, profiles", [(0, 0), (1, 2)])
+def test_requests_are_profiled_at_the_sample_rate(client, test_course, tmp_path, monkeypatch, every, profiles):
+    profile_dir = tmp_path / "profiles"
+    profile_dir.mkdir()
+    monkeypatch.setattr(profiler, "every", every)
+    monkeypatch.setattr(profiler, "output_dir", str(profile_dir))
+    post_report(client, test_course)
+    post_report(client, test_course)
+    assert len(os.listdir(str(profile_dir))) == profiles
@@ -0,0 +1,76 @@
+from course_model import CourseTemplate
+from node_tree import NO_NODE, NodeTree
+
+
+def nested_tree():
+    """
+    root
+      A         (week 1)
+        A1      (week 1)
+        A2      (week 2)
+          A2a   (week 3)
+      B         (week 4)
+    """
+    tree = NodeTree()
+    root = tree.add("Course", "root", 0)
+    a = tree.add("A", "default", 1, root)
+    tree.add("A1", "default", 1, a)
+    a2 = tree.add("A2", "default", 2, a)
+    tree.add("A2a", "default", 3, a2)
+    tree.add("B", "default", 4, root)
+    return tree
+
+
+def preorder(node):
+    labels = [node.label]
+    for child in node.children:
+        labels.extend(preorder(child))
+    return labels
+
+
+def test_links_and_indexes():
+    tree = nested_tree()
+    assert len(tree) == 6
+    assert list(tree.parents) == [NO_NODE, 0, 1, 1, 3, 0]
+    assert list(tree.first_child) == [1, 2, NO_NODE, 4, NO_NODE, NO_NODE]
+    assert list(tree.next_sibling) == [NO_NODE, 5, 3, NO_NODE, NO_NODE, NO_NODE]
+    assert list(tree.children(0)) == [1, 5]
+    assert list(tree.children(1)) == [2, 3]
+    assert list(tree.children(2)) == []
+
+
+def test_views_follow_the_tree_in_preorder():
+    tree = nested_tree()
+    root = tree.root
+    assert preorder(root) == ["Course", "A", "A1", "A2", "A2a", "B"]
+    a2 = root.children[0].children[1]
+    assert (a2.id, a2.label, a2.style, a2.week) == (4, "A2", "default", 2)
+    assert a2.parent == root.children[0]
+    # Top-level nodes have no parent, as with parser.Node.
+    assert root.children[0].parent is None and root.parent is None
+
+
+def test_to_json_nests_in_preorder():
+    nodes = nested_tree().to_json()
+    assert (nodes["id"], nodes["name"], nodes["parent"]) == (1, "Course", "null")
+    a, b = nodes["children"]
+    assert [child["name"] for child in a["children"]] == ["A1", "A2"]
+    assert a["parent"] == "null" and a["children"][1]["parent"] == "A"
+    assert a["children"][1]["children"][0] == {"id": 5, "name": "A2a", "parent": "A2", "data": {"week": 3}}
+    assert "children" not in b and nested_tree().to_json(render=True)["children"][1]["children"] == []
+
+
+def test_levels_are_assigned_to_leaves_in_preorder():
+    template = CourseTemplate("Course", "Spring 2024", [2024, 1, 15], [], [], 1, nested_tree().to_json())
+    assert template.concept_names == ("A1", "A2a", "B")
+    student, klass = template.level_arrays([(4, 1), (2, 3), (1, 2)])
+    # A2 takes A2a's level, A the floored mean of A1 and A2, the root of A and B.
+    assert student == [2, 3, 4, 2, 2, 1]
+    assert klass == [2, 2, 1, 3, 3, 2]
+
+
+def test_empty_tree():
+    tree = NodeTree()
+    assert len(tree) == 0
+    assert tree.to_json() is None
+    assert list(tree.parents) == [] and list(tree.first_child) == []
@@ -0,0 +1,109 @@
+import glob
+import io
+
+import pytest
+
+import parser
+from parser import MetaParseError, count_nodes, nodes_to_json, parse_meta, read_meta
+
+HEADER = """name: Test
+term: Spring 2024
+orientation: left to right
+start date: 2024 01 15
+styles:
+    name: default, shape: ellipse, style: filled, fillcolor: #E0E0E0
+class levels:
+    Not Taught: #dddddd
+student levels:
+    First Steps: #dddddd
+nodes:
+"""
+
+
+def parse(text):
+    return parse_meta(io.StringIO(text))
+
+
+def tree_labels(node):
+    return {child.label: tree_labels(child) for child in node.children}
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob("meta/*.txt")))
+def test_parse_meta_matches_read_meta(path):
+    with open(path) as f:
+        legacy = read_meta(f)
+    with open(path) as f:
+        parsed = parse_meta(f)
+    assert tuple(parsed[:7]) == legacy[:7]
+    assert nodes_to_json(parsed.root) == nodes_to_json(legacy[7])
+    assert parsed.tree.to_json() == nodes_to_json(legacy[7])
+    assert parsed.count == count_nodes(legacy[7])
+
+
+def test_inconsistent_indent_rounds_down_to_a_depth():
+    # meta/Berkeley_CS10.txt indents the topics under "Midterm" and "Postterm"
+    # 5 spaces past their parent (9 in all), which read_meta has always read as
+    # depth 2: children of the line above.
+    with open("meta/Berkeley_CS10.txt") as f:
+        root = parse_meta(f).root
+    top_level = {node.label: node for node in root.children}
+    assert list(top_level) == ["Quest", "Midterm", "Postterm", "Projects"]
+    midterm = [node.label for node in top_level["Midterm"].children]
+    assert midterm[:2] == ["Algorithms", "Computers and Education"] and len(midterm) == 11
+    postterm = top_level["Postterm"].children
+    assert "HCI" in [node.label for node in postterm]
+    assert all(node.parent == top_level["Postterm"] for node in postterm)
+
+
+def test_uneven_indents_in_one_section():
+    text = HEADER + """    A [default, Week1]
+         B [default, Week1]
+          C [default, Week1]
+           D [default, Week1]
+    E [default, Week1]
+end
+"""
+    parsed = parse(text)
+    assert tree_labels(parsed.root) == {"A": {"B": {}, "C": {}, "D": {}}, "E": {}}
+    assert nodes_to_json(parsed.root) == nodes_to_json(read_meta(io.StringIO(text))[7])
+
+
+def test_multi_level_dedent_attaches_to_the_right_parent():
+    parsed = parse(HEADER + """    A [default, Week1]
+        B [default, Week2]
+            C [default, Week3]
+                D [default, Week4]
+        E [default, Week5]
+    F [default, Week6]
+end
+""")
+    assert tree_labels(parsed.root) == {"A": {"B": {"C": {"D": {}}}, "E": {}}, "F": {}}
+    assert parsed.root.label == "Test" and parsed.root.week == 6
+    assert [node.id for node in parsed.root.children] == [2, 7]
+
+
+def test_bad_node_line_reports_line_and_column():
+    with pytest.raises(MetaParseError) as error:
+        parse(HEADER + "    A [default, Week1]\n        B without brackets\nend\n")
+    assert (error.value.line, error.value.column) == (13, 9)
+    assert error.value.text == "        B without brackets"
+    assert str(error.value).startswith("line 13, column 9: expected node")
+
+
+def test_bad_header_line_reports_line_and_column():
+    with pytest.raises(MetaParseError) as error:
+        parse("name: Test\nterm: Spring\n")
+    assert (error.value.line, error.value.column) == (2, 7)
+    assert "term: <season> <year>" in error.value.message
+
+
+def test_bad_level_line_reports_its_section():
+    text = HEADER.replace("    Not Taught: #dddddd", "    Not Taught dddddd")
+    with pytest.raises(MetaParseError) as error:
+        parse(text)
+    assert (error.value.line, error.value.column) == (8, 5)
+    assert "level" in error.value.message
+
+
+def test_metaparseerror_is_a_valueerror():
+    assert issubclass(parser.MetaParseError, ValueError)
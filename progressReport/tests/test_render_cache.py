@@ -0,0 +1,19 @@
+def test_get_revalidates_with_etag(client):
+    first = client.get("/?school=Berkeley&class=CS10&student_mastery=1")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    again = client.get("/?school=Berkeley&class=CS10&student_mastery=1", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+def test_post_returns_full_page_without_etag(client):
+    body = {"school": "Berkeley", "class": "CS10"}
+    first = client.post("/", json=body)
+    assert first.status_code == 200
+    assert "ETag" not in first.headers
+    # A client that sends an ETag from a GET of the same page still gets the body.
+    etag = client.get("/?school=Berkeley&class=CS10&student_mastery=0").headers["ETag"]
+    again = client.post("/", json=body, headers={"If-None-Match": etag})
+    assert again.status_code == 200
+    assert again.data == first.data
@@ -0,0 +1,96 @@
+"""
+Validation of mastery learning POST requests.
+
+Requests in the common shape are accepted by a plain-Python fast path;
+anything else goes through the full jsonschema validator, which also produces
+the error details. jsonschema is imported, and the schema checked, the first
+time a request needs it.
+"""
+import functools
+import os
+
+MASTERY_FIELDS = ("student_mastery", "class_mastery")
+# Levels are summed per node as 64-bit integers, so each one must fit in 32 bits.
+MIN_LEVEL = -2 ** 31
+MAX_LEVEL = 2 ** 31 - 1
+MAX_BATCH_STUDENTS = int(os.getenv("BATCH_MAX_STUDENTS", "1000"))
+
+MASTERY_REQUEST_SCHEMA = {
+    "type": "object",
+    # Matches mastery fields (fields other than "school" and "class"
+    "properties": {
+        # These fields are optional.
+        "school": {"type": "string"},
+        "class": {"type": "string"},
+    },
+    "additionalProperties": {
+        "type": "object",
+        "properties": {
+            "student_mastery": {"type": "integer", "minimum": MIN_LEVEL, "maximum": MAX_LEVEL},
+            "class_mastery": {"type": "integer", "minimum": MIN_LEVEL, "maximum": MAX_LEVEL}
+        },
+        "additionalProperties": False
+    },
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _validator():
+    import jsonschema
+
+    validator_class = jsonschema.validators.validator_for(MASTERY_REQUEST_SCHEMA)
+    validator_class.check_schema(MASTERY_REQUEST_SCHEMA)
+    return validator_class(MASTERY_REQUEST_SCHEMA)
+
+
+def _is_common_shape(request_as_json):
+    if type(request_as_json) is not dict:
+        return False
+    for key, value in request_as_json.items():
+        if key == "school" or key == "class":
+            if type(value) is not str:
+                return False
+            continue
+        if type(value) is not dict:
+            return False
+        for field, level in value.items():
+            # bool is an int subclass but not a JSON Schema integer.
+            if field not in MASTERY_FIELDS or type(level) is not int or not MIN_LEVEL <= level <= MAX_LEVEL:
+                return False
+    return True
+
+
+def validate_mastery_learning_post_request(request_as_json):
+    """
+    Returns a list of {"path", "message"} errors, empty when the request is valid.
+    """
+    if _is_common_shape(request_as_json):
+        return []
+    errors = sorted(_validator().iter_errors(request_as_json), key=lambda error: [str(p) for p in error.path])
+    return [{"path": "/" + "/".join(str(p) for p in error.path), "message": error.message} for error in errors]
+
+
+def validate_batch_post_request(request_as_json):
+    """
+    Validates a batch request: optional "school"/"class" strings and a
+    "students" list of {"id": string, "mastery": <mastery request>} objects.
+    Returns errors in the same form as validate_mastery_learning_post_request.
+    """
+    if type(request_as_json) is not dict:
+        return [{"path": "/", "message": "Request body must be an object"}]
+    errors = []
+    for field in ("school", "class"):
+        if field in request_as_json and type(request_as_json[field]) is not str:
+            errors.append({"path": "/" + field, "message": "Must be a string"})
+    students = request_as_json.get("students")
+    if type(students) is not list:
+        errors.append({"path": "/students", "message": "Must be a list of {\"id\", \"mastery\"} objects"})
+        return errors
+    for i, student in enumerate(students):
+        path = "/students/{}".format(i)
+        if type(student) is not dict or type(student.get("id")) is not str:
+            errors.append({"path": path, "message": "Must be an object with a string \"id\""})
+            continue
+        for error in validate_mastery_learning_post_request(student.get("mastery", {})):
+            errors.append({"path": path + "/mastery" + error["path"].rstrip("/"), "message": error["message"]})
+    return errors
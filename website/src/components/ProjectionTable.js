@@ -1,7 +1,9 @@
 import React from 'react';
 import { Box, TableContainer, Paper, Table, TableHead, TableCell, TableBody, TableRow } from '@mui/material';
 
-export default function ProjectionTable({ projections: { zeros, pace, perfect }, gradeData }) {
+export default function ProjectionTable({ projections: { zeros, pace, perfect, grade }, gradeData }) {
+    // The current grade comes precomputed with the projections; the projected
+    // totals are looked up in the bins here.
     function getLetterGrade(points) {
         for (let i = 0; i < gradeData.length; i++) {
             if (points <= +gradeData[i][0]) {
@@ -24,7 +26,7 @@ export default function ProjectionTable({ projections: { zeros, pace, perfect },
                         </TableHead>
                         <TableBody>
                             <TableRow>
-                                <TableCell align='center'>{zeros} ({getLetterGrade(zeros)})</TableCell>
+                                <TableCell align='center'>{zeros} ({grade ?? getLetterGrade(zeros)})</TableCell>
                                 <TableCell align='center'>{pace} ({getLetterGrade(pace)})</TableCell>
                                 <TableCell align='center'>{perfect} ({getLetterGrade(perfect)})</TableCell>
                             </TableRow>